@@ -0,0 +1,13 @@
+# flake8: noqa
+
+from .instrumentacao import *
+from .circuito import *
+from .condicional import *
+from .lote import *
+from .client import *
+from .async_client import *
+from .fanout import *
+from .cache import *
+from .market import *
+from .analytics import *
+from .paginacao import *
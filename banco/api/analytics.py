@@ -0,0 +1,140 @@
+import json
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache import get_stale_while_revalidate
+
+logger = logging.getLogger(__name__)
+
+PERIODOS = ['1mo', '3mo', '6mo', '1y', '2y', '5y', 'max']
+
+
+def get_cache_versoes():
+    """
+    cache da versão das análises de cada cliente. as séries ficam no cache
+    local de cada processo; a versão, lida a cada busca, é a mesma em todos
+    os workers, então um aporte ou resgate atendido por um deles descarta
+    as séries guardadas em todos.
+    """
+    return caches[getattr(settings, 'ANALYTICS_CACHE_VERSOES', 'default')]
+
+
+def chave_versao_analytics(cliente_id):
+    return f"analytics:{cliente_id}:versao"
+
+
+def _chave(cliente_id, versao, periodo):
+    return f"analytics:{cliente_id}:{versao}:{periodo}"
+
+
+def downsample_lttb(n_pontos, *series):
+    """
+    índices dos pontos mantidos pelo Largest-Triangle-Three-Buckets,
+    escolhendo o mesmo índice em todas as séries para que continuem
+    alinhadas às datas. em vez do ponto escolhido no balde anterior, usa a
+    média dele como âncora, o que permite calcular tudo de uma vez com numpy.
+    """
+    n = len(series[0])
+    if n_pontos < 3 or n <= n_pontos:
+        return np.arange(n)
+
+    ys = np.nan_to_num(np.array(series, dtype=float))
+    x = np.arange(n, dtype=float)
+
+    n_baldes = n_pontos - 2
+    meio = np.arange(1, n - 1)
+    balde = (meio - 1) * n_baldes // (n - 2)
+
+    contagem = np.bincount(balde, minlength=n_baldes)
+    media_x = np.bincount(balde, weights=x[meio]) / contagem
+    media_y = np.array([np.bincount(balde, weights=y[meio])
+                        for y in ys]) / contagem
+
+    ax = np.r_[x[0], media_x[:-1]][balde]
+    ay = np.hstack([ys[:, :1], media_y[:, :-1]])[:, balde]
+    cx = np.r_[media_x[1:], x[-1]][balde]
+    cy = np.hstack([media_y[:, 1:], ys[:, -1:]])[:, balde]
+    px = x[meio]
+    py = ys[:, meio]
+
+    area = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay)).sum(axis=0)
+
+    ordem = np.lexsort((area, balde))
+    balde_ordenado = balde[ordem]
+    maior_do_balde = np.r_[balde_ordenado[1:] != balde_ordenado[:-1], True]
+
+    return np.r_[0, meio[ordem[maior_do_balde]], n - 1]
+
+
+def buscar_analytics(api, cliente_id, periodo):
+    """
+    métricas e série do gráfico de performance da carteira, já serializadas
+    no JSON devolvido ao navegador. o histórico muda no máximo uma vez por
+    dia, então o cache é servido mesmo vencido enquanto é atualizado em
+    segundo plano.
+    """
+    def fetch():
+        response = api.get(f"/internal/analytics/cliente/{cliente_id}/",
+                           params={'periodo': periodo})
+        resultado = {'status': response.status_code}
+        if response.status_code != 200:
+            return resultado
+
+        dados = response.json()
+        chart = None
+
+        historico = dados.get('historico', {})
+        if historico and len(historico.get('datas', [])) > 1:
+            datas = historico.get('datas', [])
+            carteira = historico.get('carteira_pct', [])
+            benchmark = historico.get('benchmark_pct', [])
+
+            n = min(len(datas), len(carteira), len(benchmark))
+            indices = downsample_lttb(
+                getattr(settings, 'ANALYTICS_CHART_PONTOS', 500),
+                carteira[:n], benchmark[:n]).tolist()
+
+            chart = {
+                "labels": [datas[i] for i in indices],
+                "portfolio": [carteira[i] for i in indices],
+                "benchmark": [benchmark[i] for i in indices]
+            }
+
+        resultado['json'] = json.dumps({
+            'periodo': periodo,
+            'metricas': dados.get('metricas', {}),
+            'chart': chart
+        })
+        return resultado
+
+    try:
+        versao = get_cache_versoes().get(chave_versao_analytics(cliente_id), 0)
+    except Exception as e:
+        # sem a versão não há como saber se a série guardada vale
+        logger.warning("Cache de versões indisponível: %s", e)
+        return fetch()
+
+    return get_stale_while_revalidate(
+        _chave(cliente_id, versao, periodo),
+        getattr(settings, 'ANALYTICS_CACHE_TTL', 900),
+        getattr(settings, 'ANALYTICS_CACHE_MAX_AGE', 86400),
+        fetch,
+        cacheable=lambda value: value['status'] == 200
+    )
+
+
+def invalidar_analytics(cliente_id):
+    """
+    muda a versão das análises do cliente; as séries da versão anterior
+    deixam de ser lidas e expiram em ANALYTICS_CACHE_MAX_AGE segundos.
+    """
+    try:
+        get_cache_versoes().set(
+            chave_versao_analytics(cliente_id), time.time_ns(),
+            getattr(settings, 'ANALYTICS_CACHE_MAX_AGE', 86400))
+    except Exception as e:
+        logger.warning("Cache de versões indisponível: %s", e)
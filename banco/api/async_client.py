@@ -0,0 +1,262 @@
+import asyncio
+import atexit
+import logging
+import os
+import ssl
+import threading
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .client import ApiClient
+from .condicional import LeituraCondicional, ainvalidar_versao, aler_leituras
+from .lote import (
+    LoteSemSuporte,
+    get_lote_path,
+    lote_disponivel,
+    marcar_sem_lote,
+    payload_lote
+)
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_pid = None
+_loop_thread = None
+_client = None
+_loop_lock = threading.Lock()
+_ssl_context = None
+_ssl_lock = threading.Lock()
+
+
+def get_ssl_context():
+    """
+    contexto TLS único por processo: montá-lo (carregar os certificados)
+    custa dezenas de ms e seria pago a cada novo AsyncClient.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_lock:
+            if _ssl_context is None:
+                _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def get_loop_api():
+    """
+    event loop do processo, numa thread própria, onde roda o único
+    httpx.AsyncClient. o cliente fica preso ao loop em que abriu as
+    conexões e, sob WSGI, cada view async roda num loop novo: as chamadas
+    saem sempre por este loop, então o pool keep-alive é o mesmo para todas
+    as requisições do processo, sob WSGI ou ASGI. refeito depois de um fork.
+    """
+    global _loop, _loop_pid, _loop_thread, _client
+    if _loop is None or _loop_pid != os.getpid():
+        with _loop_lock:
+            if _loop is None or _loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever,
+                                          name='api-async', daemon=True)
+                thread.start()
+                _loop, _loop_thread, _client = loop, thread, None
+                _loop_pid = os.getpid()
+    return _loop
+
+
+def get_async_client():
+    """
+    o httpx.AsyncClient do processo, com pool de conexões keep-alive
+    compartilhado por todas as requisições. só deve ser usado dentro do
+    loop de get_loop_api (ver no_loop_da_api). cookies são bloqueados como
+    no cliente síncrono.
+    """
+    global _client
+    get_loop_api()
+    if _client is None:
+        with _loop_lock:
+            if _client is None:
+                pool_size = getattr(settings, 'API_ASYNC_POOL_SIZE', 100)
+                _client = httpx.AsyncClient(
+                    verify=get_ssl_context(),
+                    limits=httpx.Limits(max_connections=pool_size,
+                                        max_keepalive_connections=pool_size),
+                    cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+                )
+    return _client
+
+
+async def no_loop_da_api(coro):
+    """
+    aguarda `coro` rodando no loop de get_loop_api. cancelar quem espera
+    cancela a chamada.
+    """
+    loop = get_loop_api()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+@atexit.register
+def fechar_cliente_async(timeout=5):
+    """
+    fecha as conexões do pool e para o loop da API (no fim do processo).
+    """
+    global _loop, _loop_thread, _client
+    with _loop_lock:
+        loop, thread, client = _loop, _loop_thread, _client
+        _loop = _loop_thread = _client = None
+    if loop is None or _loop_pid != os.getpid():
+        return
+    try:
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(),
+                                             loop).result(timeout)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+def httpx_timeout(timeout):
+    if isinstance(timeout, (tuple, list)):
+        conexao, leitura = timeout
+        return httpx.Timeout(leitura, connect=conexao)
+    return httpx.Timeout(timeout)
+
+
+class RespostaEmCacheAsync(httpx.Response):
+    """
+    RespostaEmCache no formato do httpx, para o AsyncApiClient.
+    """
+    from_cache = True
+
+    def __init__(self, entrada, url):
+        super().__init__(200, content=entrada['conteudo'],
+                         headers=entrada['cabecalhos'],
+                         request=httpx.Request('GET', url))
+        self._dados = entrada['dados']
+
+    def json(self, **kwargs):
+        return self._dados
+
+
+class AsyncApiClient(ApiClient):
+    """
+    versão async do ApiClient para as views async: mesmo token, timeout
+    padrão, circuit breaker e instrumentação. erros de rede chegam como
+    requests.RequestException, então as views tratam os dois clientes do
+    mesmo jeito.
+    """
+    @classmethod
+    async def afrom_request(cls, request):
+        return cls(await request.session.aget('auth_token'))
+
+    async def request(self, method, path, headers=None, **kwargs):
+        leitura = LeituraCondicional.para(self.token, method, path,
+                                          kwargs.get('params'))
+        if leitura is not None:
+            return await self._get_condicional(leitura, headers, **kwargs)
+
+        response = await self._enviar(method, path, headers, **kwargs)
+        if method != 'get' and self.token:
+            await self.invalidar_cache()
+        return response
+
+    async def _enviar(self, method, path, headers=None, **kwargs):
+        kwargs['timeout'] = httpx_timeout(kwargs.get(
+            'timeout', getattr(settings, 'API_TIMEOUT', (3.05, 10))))
+        send = getattr(get_async_client(), method)
+        circuito, inicio = self._liberar(method, path)
+        try:
+            response = await no_loop_da_api(send(
+                self.url(path), headers=self.get_headers(headers), **kwargs))
+        except httpx.TimeoutException as e:
+            self._falhar(method, path, circuito, inicio)
+            raise requests.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            self._falhar(method, path, circuito, inicio)
+            raise requests.ConnectionError(str(e)) from e
+        except Exception:
+            self._falhar(method, path, circuito, inicio)
+            raise
+        self._concluir(method, path, circuito, inicio, response)
+        return response
+
+    async def _get_condicional(self, leitura, headers=None, **kwargs):
+        leitura.carregar(await aler_leituras([leitura]))
+        if leitura.fresca():
+            return self._resposta_em_cache(leitura.entrada, leitura.path)
+        response = await self._enviar('get', leitura.path,
+                                      leitura.cabecalhos(headers), **kwargs)
+        return await self._guardar(leitura, response)
+
+    async def _guardar(self, leitura, response):
+        if leitura.nao_modificada(response):
+            return self._resposta_em_cache(leitura.entrada, leitura.path)
+        nova = leitura.nova_entrada(response)
+        if nova:
+            await cache.aset(leitura.chave, *nova)
+        return response
+
+    def _resposta_em_cache(self, entrada, path):
+        return RespostaEmCacheAsync(entrada, self.url(path))
+
+    async def get_lote(self, itens):
+        leituras = {nome: LeituraCondicional.para(self.token, 'get', path,
+                                                  params)
+                    for nome, (path, params) in itens.items()}
+        condicionais = [leitura for leitura in leituras.values()
+                        if leitura is not None]
+        resultados, pendentes = self._separar_lote(
+            itens, leituras,
+            await aler_leituras(condicionais) if condicionais else {})
+
+        respostas = {}
+        if len(pendentes) > 1 and lote_disponivel():
+            try:
+                response = await self._enviar('post', get_lote_path(),
+                                              json=payload_lote(pendentes))
+                respostas = self._itens_lote(pendentes, response)
+            except LoteSemSuporte:
+                marcar_sem_lote()
+            except requests.RequestException as e:
+                logger.warning("Lote falhou, leituras individuais: %s", e)
+
+        individuais = {nome: item for nome, item in pendentes.items()
+                       if nome not in respostas}
+        if individuais:
+            enviadas = await asyncio.gather(*(
+                self._enviar('get', path, headers, params=params)
+                for path, params, headers in individuais.values()
+            ), return_exceptions=True)
+            respostas.update(zip(individuais, enviadas))
+
+        for nome, resposta in respostas.items():
+            if isinstance(resposta, BaseException) and \
+                    not isinstance(resposta, Exception):
+                raise resposta
+            if leituras[nome] is not None and \
+                    not isinstance(resposta, Exception):
+                resposta = await self._guardar(leituras[nome], resposta)
+            resultados[nome] = resposta
+        return resultados
+
+    async def invalidar_cache(self):
+        await ainvalidar_versao(self.token)
+
+    async def get(self, path, **kwargs):
+        return await self.request('get', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('post', path, **kwargs)
+
+    async def patch(self, path, **kwargs):
+        return await self.request('patch', path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request('delete', path, **kwargs)
@@ -0,0 +1,176 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from django.core.cache import cache
+
+from .fanout import get_executor
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    garante que, para uma mesma chave, só uma busca esteja em andamento no
+    processo; quem chega durante a busca espera e recebe o mesmo resultado.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+_flight = SingleFlight()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight para corrotinas: quem pede uma chave já em busca aguarda o
+    mesmo resultado sem bloquear o seu loop. o registro é do processo, não
+    do loop: sob WSGI cada view async roda num loop novo (async_to_sync).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    async def do(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result
+
+
+_aflight = AsyncSingleFlight()
+
+
+def get_or_fetch(key, ttl, func, cacheable=None):
+    """
+    lê `key` do cache do Django; em caso de miss chama `func` uma única vez
+    por processo, mesmo com várias requisições simultâneas, e guarda o
+    resultado por `ttl` segundos se `cacheable(resultado)` permitir.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    def fetch():
+        value = cache.get(key)
+        if value is None:
+            value = func()
+            if value is not None and (cacheable is None or cacheable(value)):
+                cache.set(key, value, ttl)
+        return value
+
+    return _flight.do(key, fetch)
+
+
+async def aget_or_fetch(key, ttl, func, cacheable=None):
+    """
+    get_or_fetch para views async: `func` é uma corrotina.
+    """
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    async def fetch():
+        value = await cache.aget(key)
+        if value is None:
+            value = await func()
+            if value is not None and (cacheable is None or cacheable(value)):
+                await cache.aset(key, value, ttl)
+        return value
+
+    return await _aflight.do(key, fetch)
+
+
+_revalidando = set()
+_revalidando_lock = threading.Lock()
+
+
+def _buscar_e_guardar(key, max_age, func, cacheable):
+    value = func()
+    if value is not None and (cacheable is None or cacheable(value)):
+        cache.set(key, {'valor': value, 'em': time.time()}, max_age)
+    return value
+
+
+def _revalidar(key, max_age, func, cacheable):
+    with _revalidando_lock:
+        if key in _revalidando:
+            return
+        _revalidando.add(key)
+
+    def tarefa():
+        try:
+            _buscar_e_guardar(key, max_age, func, cacheable)
+        except Exception:
+            pass
+        finally:
+            with _revalidando_lock:
+                _revalidando.discard(key)
+
+    get_executor().submit(tarefa)
+
+
+def get_stale_while_revalidate(key, ttl, max_age, func, cacheable=None):
+    """
+    como get_or_fetch, mas depois de `ttl` segundos o valor guardado continua
+    sendo servido imediatamente enquanto uma nova busca roda em segundo
+    plano. só após `max_age` segundos sem atualização a entrada expira.
+    """
+    entrada = cache.get(key)
+    if entrada is not None:
+        if time.time() - entrada['em'] > ttl:
+            _revalidar(key, max_age, func, cacheable)
+        return entrada['valor']
+
+    return _flight.do(key, lambda: _buscar_e_guardar(key, max_age, func,
+                                                     cacheable))
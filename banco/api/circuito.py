@@ -0,0 +1,99 @@
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class CircuitoAberto(requests.RequestException):
+    """
+    a API desse grupo de endpoints está falhando e a chamada nem foi feita.
+    herda de RequestException para cair nos mesmos fallbacks das views.
+    """
+
+
+def grupo_do_path(path):
+    """
+    grupo de endpoints que compartilha um circuito: o primeiro segmento do
+    caminho, ignorando o prefixo /internal/ (ex.: /internal/market/ ->
+    market, /conta/score/ -> conta).
+    """
+    partes = [p for p in path.split('?')[0].split('/') if p]
+    if partes and partes[0] == 'internal':
+        partes = partes[1:]
+    return partes[0] if partes else 'api'
+
+
+class CircuitBreaker:
+    """
+    depois de `limite_falhas` falhas seguidas (erro de conexão, timeout ou
+    status 5xx) o circuito abre e as chamadas falham na hora por
+    `tempo_aberto` segundos. passado esse tempo, uma única chamada de teste
+    é liberada (meio aberto): se der certo o circuito fecha, senão abre de
+    novo.
+    """
+    def __init__(self, nome, limite_falhas=5, tempo_aberto=30.0):
+        self.nome = nome
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.estado = FECHADO
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._testando = False
+        self._lock = threading.Lock()
+
+    def liberar(self):
+        """
+        reserva a chamada ou levanta CircuitoAberto.
+        """
+        with self._lock:
+            if self.estado == FECHADO:
+                return
+            if self.estado == ABERTO and time.monotonic() >= self.aberto_ate:
+                self.estado = MEIO_ABERTO
+            if self.estado == MEIO_ABERTO and not self._testando:
+                self._testando = True
+                return
+        raise CircuitoAberto(
+            f"API indisponível ({self.nome}), circuito aberto.")
+
+    def sucesso(self):
+        with self._lock:
+            self.estado = FECHADO
+            self.falhas = 0
+            self._testando = False
+
+    def falha(self):
+        with self._lock:
+            self.falhas += 1
+            self._testando = False
+            if (self.estado == MEIO_ABERTO or
+                    self.falhas >= self.limite_falhas):
+                self.estado = ABERTO
+                self.aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+
+def get_circuito(grupo):
+    circuito = _circuitos.get(grupo)
+    if circuito is None:
+        with _circuitos_lock:
+            circuito = _circuitos.get(grupo)
+            if circuito is None:
+                circuito = _circuitos[grupo] = CircuitBreaker(
+                    grupo,
+                    getattr(settings, 'API_CIRCUIT_FALHAS', 5),
+                    getattr(settings, 'API_CIRCUIT_TEMPO_ABERTO', 30))
+    return circuito
+
+
+def resetar_circuitos():
+    with _circuitos_lock:
+        _circuitos.clear()
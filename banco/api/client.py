@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from .circuito import CircuitoAberto, get_circuito, grupo_do_path
+from .condicional import (
+    LeituraCondicional,
+    RespostaEmCache,
+    invalidar_versao,
+    ler_leituras
+)
+from .fanout import FanOut
+from .instrumentacao import registrar_chamada
+from .lote import (
+    LoteSemSuporte,
+    RespostaDoLote,
+    get_lote_path,
+    lote_disponivel,
+    marcar_sem_lote,
+    payload_lote,
+    respostas_lote
+)
+
+logger = logging.getLogger(__name__)
+
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_adapter():
+    """
+    adapter único por processo: mantém o pool de conexões keep-alive com a
+    API compartilhado entre todas as threads.
+    """
+    global _adapter
+    if _adapter is None:
+        with _adapter_lock:
+            if _adapter is None:
+                pool_size = getattr(settings, 'API_POOL_SIZE', 10)
+                _adapter = HTTPAdapter(pool_connections=pool_size,
+                                       pool_maxsize=pool_size)
+    return _adapter
+
+
+def get_session():
+    """
+    uma Session por thread, todas montadas sobre o mesmo adapter. cookies
+    são bloqueados para que nada de um usuário vaze para outro.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = get_adapter()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+class ApiClient:
+    def __init__(self, token=None):
+        self.token = token
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(request.session.get('auth_token'))
+
+    def url(self, path):
+        return f"{settings.API_BASE_URL}{path}"
+
+    def get_headers(self, headers=None):
+        all_headers = {}
+        if self.token:
+            all_headers['Authorization'] = f'Token {self.token}'
+        if headers:
+            all_headers.update(headers)
+        return all_headers
+
+    def _liberar(self, method, path):
+        """
+        consulta o circuito do grupo do endpoint antes da chamada; retorna
+        (circuito, início) para _concluir/_falhar.
+        """
+        circuito = get_circuito(grupo_do_path(path))
+        inicio = time.perf_counter()
+        try:
+            circuito.liberar()
+        except CircuitoAberto:
+            registrar_chamada(method, path, 'circuito_aberto', inicio, 0)
+            raise
+        return circuito, inicio
+
+    def _falhar(self, method, path, circuito, inicio):
+        circuito.falha()
+        registrar_chamada(method, path, 'erro', inicio, 0)
+
+    def _concluir(self, method, path, circuito, inicio, response):
+        status = getattr(response, 'status_code', None)
+        if isinstance(status, int) and status >= 500:
+            circuito.falha()
+        else:
+            circuito.sucesso()
+        tamanho = len(getattr(response, 'content', b'') or b'')
+        registrar_chamada(method, path, status, inicio, tamanho)
+
+    def request(self, method, path, headers=None, **kwargs):
+        leitura = LeituraCondicional.para(self.token, method, path,
+                                          kwargs.get('params'))
+        if leitura is not None:
+            return self._get_condicional(leitura, headers, **kwargs)
+
+        response = self._enviar(method, path, headers, **kwargs)
+        if method != 'get' and self.token:
+            self.invalidar_cache()
+        return response
+
+    def _enviar(self, method, path, headers=None, **kwargs):
+        kwargs.setdefault('timeout', getattr(settings, 'API_TIMEOUT',
+                                             (3.05, 10)))
+        send = getattr(get_session(), method)
+        circuito, inicio = self._liberar(method, path)
+        try:
+            response = send(self.url(path), headers=self.get_headers(headers),
+                            **kwargs)
+        except Exception:
+            self._falhar(method, path, circuito, inicio)
+            raise
+        self._concluir(method, path, circuito, inicio, response)
+        return response
+
+    def _get_condicional(self, leitura, headers=None, **kwargs):
+        """
+        GET com cache por usuário: sem validadores a resposta é reaproveitada
+        até o TTL; com ETag/Last-Modified a API é consultada com
+        If-None-Match/If-Modified-Since e um 304 devolve o corpo guardado.
+        """
+        leitura.carregar(ler_leituras([leitura]))
+        if leitura.fresca():
+            return self._resposta_em_cache(leitura.entrada, leitura.path)
+        response = self._enviar('get', leitura.path,
+                                leitura.cabecalhos(headers), **kwargs)
+        return self._guardar(leitura, response)
+
+    def _guardar(self, leitura, response):
+        if leitura.nao_modificada(response):
+            return self._resposta_em_cache(leitura.entrada, leitura.path)
+        nova = leitura.nova_entrada(response)
+        if nova:
+            cache.set(leitura.chave, *nova)
+        return response
+
+    def _resposta_em_cache(self, entrada, path):
+        return RespostaEmCache(entrada, self.url(path))
+
+    def _separar_lote(self, itens, leituras, valores):
+        """
+        ({nome: resposta já válida no cache}, {nome: (path, params,
+        cabeçalhos)} que precisam ir à API).
+        """
+        resultados, pendentes = {}, {}
+        for nome, (path, params) in itens.items():
+            leitura = leituras[nome]
+            if leitura is not None:
+                leitura.carregar(valores)
+                if leitura.fresca():
+                    resultados[nome] = self._resposta_em_cache(
+                        leitura.entrada, path)
+                    continue
+            headers = leitura.cabecalhos() if leitura is not None else None
+            pendentes[nome] = (path, params, headers)
+        return resultados, pendentes
+
+    def _itens_lote(self, pendentes, response):
+        """
+        {nome: RespostaDoLote} dos itens presentes na resposta; levanta
+        LoteSemSuporte ou RequestException se o lote falhou como um todo.
+        """
+        itens = respostas_lote(response)
+        return {
+            nome: RespostaDoLote(itens[nome], self.url(path))
+            for nome, (path, _, _) in pendentes.items() if nome in itens
+        }
+
+    def get_lote(self, itens):
+        """
+        {nome: (path, params)} -> {nome: resposta ou exceção}. leituras com
+        cache condicional válido não saem do processo; o resto vai numa
+        única chamada ao endpoint de lote ou, se ele não estiver configurado
+        ou falhar, em chamadas individuais em paralelo.
+        """
+        leituras = {nome: LeituraCondicional.para(self.token, 'get', path,
+                                                  params)
+                    for nome, (path, params) in itens.items()}
+        condicionais = [leitura for leitura in leituras.values()
+                        if leitura is not None]
+        resultados, pendentes = self._separar_lote(
+            itens, leituras,
+            ler_leituras(condicionais) if condicionais else {})
+
+        respostas = {}
+        if len(pendentes) > 1 and lote_disponivel():
+            try:
+                response = self._enviar('post', get_lote_path(),
+                                        json=payload_lote(pendentes))
+                respostas = self._itens_lote(pendentes, response)
+            except LoteSemSuporte:
+                marcar_sem_lote()
+            except requests.RequestException as e:
+                logger.warning("Lote falhou, leituras individuais: %s", e)
+
+        individuais = {nome: item for nome, item in pendentes.items()
+                       if nome not in respostas}
+        if individuais:
+            fanout = FanOut()
+            for nome, (path, params, headers) in individuais.items():
+                fanout.add(nome, partial(self._enviar, 'get', path, headers,
+                                         params=params))
+            enviadas, erros = fanout.run()
+            respostas.update(enviadas)
+            respostas.update(erros)
+
+        for nome, resposta in respostas.items():
+            if leituras[nome] is not None and \
+                    not isinstance(resposta, Exception):
+                resposta = self._guardar(leituras[nome], resposta)
+            resultados[nome] = resposta
+        return resultados
+
+    def invalidar_cache(self):
+        """
+        descarta as respostas guardadas deste usuário; chamado após
+        qualquer escrita (POST/PATCH/DELETE) feita com o token dele.
+        """
+        invalidar_versao(self.token)
+
+    def get(self, path, **kwargs):
+        return self.request('get', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('post', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('patch', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('delete', path, **kwargs)
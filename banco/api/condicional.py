@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import time
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from .instrumentacao import url_template
+
+logger = logging.getLogger(__name__)
+
+_CABECALHOS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def regra_condicional(method, path):
+    """
+    TTL de reserva do endpoint quando o GET está em API_CACHE_CONDICIONAL,
+    ou None se ele não deve passar pelo cache condicional.
+    """
+    if method != 'get':
+        return None
+    return getattr(settings, 'API_CACHE_CONDICIONAL', {}).get(
+        url_template(path))
+
+
+def _hash(texto):
+    return hashlib.sha256(texto.encode()).hexdigest()[:32]
+
+
+def chave_versao(token):
+    return f'api:cond:{_hash(token or "")}:versao'
+
+
+def get_cache_versoes():
+    """
+    cache das versões por usuário. as respostas ficam no cache local de
+    cada processo, mas a versão precisa ser a mesma em todos os workers:
+    uma escrita atendida por um deles descarta as respostas guardadas em
+    todos.
+    """
+    return caches[getattr(settings, 'API_CACHE_CONDICIONAL_VERSOES',
+                          'default')]
+
+
+def chave_resposta(token, path, params=None):
+    """
+    chave por usuário (hash do token) e por URL, incluindo a query string.
+    """
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return f'api:cond:{_hash(token or "")}:{_hash(f"{path}?{query}")}'
+
+
+def _max_age():
+    return getattr(settings, 'API_CACHE_CONDICIONAL_MAX_AGE', 3600)
+
+
+def entrada_valida(entrada, versao):
+    """
+    entradas gravadas antes de uma escrita do usuário (versão diferente)
+    são descartadas.
+    """
+    return entrada is not None and entrada['versao'] == versao
+
+
+def _fresca(entrada):
+    """
+    sem validadores a entrada vale até o TTL de reserva, sem ir à API; com
+    ETag/Last-Modified ela sempre é revalidada.
+    """
+    return (not entrada['etag'] and not entrada['last_modified'] and
+            time.time() < entrada['expira'])
+
+
+def cabecalhos_condicionais(entrada):
+    cabecalhos = {}
+    if entrada['etag']:
+        cabecalhos['If-None-Match'] = entrada['etag']
+    if entrada['last_modified']:
+        cabecalhos['If-Modified-Since'] = entrada['last_modified']
+    return cabecalhos
+
+
+def _texto(valor):
+    return valor if isinstance(valor, str) else None
+
+
+def nova_entrada(response, ttl, versao):
+    """
+    (entrada, timeout do cache) para uma resposta 200 em JSON, ou None se
+    ela não puder ser guardada. o corpo já decodificado vai junto para que
+    os acertos não precisem refazer o parse.
+    """
+    conteudo = getattr(response, 'content', None)
+    if response.status_code != 200 or not isinstance(conteudo, bytes):
+        return None
+    if 'no-store' in (_texto(response.headers.get('Cache-Control')) or ''):
+        return None
+    try:
+        dados = response.json()
+    except ValueError:
+        return None
+
+    entrada = {
+        'versao': versao,
+        'conteudo': conteudo,
+        'dados': dados,
+        'cabecalhos': {nome: response.headers[nome] for nome in _CABECALHOS
+                       if _texto(response.headers.get(nome))},
+        'etag': _texto(response.headers.get('ETag')),
+        'last_modified': _texto(response.headers.get('Last-Modified')),
+        'expira': time.time() + ttl,
+    }
+    if entrada['etag'] or entrada['last_modified']:
+        return entrada, _max_age()
+    return entrada, ttl
+
+
+def nova_versao():
+    # a chave de versão dura o mesmo que a entrada mais longa, então nunca
+    # expira antes das entradas gravadas sob a versão anterior.
+    return time.time_ns(), _max_age()
+
+
+class LeituraCondicional:
+    """
+    um GET com cache condicional: carrega a entrada guardada (se ainda
+    válida), diz se ela pode ser usada sem ir à API, monta os cabeçalhos
+    If-None-Match/If-Modified-Since e a nova entrada a partir da resposta.
+    a leitura e a gravação no cache ficam com o cliente (sync ou async).
+    """
+    def __init__(self, token, path, params, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.chave = chave_resposta(token, path, params)
+        self.chave_versao = chave_versao(token)
+        self.versao = None
+        self.entrada = None
+        self.disponivel = True
+
+    @classmethod
+    def para(cls, token, method, path, params=None):
+        ttl = regra_condicional(method, path)
+        return None if ttl is None else cls(token, path, params, ttl)
+
+    def carregar(self, valores):
+        """
+        recebe o resultado de ler_leituras([...]). com None (cache de
+        versões fora do ar) o GET vai à API sem condicionais e a resposta
+        não é guardada, porque não haveria como descartá-la depois.
+        """
+        if valores is None:
+            self.disponivel = False
+            return
+        self.versao = valores.get(self.chave_versao)
+        entrada = valores.get(self.chave)
+        self.entrada = entrada if entrada_valida(entrada, self.versao) \
+            else None
+
+    def fresca(self):
+        return self.entrada is not None and _fresca(self.entrada)
+
+    def cabecalhos(self, headers=None):
+        if self.entrada is None:
+            return headers
+        return {**cabecalhos_condicionais(self.entrada), **(headers or {})}
+
+    def nao_modificada(self, response):
+        return response.status_code == 304 and self.entrada is not None
+
+    def nova_entrada(self, response):
+        """
+        (entrada, timeout) a gravar em self.chave, ou None.
+        """
+        if not self.disponivel:
+            return None
+        return nova_entrada(response, self.ttl, self.versao)
+
+
+def ler_leituras(leituras):
+    """
+    entradas e versões de uma ou mais leituras, num get_many por cache, ou
+    None se o cache de versões falhar (Redis fora do ar, tabela de cache
+    ainda não criada): as leituras seguem como GETs comuns.
+    """
+    try:
+        versoes = get_cache_versoes().get_many(
+            {leitura.chave_versao for leitura in leituras})
+    except Exception as e:
+        logger.warning("Cache de versões indisponível: %s", e)
+        return None
+    return {**cache.get_many([leitura.chave for leitura in leituras]),
+            **versoes}
+
+
+async def aler_leituras(leituras):
+    try:
+        versoes = await get_cache_versoes().aget_many(
+            {leitura.chave_versao for leitura in leituras})
+    except Exception as e:
+        logger.warning("Cache de versões indisponível: %s", e)
+        return None
+    return {**await cache.aget_many([leitura.chave for leitura in leituras]),
+            **versoes}
+
+
+def invalidar_versao(token):
+    """
+    muda a versão do usuário depois de uma escrita. se o cache de versões
+    falhar a escrita já feita na API não é desfeita; só fica o aviso.
+    """
+    try:
+        get_cache_versoes().set(chave_versao(token), *nova_versao())
+    except Exception as e:
+        logger.warning("Cache de versões indisponível: %s", e)
+
+
+async def ainvalidar_versao(token):
+    try:
+        await get_cache_versoes().aset(chave_versao(token), *nova_versao())
+    except Exception as e:
+        logger.warning("Cache de versões indisponível: %s", e)
+
+
+class RespostaEmCache(requests.Response):
+    """
+    resposta montada a partir do cache condicional (acerto por TTL ou 304
+    da API). .json() devolve o corpo guardado, sem parse.
+    """
+    from_cache = True
+
+    def __init__(self, entrada, url):
+        super().__init__()
+        self.status_code = 200
+        self._content = entrada['conteudo']
+        self.headers.update(entrada['cabecalhos'])
+        self.encoding = 'utf-8'
+        self.url = url
+        self._dados = entrada['dados']
+
+    def json(self, **kwargs):
+        return self._dados
@@ -0,0 +1,76 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'API_FANOUT_WORKERS', 10)
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='api-fanout')
+    return _executor
+
+
+class FanOut:
+    """
+    agrupa as chamadas à API de uma view. cada chamada declara de quais
+    outras depende e recebe os resultados delas como argumentos; as que
+    não dependem entre si rodam em paralelo.
+
+        fanout = FanOut()
+        fanout.add('perfil', buscar_perfil)
+        fanout.add('saldo', buscar_saldo)
+        fanout.add('investimentos', buscar_investimentos, depends=['perfil'])
+        resultados, erros = fanout.run()
+
+    uma chamada que falha vai para `erros` junto com as que dependiam dela,
+    sem impedir as demais de terminar.
+    """
+    def __init__(self):
+        self.calls = {}
+
+    def add(self, name, func, depends=()):
+        self.calls[name] = (func, tuple(depends))
+
+    def run(self):
+        executor = get_executor()
+        results = {}
+        errors = {}
+        pending = dict(self.calls)
+        running = {}
+
+        while pending or running:
+            for name, (func, depends) in list(pending.items()):
+                failed = [d for d in depends if d in errors]
+                if failed:
+                    errors[name] = errors[failed[0]]
+                    del pending[name]
+                elif all(d in results for d in depends):
+                    args = [results[d] for d in depends]
+                    ctx = contextvars.copy_context()
+                    running[executor.submit(ctx.run, func, *args)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(
+                        f"Dependências inválidas em: {', '.join(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = e
+
+        return results, errors
@@ -0,0 +1,81 @@
+import contextvars
+import re
+import threading
+import time
+
+_UUID = re.compile(
+    r'/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+    r'[0-9a-fA-F]{12}(?=/|$)')
+_NUMERO = re.compile(r'/\d+(?=/|$)')
+
+_chamadas = contextvars.ContextVar('chamadas_api', default=None)
+
+
+def url_template(path):
+    """
+    caminho da API com ids trocados por {id}, para agrupar as chamadas
+    (ex.: /internal/investimentos/cliente/{id}/).
+    """
+    return _NUMERO.sub('/{id}', _UUID.sub('/{id}', path))
+
+
+def iniciar_registro():
+    """
+    passa a registrar as chamadas à API feitas no contexto atual (e nas
+    threads do FanOut, que herdam o contexto). retorna o token para
+    encerrar_registro.
+    """
+    return _chamadas.set([])
+
+
+def encerrar_registro(token):
+    chamadas = _chamadas.get() or []
+    _chamadas.reset(token)
+    return chamadas
+
+
+def registrar_chamada(metodo, path, status, inicio, tamanho):
+    chamadas = _chamadas.get()
+    if chamadas is None:
+        return
+    chamadas.append({
+        'metodo': metodo.upper(),
+        'url': url_template(path),
+        'status': status,
+        'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'bytes': tamanho,
+    })
+
+
+class MetricasPorView:
+    """
+    agregados por view desde o início do processo: requisições, chamadas à
+    API, erros da API e tempo acumulado esperando por ela.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def adicionar(self, view, chamadas):
+        with self._lock:
+            m = self._views.setdefault(view, {
+                'requisicoes': 0, 'chamadas': 0, 'erros': 0,
+                'tempo_api_ms': 0.0,
+            })
+            m['requisicoes'] += 1
+            m['chamadas'] += len(chamadas)
+            m['erros'] += sum(1 for c in chamadas
+                              if not isinstance(c['status'], int) or
+                              c['status'] >= 500)
+            m['tempo_api_ms'] += sum(c['duracao_ms'] for c in chamadas)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: dict(m) for view, m in self._views.items()}
+
+    def zerar(self):
+        with self._lock:
+            self._views.clear()
+
+
+metricas_por_view = MetricasPorView()
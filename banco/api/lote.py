@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+# status do endpoint de lote que indicam que a API não o implementa
+_SEM_SUPORTE = (404, 405, 501)
+
+_sem_lote_ate = 0.0
+_sem_lote_lock = threading.Lock()
+
+
+def get_lote_path():
+    return getattr(settings, 'API_BATCH_PATH', None)
+
+
+def lote_disponivel():
+    return bool(get_lote_path()) and time.monotonic() >= _sem_lote_ate
+
+
+def marcar_sem_lote():
+    """
+    a API respondeu que não tem o endpoint de lote: as leituras voltam a
+    ser individuais por API_BATCH_RETENTAR segundos antes de tentar de novo.
+    """
+    global _sem_lote_ate
+    with _sem_lote_lock:
+        _sem_lote_ate = time.monotonic() + getattr(
+            settings, 'API_BATCH_RETENTAR', 300)
+
+
+def resetar_lote():
+    global _sem_lote_ate
+    with _sem_lote_lock:
+        _sem_lote_ate = 0.0
+
+
+class LoteSemSuporte(Exception):
+    pass
+
+
+def payload_lote(pendentes):
+    """
+    corpo do POST ao endpoint de lote a partir de
+    {nome: (path, params, cabeçalhos)}.
+    """
+    return {'requests': [
+        {'id': nome, 'method': 'GET', 'path': path, 'params': params or {},
+         'headers': headers or {}}
+        for nome, (path, params, headers) in pendentes.items()
+    ]}
+
+
+def respostas_lote(response):
+    """
+    {nome: item} da resposta do endpoint de lote. levanta LoteSemSuporte se
+    a API não tem o endpoint e RequestException se ele falhou.
+    """
+    if response.status_code in _SEM_SUPORTE:
+        raise LoteSemSuporte()
+    if response.status_code != 200:
+        raise requests.HTTPError(
+            f"Lote falhou com status {response.status_code}.",
+            response=response)
+    try:
+        itens = response.json()['responses']
+    except (ValueError, KeyError, TypeError) as e:
+        raise requests.RequestException(
+            f"Resposta de lote inválida: {e}") from e
+    return {item['id']: item for item in itens}
+
+
+class RespostaDoLote(requests.Response):
+    """
+    resposta de um item do lote, com a mesma interface das respostas
+    individuais (status_code, headers, json(), content). o corpo já chega
+    decodificado junto com o lote.
+    """
+    def __init__(self, item, url):
+        super().__init__()
+        self.status_code = item['status']
+        self.headers.update(item.get('headers') or {})
+        self.encoding = 'utf-8'
+        self.url = url
+        self._dados = item.get('body')
+
+    @property
+    def content(self):
+        if self._content is False:
+            self._content = b'' if self._dados is None else \
+                json.dumps(self._dados).encode()
+        return self._content
+
+    def json(self, **kwargs):
+        if self._dados is None:
+            raise requests.JSONDecodeError("Resposta sem corpo.", '', 0)
+        return self._dados
+
+
+class Lote:
+    """
+    leituras (GET) de que uma view precisa, declaradas por nome. cada rodada
+    de leituras independentes sai numa única chamada ao endpoint de lote da
+    API (API_BATCH_PATH); sem ele, em chamadas individuais em paralelo.
+    respostas ainda válidas no cache condicional não saem do processo.
+
+        lote = Lote()
+        lote.add('conta', '/contas/')
+        lote.add('clientes', '/internal/clientes/')
+        lote.add('investimentos', caminho_investimentos, depends=['clientes'])
+        respostas, erros = lote.run(api)        # ou await lote.arun(api)
+
+    `path` pode ser uma função que recebe as respostas das dependências e
+    devolve o caminho, ou None para pular a leitura. como no FanOut, uma
+    leitura que falha vai para `erros` junto com as que dependiam dela.
+    """
+    def __init__(self):
+        self.itens = {}
+
+    def add(self, name, path, params=None, depends=()):
+        self.itens[name] = (path, params, tuple(depends))
+
+    def _rodada(self, pendentes, respostas, erros):
+        prontos = {}
+        antes = len(pendentes)
+        for name, (path, params, depends) in list(pendentes.items()):
+            failed = [d for d in depends if d in erros]
+            if failed:
+                erros[name] = erros[failed[0]]
+                del pendentes[name]
+            elif all(d in respostas for d in depends):
+                del pendentes[name]
+                if callable(path):
+                    try:
+                        path = path(*[respostas[d] for d in depends])
+                    except Exception as e:
+                        erros[name] = e
+                        continue
+                if path is None:
+                    respostas[name] = None
+                else:
+                    prontos[name] = (path, params)
+
+        if len(pendentes) == antes:
+            raise ValueError(
+                f"Dependências inválidas em: {', '.join(pendentes)}")
+        return prontos
+
+    @staticmethod
+    def _distribuir(resultados, respostas, erros):
+        for name, resultado in resultados.items():
+            if isinstance(resultado, Exception):
+                erros[name] = resultado
+            else:
+                respostas[name] = resultado
+
+    def run(self, api):
+        respostas, erros = {}, {}
+        pendentes = dict(self.itens)
+        while pendentes:
+            prontos = self._rodada(pendentes, respostas, erros)
+            if prontos:
+                self._distribuir(api.get_lote(prontos), respostas, erros)
+        return respostas, erros
+
+    async def arun(self, api):
+        respostas, erros = {}, {}
+        pendentes = dict(self.itens)
+        while pendentes:
+            prontos = self._rodada(pendentes, respostas, erros)
+            if prontos:
+                self._distribuir(await api.get_lote(prontos), respostas,
+                                 erros)
+        return respostas, erros
@@ -0,0 +1,214 @@
+import bisect
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+from .cache import _aflight, aget_or_fetch, get_or_fetch
+from .client import ApiClient
+from .fanout import get_executor
+
+
+def get_quote_ttl():
+    return getattr(settings, 'MARKET_QUOTE_TTL', 15)
+
+
+def buscar_cotacao(api, ticker):
+    """
+    cotação de `ticker` como (dados, status). respostas 200 são
+    compartilhadas entre todos os usuários por MARKET_QUOTE_TTL segundos.
+    """
+    ticker = ticker.strip().upper()
+
+    def fetch():
+        response = api.get("/internal/market/",
+                           params={'action': 'quote', 'ticker': ticker},
+                           timeout=5)
+        return response.json(), response.status_code
+
+    return get_or_fetch(f"market:quote:{ticker}", get_quote_ttl(), fetch,
+                        cacheable=lambda value: value[1] == 200)
+
+
+async def abuscar_cotacao(api, ticker):
+    """
+    buscar_cotacao para views async, com `api` um AsyncApiClient.
+    """
+    ticker = ticker.strip().upper()
+
+    async def fetch():
+        response = await api.get("/internal/market/",
+                                 params={'action': 'quote', 'ticker': ticker},
+                                 timeout=5)
+        return response.json(), response.status_code
+
+    return await aget_or_fetch(f"market:quote:{ticker}", get_quote_ttl(),
+                               fetch, cacheable=lambda value: value[1] == 200)
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+
+
+class TickerIndex:
+    """
+    índice em memória de tickers e nomes para o autocomplete. buscas por
+    prefixo usam listas ordenadas (bisect); substrings só são varridas
+    quando os prefixos não preenchem o limite.
+    """
+    def __init__(self, itens):
+        self.itens = [
+            {'ticker': i['ticker'], 'nome': i.get('nome', '')}
+            for i in itens if i.get('ticker')
+        ]
+        self.textos = []
+        self.tickers = []
+        self.palavras = []
+
+        for pos, item in enumerate(self.itens):
+            ticker = normalizar(item['ticker'])
+            nome = normalizar(item['nome'])
+            self.textos.append(f"{ticker} {nome}")
+            self.tickers.append((ticker, pos))
+            for palavra in nome.split():
+                self.palavras.append((palavra, pos))
+
+        self.tickers.sort()
+        self.palavras.sort()
+
+    def __len__(self):
+        return len(self.itens)
+
+    @staticmethod
+    def _prefixo(ordenada, termo):
+        inicio = bisect.bisect_left(ordenada, (termo,))
+        for chave, pos in ordenada[inicio:]:
+            if not chave.startswith(termo):
+                break
+            yield chave, pos
+
+    def search(self, query, limit=10):
+        termo = normalizar(query).strip()
+        if not termo:
+            return []
+
+        # menor rank = melhor: ticker exato, prefixo do ticker, prefixo de
+        # uma palavra do nome e, por último, substring em qualquer lugar.
+        ranks = {}
+        for chave, pos in self._prefixo(self.tickers, termo):
+            ranks[pos] = 0 if chave == termo else 1
+        for _, pos in self._prefixo(self.palavras, termo):
+            ranks.setdefault(pos, 2)
+        if len(ranks) < limit:
+            for pos, texto in enumerate(self.textos):
+                if pos not in ranks and termo in texto:
+                    ranks[pos] = 3
+
+        melhores = sorted(ranks, key=lambda pos: (
+            ranks[pos], len(self.itens[pos]['ticker']),
+            self.itens[pos]['ticker']))
+        return [self.itens[pos] for pos in melhores[:limit]]
+
+
+_index = None
+_index_expira = 0.0
+_index_lock = threading.Lock()
+
+
+def carregar_ticker_index(api):
+    response = api.get("/internal/market/", params={'action': 'list'},
+                       timeout=10)
+    if response.status_code != 200:
+        return None
+    return TickerIndex(response.json())
+
+
+def _guardar_ticker_index(index):
+    """
+    guarda o índice carregado. None (lista com erro ou sem suporte na API)
+    só substitui um índice vazio: fica um índice vazio por
+    MARKET_INDEX_FALHA_TTL segundos, para que cada busca não pague uma
+    nova tentativa de carga antes de ir à API.
+    """
+    global _index, _index_expira
+    if index is not None:
+        _index = index
+        _index_expira = time.monotonic() + getattr(
+            settings, 'MARKET_INDEX_TTL', 3600)
+    elif not _index:
+        _index = TickerIndex([])
+        _index_expira = time.monotonic() + getattr(
+            settings, 'MARKET_INDEX_FALHA_TTL', 60)
+
+
+def _recarregar_ticker_index(api):
+    try:
+        index = carregar_ticker_index(api)
+    except Exception:
+        index = None
+    _guardar_ticker_index(index)
+
+
+def get_ticker_index(api):
+    """
+    índice de tickers do processo. a primeira chamada o carrega; depois de
+    MARKET_INDEX_TTL segundos ele é recarregado em segundo plano enquanto o
+    índice antigo continua atendendo. vazio se não foi possível carregá-lo.
+    """
+    global _index_expira
+    agora = time.monotonic()
+    if _index is not None and agora < _index_expira:
+        return _index
+
+    if not _index_lock.acquire(blocking=_index is None):
+        return _index
+    try:
+        if _index is None:
+            _recarregar_ticker_index(api)
+        elif agora >= _index_expira:
+            _index_expira = agora + getattr(settings, 'MARKET_INDEX_TTL',
+                                            3600)
+            get_executor().submit(_recarregar_ticker_index, api)
+    finally:
+        _index_lock.release()
+    return _index
+
+
+async def aget_ticker_index(api):
+    """
+    get_ticker_index para views async. a primeira carga é feita com o
+    cliente async (buscas simultâneas esperam a mesma carga); a recarga
+    periódica continua em segundo plano no executor.
+    """
+    global _index_expira
+    agora = time.monotonic()
+    if _index is not None and agora < _index_expira:
+        return _index
+
+    if _index is None:
+        async def carregar():
+            try:
+                response = await api.get("/internal/market/",
+                                         params={'action': 'list'},
+                                         timeout=10)
+                index = TickerIndex(response.json()) \
+                    if response.status_code == 200 else None
+            except Exception:
+                index = None
+            _guardar_ticker_index(index)
+
+        await _aflight.do('market:ticker_index', carregar)
+        return _index
+
+    if _index_lock.acquire(blocking=False):
+        try:
+            if agora >= _index_expira:
+                _index_expira = agora + getattr(settings, 'MARKET_INDEX_TTL',
+                                                3600)
+                get_executor().submit(_recarregar_ticker_index,
+                                      ApiClient(api.token))
+        finally:
+            _index_lock.release()
+    return _index
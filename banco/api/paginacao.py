@@ -0,0 +1,78 @@
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from django.conf import settings
+
+
+class ErroPaginacao(requests.RequestException):
+    """
+    a API respondeu uma página com status de erro. herda de
+    RequestException para cair nos mesmos fallbacks das views.
+    """
+    def __init__(self, path, pagina, status):
+        super().__init__(f"{path} página {pagina}: status {status}")
+        self.status = status
+
+
+def get_pagina_tamanho():
+    return getattr(settings, 'API_PAGINA_TAMANHO', 500)
+
+
+def _parametros(params, pagina, tamanho):
+    return {**(params or {}), 'page': pagina,
+            'page_size': tamanho or get_pagina_tamanho()}
+
+
+def _itens_da_pagina(response, path, pagina):
+    """
+    (itens, tem_proxima) de uma resposta no formato do PageNumberPagination
+    ({count, next, results}). uma lista simples é a coleção inteira, de uma
+    API que ignora ?page=.
+    """
+    if response.status_code != 200:
+        raise ErroPaginacao(path, pagina, response.status_code)
+    dados = response.json()
+    if isinstance(dados, list):
+        return dados, False
+    return dados.get('results') or [], bool(dados.get('next'))
+
+
+def cursor_de(link):
+    """
+    valor de ?cursor= de um link next/previous do CursorPagination do DRF,
+    ou None no fim da listagem.
+    """
+    if not link:
+        return None
+    return parse_qs(urlsplit(link).query).get('cursor', [None])[0]
+
+
+def iterar_paginas(api, path, params=None, tamanho=None):
+    """
+    gera as páginas (listas de itens) de um endpoint de listagem, pedindo a
+    próxima só quando a anterior foi consumida: só uma página fica em
+    memória por vez.
+    """
+    pagina = 1
+    while True:
+        response = api.get(path, params=_parametros(params, pagina, tamanho))
+        itens, tem_proxima = _itens_da_pagina(response, path, pagina)
+        yield itens
+        if not tem_proxima:
+            return
+        pagina += 1
+
+
+async def aiterar_paginas(api, path, params=None, tamanho=None):
+    """
+    iterar_paginas para o AsyncApiClient.
+    """
+    pagina = 1
+    while True:
+        response = await api.get(path,
+                                 params=_parametros(params, pagina, tamanho))
+        itens, tem_proxima = _itens_da_pagina(response, path, pagina)
+        yield itens
+        if not tem_proxima:
+            return
+        pagina += 1
@@ -0,0 +1,151 @@
+import hashlib
+
+import requests
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.middleware.csrf import rotate_token
+
+from banco.api import ApiClient
+
+USUARIO_SESSION_KEY = 'usuario_api'
+
+CAMPOS_USUARIO = ('first_name', 'last_name', 'email')
+
+
+def chave_dados_usuario(user):
+    # pelo username (e-mail), que existe tanto no UsuarioApi quanto nos
+    # usuários do banco; o UsuarioApi não tem pk.
+    username = hashlib.sha256(user.get_username().encode()).hexdigest()
+    return f'usuario:{username[:32]}:dados'
+
+
+def guardar_dados_usuario(user, dados):
+    """
+    guarda nome e e-mail vindos de /users/me/ no cache por
+    USUARIO_CACHE_TTL segundos.
+    """
+    dados = {campo: dados.get(campo) or '' for campo in CAMPOS_USUARIO}
+    cache.set(chave_dados_usuario(user), dados,
+              getattr(settings, 'USUARIO_CACHE_TTL', 600))
+    return dados
+
+
+def invalidar_dados_usuario(user):
+    cache.delete(chave_dados_usuario(user))
+
+
+class UsuarioApi(AnonymousUser):
+    """
+    usuário autenticado pela API. é montado a partir da sessão a cada
+    requisição e nunca vai para o banco: verificar `is_authenticated` não
+    faz nenhuma consulta, e nome/sobrenome vêm do cache de /users/me/ só
+    quando usados. não tem permissões de staff; o admin continua usando os
+    usuários do banco (ModelBackend).
+    """
+    def __init__(self, email):
+        self.email = self.username = email
+
+    def __str__(self):
+        return self.email
+
+    def __eq__(self, other):
+        return isinstance(other, UsuarioApi) and other.email == self.email
+
+    def __hash__(self):
+        return hash(self.email)
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    def _dados(self):
+        return cache.get(chave_dados_usuario(self)) or {}
+
+    @property
+    def first_name(self):
+        return self._dados().get('first_name', '')
+
+    @property
+    def last_name(self):
+        return self._dados().get('last_name', '')
+
+    def get_username(self):
+        return self.email
+
+    def has_perm(self, perm, obj=None):
+        return False
+
+    def has_perms(self, perm_list, obj=None):
+        return False
+
+    def has_module_perms(self, module):
+        return False
+
+
+class ApiTokenBackend(BaseBackend):
+    """
+    autentica pelo token da API: busca /users/me/, guarda nome e e-mail no
+    cache do usuário e devolve um UsuarioApi. use com login_api(), que só
+    mexe na sessão; django.contrib.auth.login() gravaria last_login no
+    banco.
+    """
+    def authenticate(self, request, token=None, email=None):
+        if not token:
+            return None
+        try:
+            response = ApiClient(token).get("/users/me/")
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+
+        dados = {'email': email, **response.json()}
+        usuario = UsuarioApi(dados['email'])
+        guardar_dados_usuario(usuario, dados)
+        return usuario
+
+    def get_user(self, user_id):
+        # UsuarioApi vem da sessão (get_usuario), nunca de um id do banco
+        return None
+
+
+def login_api(request, token, usuario):
+    """
+    login só na sessão: troca a chave da sessão e o token CSRF, como o
+    login() do Django, e guarda o token e o e-mail do usuário.
+    """
+    if request.session.get(USUARIO_SESSION_KEY) != usuario.email:
+        request.session.flush()
+    else:
+        request.session.cycle_key()
+    request.session['auth_token'] = token
+    request.session[USUARIO_SESSION_KEY] = usuario.email
+    request.user = usuario
+    rotate_token(request)
+
+
+def get_usuario(request):
+    """
+    UsuarioApi da sessão, ou o usuário do banco (admin, staff) pelo
+    mecanismo padrão do Django.
+    """
+    if not hasattr(request, '_cached_user'):
+        email = request.session.get(USUARIO_SESSION_KEY)
+        request._cached_user = UsuarioApi(email) if email else \
+            auth.get_user(request)
+    return request._cached_user
+
+
+async def aget_usuario(request):
+    if not hasattr(request, '_acached_user'):
+        email = await request.session.aget(USUARIO_SESSION_KEY)
+        request._acached_user = UsuarioApi(email) if email else \
+            await auth.aget_user(request)
+    return request._acached_user
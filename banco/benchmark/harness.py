@@ -0,0 +1,265 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlencode
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from banco.api import resetar_lote
+from banco.autenticacao import (
+    USUARIO_SESSION_KEY,
+    UsuarioApi,
+    guardar_dados_usuario
+)
+
+from .stub_api import TOKEN
+
+CENARIOS = {
+    'home': ('home_page', {}),
+    'dashboard': ('investimentos_dashboard_page', {}),
+    'carteira': ('listar_investimentos_page', {}),
+    'analytics': ('ajax_analytics_carteira', {'periodo': '5y'}),
+    'market_quote': ('ajax_market_data', {'action': 'quote',
+                                          'ticker': 'PETR4'}),
+    'market_search': ('ajax_market_data', {'action': 'search', 'q': 'PE'}),
+    'extrato': ('extrato_page', {}),
+    # página do fundo de um histórico longo (cursor da API simulada)
+    'extrato_rolagem': ('ajax_extrato', {'cursor': '4000'}),
+    'exportar_csv': ('exportar_carteira_page', {}, ('csv',)),
+    'exportar_xlsx': ('exportar_carteira_page', {}, ('xlsx',)),
+}
+
+
+def get_usuario():
+    return UsuarioApi('bench@pyinvest.local')
+
+
+DADOS_USUARIO = {'first_name': 'Bench', 'last_name': 'Mark',
+                 'email': 'bench@pyinvest.local'}
+
+
+def novo_cliente(usuario):
+    """
+    navegador simulado já autenticado, com o token da API na sessão e os
+    dados do usuário no cache, como depois do login.
+    """
+    client = Client()
+    session = client.session
+    session['auth_token'] = TOKEN
+    session[USUARIO_SESSION_KEY] = usuario.email
+    session.save()
+    # com signed_cookies a chave é o próprio conteúdo e muda a cada save
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    guardar_dados_usuario(usuario, DADOS_USUARIO)
+    return client
+
+
+async def novo_cliente_async(usuario):
+    client = AsyncClient()
+    session = await client.asession()
+    await session.aset('auth_token', TOKEN)
+    await session.aset(USUARIO_SESSION_KEY, usuario.email)
+    await session.asave()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    await sync_to_async(guardar_dados_usuario)(usuario, DADOS_USUARIO)
+    return client
+
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+
+
+def executar_cenario(nome, stub, requisicoes=100, concorrencia=4,
+                     usuario=None, session_engine=SESSION_ENGINE, asgi=False):
+    """
+    dispara `requisicoes` GETs na página do cenário, `concorrencia` por
+    vez, cada worker com sua própria sessão. o cache é limpo antes, então
+    os números incluem as primeiras requisições (frias). respostas em fluxo
+    (exportações) são lidas até o fim.
+
+    por padrão cada worker é uma thread passando pelo handler WSGI; com
+    `asgi=True` os workers são tarefas num único event loop passando pelo
+    handler ASGI, como um worker uvicorn/daphne.
+
+    as sessões ficam no cache por padrão: o banco de testes em memória do
+    sqlite não aceita escritas concorrentes.
+    """
+    url_name, params, *args = CENARIOS[nome]
+    url = reverse(url_name, args=args[0] if args else None)
+    if params:
+        url = f"{url}?{urlencode(params)}"
+
+    # a API simulada tem o endpoint de lote (com lote=False ele responde 404)
+    with override_settings(API_BASE_URL=stub.url, API_BATCH_PATH='/batch/',
+                           SESSION_ENGINE=session_engine):
+        cache.clear()
+        resetar_lote()
+        usuario = usuario or get_usuario()
+        executar = _executar_asgi if asgi else _executar_wsgi
+
+        chamadas_antes = stub.total_chamadas()
+        nao_modificadas_antes = stub.nao_modificadas
+        inicio = time.perf_counter()
+        latencias, erros = executar(url, usuario, requisicoes, concorrencia)
+        duracao = time.perf_counter() - inicio
+        chamadas = stub.total_chamadas() - chamadas_antes
+        nao_modificadas = stub.nao_modificadas - nao_modificadas_antes
+
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    return {
+        'cenario': nome,
+        'requisicoes': requisicoes,
+        'concorrencia': concorrencia,
+        'erros': len(erros),
+        'req_s': round(requisicoes / duracao, 1),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'chamadas_por_pagina': round(chamadas / requisicoes, 2),
+        'nao_modificadas_por_pagina': round(nao_modificadas / requisicoes, 2),
+        'sessao': session_engine.rsplit('.', 1)[-1],
+    }
+
+
+def _executar_wsgi(url, usuario, requisicoes, concorrencia):
+    clientes = [novo_cliente(usuario) for _ in range(concorrencia)]
+    latencias = []
+    erros = []
+    lock = threading.Lock()
+    restantes = [requisicoes]
+
+    def worker(client):
+        try:
+            while True:
+                with lock:
+                    if restantes[0] <= 0:
+                        return
+                    restantes[0] -= 1
+                inicio = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                duracao = time.perf_counter() - inicio
+                with lock:
+                    latencias.append(duracao)
+                    if response.status_code != 200:
+                        erros.append(response.status_code)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for future in [executor.submit(worker, c) for c in clientes]:
+            future.result()
+    return latencias, erros
+
+
+def _executar_asgi(url, usuario, requisicoes, concorrencia):
+    # o loop roda na thread atual e o código síncrono (middlewares, ORM,
+    # templates) vai para a thread única do asgiref, como no uvicorn.
+    return asyncio.run(_executar_asgi_loop(url, usuario, requisicoes,
+                                           concorrencia))
+
+
+async def _executar_asgi_loop(url, usuario, requisicoes, concorrencia):
+    clientes = [await novo_cliente_async(usuario)
+                for _ in range(concorrencia)]
+    latencias = []
+    erros = []
+    restantes = [requisicoes]
+
+    async def worker(client):
+        while restantes[0] > 0:
+            restantes[0] -= 1
+            inicio = time.perf_counter()
+            response = await client.get(url)
+            if response.streaming:
+                async for _ in response.streaming_content:
+                    pass
+            latencias.append(time.perf_counter() - inicio)
+            if response.status_code != 200:
+                erros.append(response.status_code)
+
+    await asyncio.gather(*(worker(c) for c in clientes))
+    return latencias, erros
+
+
+def executar_benchmark(stub, cenarios=None, requisicoes=100,
+                       concorrencia=4, session_engine=SESSION_ENGINE,
+                       asgi=False):
+    usuario = get_usuario()
+    return [
+        executar_cenario(nome, stub, requisicoes, concorrencia, usuario,
+                         session_engine, asgi)
+        for nome in (cenarios or CENARIOS)
+    ]
+
+
+def medir_sessao(session_engine, requisicoes=1000):
+    """
+    custo médio, em µs, de carregar a sessão de uma requisição autenticada
+    (ler o token) e de gravar uma alteração nela, isolado do resto da
+    página. `cookie_bytes` é o tamanho do valor do cookie de sessão.
+    """
+    engine = import_module(session_engine)
+    with override_settings(SESSION_ENGINE=session_engine):
+        session = engine.SessionStore()
+        session['auth_token'] = TOKEN
+        session.save()
+        chave = session.session_key
+
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            engine.SessionStore(chave).get('auth_token')
+        leitura = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for i in range(requisicoes):
+            session = engine.SessionStore(chave)
+            session['contador'] = i
+            session.save()
+            chave = session.session_key
+        gravacao = time.perf_counter() - inicio
+
+        engine.SessionStore(chave).delete()
+
+    return {
+        'sessao': session_engine.rsplit('.', 1)[-1],
+        'leitura_us': round(leitura / requisicoes * 1e6, 1),
+        'gravacao_us': round(gravacao / requisicoes * 1e6, 1),
+        'cookie_bytes': len(chave),
+    }
+
+
+def _tabela(resultados, colunas, titulos):
+    linhas = [titulos] + [tuple(str(r[c]) for c in colunas)
+                          for r in resultados]
+    larguras = [max(len(linha[i]) for linha in linhas)
+                for i in range(len(colunas))]
+    return '\n'.join(
+        '  '.join(valor.ljust(largura) if i == 0 else valor.rjust(largura)
+                  for i, (valor, largura) in enumerate(zip(linha, larguras)))
+        for linha in linhas
+    )
+
+
+def formatar_relatorio(resultados):
+    return _tabela(
+        resultados,
+        ('cenario', 'sessao', 'req_s', 'p50_ms', 'p95_ms', 'p99_ms',
+         'chamadas_por_pagina', 'nao_modificadas_por_pagina', 'erros'),
+        ('cenário', 'sessão', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+         'chamadas/pág', '304/pág', 'erros'))
+
+
+def formatar_sessoes(resultados):
+    return _tabela(
+        resultados,
+        ('sessao', 'leitura_us', 'gravacao_us', 'cookie_bytes'),
+        ('sessão', 'leitura µs', 'gravação µs', 'cookie bytes'))
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CLIENTE_ID = '6f1c2a9e-0000-4000-8000-000000000001'
+TOKEN = 'stub-token'
+
+TIPOS = ('RENDA_FIXA', 'ACOES', 'FUNDOS', 'CRIPTO')
+SETORES = ('Petro', 'Vale', 'Banco', 'Energia', 'Varejo', 'Saneamento',
+           'Logística', 'Seguros', 'Telecom', 'Agro')
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # cabeçalhos e corpo saem em escritas separadas; com Nagle ligado cada
+    # resposta keep-alive esperaria o ACK atrasado do cliente (~40 ms).
+    disable_nagle_algorithm = True
+
+    def _responder(self):
+        partes = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(partes.query).items()}
+
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+
+        status, corpo, etag = self.server.stub.responder(
+            self.command, partes.path, params,
+            self.headers.get('If-None-Match'), corpo)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _responder
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubApi:
+    """
+    servidor HTTP local que imita as rotas da PYInvest API usadas pelo
+    frontend, com latência e tamanho das respostas configuráveis. conta as
+    chamadas recebidas por rota para medir quantas idas ao backend cada
+    página faz. com `etags=True` os GETs respondem com ETag e devolvem 304
+    sem corpo para um If-None-Match igual (contados em `nao_modificadas`).
+    com `lote=True` o POST /batch/ responde várias leituras numa só chamada.
+    a lista de investimentos é paginada quando pedida com ?page= e o
+    extrato (/conta/movimentacoes/) sempre por cursor, sem ETag.
+
+        with StubApi(latencia=0.02, investimentos=50) as stub:
+            with override_settings(API_BASE_URL=stub.url):
+                ...
+    """
+    def __init__(self, latencia=0.0, investimentos=20, pontos=1000,
+                 tickers=2000, movimentacoes=200, etags=True, lote=True,
+                 host='127.0.0.1', porta=0):
+        self.latencia = latencia
+        self.etags = etags
+        self.lote = lote
+        self.chamadas = Counter()
+        self.nao_modificadas = 0
+        self._lock = threading.Lock()
+        self._respostas = self._montar_respostas(investimentos, pontos,
+                                                 tickers)
+        self._etags = {rota: f'"{hashlib.md5(corpo).hexdigest()}"'
+                       for rota, corpo in self._respostas.items()}
+        self._payloads = {rota: json.loads(corpo)
+                          for rota, corpo in self._respostas.items()}
+        self._movimentacoes = self._montar_movimentacoes(movimentacoes)
+        self._server = _Servidor((host, porta), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self._server.server_address[:2]
+        return f"http://{host}:{porta}/api"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def total_chamadas(self):
+        with self._lock:
+            return sum(self.chamadas.values())
+
+    def zerar(self):
+        with self._lock:
+            self.chamadas.clear()
+            self.nao_modificadas = 0
+
+    @staticmethod
+    def _montar_respostas(n_investimentos, n_pontos, n_tickers):
+        tickers = [{'ticker': 'PETR4', 'nome': 'Petrobras PN'}]
+        for i in range(1, n_tickers):
+            letras = ''.join(chr(65 + i // 26 ** k % 26)
+                             for k in (3, 2, 1, 0))
+            tickers.append({'ticker': f"{letras}{3 + i % 9}",
+                            'nome': f"{SETORES[i % len(SETORES)]} {i} S.A."})
+
+        investimentos = []
+        for i in range(n_investimentos):
+            tipo = TIPOS[i % len(TIPOS)]
+            investimentos.append({
+                'id': f"00000000-0000-4000-8000-{i:012d}",
+                'tipo_investimento': tipo,
+                'ticker': (tickers[i % len(tickers)]['ticker']
+                           if tipo != 'RENDA_FIXA' and tickers else None),
+                'quantidade': 10 + i,
+                'preco_medio': 20.0 + i,
+                'valor_investido': round(1000.0 + 37.5 * i, 2),
+                'ativo': i % 7 != 6,
+            })
+
+        hoje = date.today()
+        datas = [(hoje - timedelta(days=n_pontos - i)).isoformat()
+                 for i in range(n_pontos)]
+        historico = {
+            'datas': datas,
+            'carteira_pct': [round(0.02 * i + 3 * math.sin(i / 15), 4)
+                             for i in range(n_pontos)],
+            'benchmark_pct': [round(0.015 * i + 2 * math.sin(i / 40), 4)
+                              for i in range(n_pontos)],
+        }
+
+        patrimonio = sum(i['valor_investido'] for i in investimentos
+                         if i['ativo'])
+        cliente = {
+            'id': CLIENTE_ID,
+            'perfil_investidor': 'MODERADO',
+            'patrimonio_total': patrimonio,
+        }
+
+        def corpo(payload):
+            return json.dumps(payload).encode()
+
+        return {
+            'users_me': corpo({'first_name': 'Bench', 'last_name': 'Mark',
+                               'email': 'bench@pyinvest.local'}),
+            'login': corpo({'token': TOKEN}),
+            'contas': corpo({'id': 1, 'ativa': True, 'agencia': '0001',
+                             'numero': '12345-6', 'saldo': 15000.0}),
+            'score': corpo({'saldo': 15000.0, 'score_credito': 742}),
+            'clientes': corpo([cliente]),
+            'cliente': corpo(cliente),
+            'investimentos': corpo(investimentos),
+            'analytics': corpo({
+                'metricas': {'retorno_total_pct': 18.4,
+                             'retorno_anualizado_pct': 9.1,
+                             'volatilidade_pct': 12.7},
+                'historico': historico,
+            }),
+            'quote': corpo({'ticker': 'PETR4', 'price': 37.42,
+                            'currency': 'BRL', 'exchange_rate': 1.0}),
+            'list': corpo(tickers),
+            'search': corpo(tickers[:10]),
+            'ok': corpo({'detail': 'ok'}),
+            'not_found': corpo({'detail': 'Não encontrado.'}),
+        }
+
+    @staticmethod
+    def _montar_movimentacoes(n):
+        agora = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        return [{
+            'id': n - i,
+            'tipo': 'SAQUE' if i % 3 == 2 else 'DEPOSITO',
+            'valor': round(50.0 + 12.5 * (i % 40), 2),
+            'data': (agora - timedelta(hours=7 * i)).isoformat(),
+        } for i in range(n)]
+
+    def _rota(self, metodo, caminho, params):
+        if caminho.startswith('/api'):
+            caminho = caminho[len('/api'):]
+
+        if metodo == 'GET':
+            if caminho == '/users/me/':
+                return 'users_me'
+            if caminho == '/contas/':
+                return 'contas'
+            if caminho == '/conta/score/':
+                return 'score'
+            if caminho == '/conta/movimentacoes/':
+                return 'movimentacoes'
+            if caminho == '/internal/clientes/':
+                return 'clientes'
+            if caminho.startswith('/internal/clientes/'):
+                return 'cliente'
+            if caminho.startswith('/internal/investimentos/cliente/'):
+                return 'investimentos'
+            if caminho.startswith('/internal/analytics/cliente/'):
+                return 'analytics'
+            if caminho == '/internal/market/':
+                acao = params.get('action')
+                if acao in ('quote', 'list', 'search'):
+                    return acao
+            if caminho == '/logout/':
+                return 'ok'
+        elif caminho == '/login/custom/':
+            return 'login'
+        elif caminho == '/batch/':
+            return 'batch' if self.lote and metodo == 'POST' else 'not_found'
+        elif metodo in ('POST', 'PATCH', 'DELETE'):
+            return 'ok'
+        return 'not_found'
+
+    def _resolver(self, metodo, caminho, params, if_none_match):
+        rota = self._rota(metodo, caminho, params)
+        etag = None
+        if self.etags and metodo == 'GET' and rota != 'not_found':
+            etag = self._etags.get(rota)
+        if etag and if_none_match == etag:
+            with self._lock:
+                self.nao_modificadas += 1
+            return rota, 304, etag
+        return rota, 404 if rota == 'not_found' else 200, etag
+
+    def _responder_lote(self, corpo):
+        respostas = []
+        for item in json.loads(corpo)['requests']:
+            rota, status, etag = self._resolver(
+                item['method'], item['path'], item.get('params') or {},
+                (item.get('headers') or {}).get('If-None-Match'))
+            respostas.append({
+                'id': item['id'],
+                'status': status,
+                'headers': {'ETag': etag} if etag else {},
+                'body': None if status == 304 else self._payloads[rota],
+            })
+        return json.dumps({'responses': respostas}).encode()
+
+    def _pagina(self, rota, params):
+        """
+        página de uma listagem no formato do PageNumberPagination do DRF.
+        """
+        itens = self._payloads[rota]
+        pagina = int(params['page'])
+        tamanho = int(params.get('page_size') or 100)
+        inicio = (pagina - 1) * tamanho
+        fim = inicio + tamanho
+        return json.dumps({
+            'count': len(itens),
+            'next': f"?page={pagina + 1}" if fim < len(itens) else None,
+            'previous': f"?page={pagina - 1}" if pagina > 1 else None,
+            'results': itens[inicio:fim],
+        }).encode()
+
+    def _pagina_cursor(self, params):
+        """
+        página do extrato no formato do CursorPagination do DRF (mais
+        recentes primeiro). o cursor aqui é só a posição na lista.
+        """
+        inicio = int(params.get('cursor') or 0)
+        fim = inicio + int(params.get('page_size') or 50)
+        proxima = None
+        if fim < len(self._movimentacoes):
+            proxima = f"{self.url}/conta/movimentacoes/?cursor={fim}"
+        return json.dumps({
+            'next': proxima,
+            'previous': None,
+            'results': self._movimentacoes[inicio:fim],
+        }).encode()
+
+    def responder(self, metodo, caminho, params, if_none_match=None,
+                  corpo=b''):
+        """
+        (status, corpo, etag) da rota. um lote conta como uma chamada.
+        """
+        rota, status, etag = self._resolver(metodo, caminho, params,
+                                            if_none_match)
+        with self._lock:
+            self.chamadas[rota] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if rota == 'batch':
+            return 200, self._responder_lote(corpo), None
+        if rota == 'investimentos' and 'page' in params and status == 200:
+            return 200, self._pagina(rota, params), None
+        if rota == 'movimentacoes':
+            return 200, self._pagina_cursor(params), None
+        if status == 304:
+            return 304, b'', etag
+        return status, self._respostas[rota], etag
@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from banco.autenticacao import CAMPOS_USUARIO
+from banco.views.user_front_end import get_dados_usuario
+
+
+def dados_usuario(request):
+    """
+    first_name, last_name e email do usuário logado em todos os templates,
+    vindos do cache por usuário. os valores só são resolvidos quando o
+    template os usa, então páginas que não mostram o nome não consultam
+    cache nem API.
+    """
+    dados = SimpleLazyObject(lambda: get_dados_usuario(request))
+    return {
+        campo: SimpleLazyObject(lambda campo=campo: dados.get(campo, ''))
+        for campo in CAMPOS_USUARIO
+    }
@@ -0,0 +1,186 @@
+import re
+from functools import lru_cache
+
+import rcssmin
+import rjsmin
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import (
+    StaticFilesStorage,
+    staticfiles_storage
+)
+from django.core.files.base import ContentFile
+from django.template.loader import get_template
+from django.templatetags.static import static
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+MINIFICADORES = {
+    '.css': rcssmin.cssmin,
+    '.js': rjsmin.jsmin,
+}
+
+
+def minificador(nome):
+    """
+    função que minifica o arquivo pelo nome, ou None para os que não são
+    CSS/JS ou já vêm minificados (*.min.css, *.min.js).
+    """
+    if '.min.' in nome:
+        return None
+    return MINIFICADORES.get(nome[nome.rfind('.'):])
+
+
+class ArmazenamentoEstatico(CompressedManifestStaticFilesStorage):
+    """
+    storage do collectstatic: minifica CSS/JS, grava cada arquivo com o
+    hash do conteúdo no nome (style.3f2a1c9e.css) e gera as versões .gz e
+    .br, que o WhiteNoise serve com cache imutável de um ano.
+
+    sem manifesto (collectstatic ainda não rodou, como em desenvolvimento e
+    nos testes) os nomes originais são usados.
+    """
+    def _save(self, name, content):
+        minificar = minificador(name)
+        if minificar is not None:
+            # o conteúdo pode já ter sido lido para calcular o hash
+            content.seek(0)
+            texto = content.read().decode('utf-8')
+            content = ContentFile(minificar(texto).encode('utf-8'))
+        return super()._save(name, content)
+
+    def url(self, name, force=False):
+        if not self.hashed_files:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+
+@lru_cache(maxsize=None)
+def vendorizada(caminho):
+    return finders.find(caminho) is not None
+
+
+def url_biblioteca(nome):
+    """
+    URL de uma biblioteca de BIBLIOTECAS_ESTATICAS: a cópia local em
+    base_static/vendor (ver o comando vendorizar_static), servida com hash e
+    compressão como os demais estáticos, ou o CDN enquanto ela não foi
+    baixada.
+    """
+    caminho, cdn, _ = settings.BIBLIOTECAS_ESTATICAS[nome]
+    return static(caminho) if vendorizada(caminho) else cdn
+
+
+def integridade_biblioteca(nome):
+    """
+    hash SRI para o atributo `integrity` quando a biblioteca vem do CDN, ou
+    None com a cópia local ou sem hash configurado.
+    """
+    caminho, _, integridade = settings.BIBLIOTECAS_ESTATICAS[nome]
+    return None if vendorizada(caminho) else integridade
+
+
+def caminho_estilo(nome):
+    """
+    folhas de estilo do site em base_static/global/css: `core` (tema,
+    cabeçalho, formulários e botões, usada por todas as páginas) e uma por
+    seção (`landing`, `conta`, `investimentos`).
+    """
+    return f'global/css/{nome}.css'
+
+
+def _ler_estilo(caminho):
+    if staticfiles_storage.hashed_files:
+        # já minificado pelo collectstatic
+        with staticfiles_storage.open(
+                staticfiles_storage.stored_name(caminho)) as arquivo:
+            return arquivo.read().decode('utf-8')
+    with open(finders.find(caminho), encoding='utf-8') as arquivo:
+        return rcssmin.cssmin(arquivo.read())
+
+
+_CLASSES_E_IDS = re.compile(r'[.#](-?[_a-zA-Z][-\w]*)')
+_ESTADOS = re.compile(r':(?:hover|focus|focus-visible|focus-within|active)\b')
+_ATRIBUTOS = re.compile(r'\b(?:class|id)="([^"]*)"')
+_TEMPLATES = re.compile(r'{%\s*(?:extends|include)\s+["\']([^"\']+)["\']')
+
+
+def nomes_do_template(nome):
+    """
+    classes e ids escritos no template, nos que ele estende e nos que
+    inclui (pelo nome literal). classes postas por JS não entram.
+    """
+    nomes, vistos, pendentes = set(), set(), [nome]
+    while pendentes:
+        nome = pendentes.pop()
+        if nome in vistos:
+            continue
+        vistos.add(nome)
+        fonte = get_template(nome).template.source
+        for valor in _ATRIBUTOS.findall(fonte):
+            nomes.update(valor.split())
+        pendentes.extend(_TEMPLATES.findall(fonte))
+    return nomes
+
+
+def _blocos(css):
+    """
+    (seletor ou regra @, conteúdo) de cada bloco de topo de um CSS
+    minificado.
+    """
+    blocos, nivel, inicio, abre = [], 0, 0, 0
+    for i, c in enumerate(css):
+        if c == '{':
+            if nivel == 0:
+                abre = i
+            nivel += 1
+        elif c == '}':
+            nivel -= 1
+            if nivel == 0:
+                blocos.append((css[inicio:abre].strip(), css[abre + 1:i]))
+                inicio = i + 1
+    return blocos
+
+
+def _seletor_usado(seletor, nomes):
+    return (not _ESTADOS.search(seletor) and
+            all(n in nomes for n in _CLASSES_E_IDS.findall(seletor)))
+
+
+def filtrar_css(css, nomes):
+    """
+    só as regras cujos seletores usam classes e ids de `nomes`. estados de
+    interação (:hover, :focus, :active) e @keyframes/@font-face ficam de
+    fora: não aparecem na primeira pintura.
+    """
+    saida = []
+    for cabecalho, corpo in _blocos(css):
+        if cabecalho.startswith('@media'):
+            interno = filtrar_css(corpo, nomes)
+            if interno:
+                saida.append(f'{cabecalho}{{{interno}}}')
+        elif not cabecalho.startswith('@'):
+            seletores = [s for s in cabecalho.split(',')
+                         if _seletor_usado(s, nomes)]
+            if seletores:
+                saida.append(f"{','.join(seletores)}{{{corpo}}}")
+    return ''.join(saida)
+
+
+def _estilo_critico(template, nomes):
+    usados = nomes_do_template(template)
+    return ''.join(filtrar_css(_ler_estilo(caminho_estilo(nome)), usados)
+                   for nome in nomes)
+
+
+_estilo_critico_em_cache = lru_cache(maxsize=None)(_estilo_critico)
+
+
+def estilo_critico(template, nomes):
+    """
+    CSS crítico de uma página de entrada: das folhas `nomes`, só as regras
+    que o template usa. como essas páginas cabem numa tela, é o CSS acima
+    da dobra; o resto chega com as folhas completas, sem bloquear.
+    """
+    if settings.DEBUG:
+        return _estilo_critico(template, tuple(nomes))
+    return _estilo_critico_em_cache(template, tuple(nomes))
@@ -0,0 +1,276 @@
+import codecs
+import csv
+import io
+import zipfile
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from xml.sax.saxutils import escape
+
+TIPOS = {
+    'RENDA_FIXA': 'Renda Fixa',
+    'ACOES': 'Ações',
+    'FUNDOS': 'Fundos',
+    'CRIPTO': 'Cripto',
+}
+
+COLUNAS = ('Ticker', 'Tipo', 'Quantidade', 'Preço médio', 'Valor investido',
+           'Ativo')
+
+
+def _numero(valor):
+    if valor is None or valor == '':
+        return None
+    try:
+        numero = Decimal(str(valor))
+    except InvalidOperation:
+        return None
+    return numero if numero.is_finite() else None
+
+
+def linha_investimento(investimento):
+    """
+    linha exportada de um investimento da API: textos, Decimal (ou None,
+    quando o campo não se aplica, como a quantidade na renda fixa) e bool.
+    """
+    tipo = investimento.get('tipo_investimento') or ''
+    return (
+        investimento.get('ticker') or '',
+        TIPOS.get(tipo, tipo),
+        _numero(investimento.get('quantidade')),
+        _numero(investimento.get('preco_medio')),
+        _numero(investimento.get('valor_investido')),
+        bool(investimento.get('ativo')),
+    )
+
+
+class ExportacaoCsv:
+    """
+    CSV em UTF-8 com BOM (para o Excel reconhecer a codificação), escrito
+    num buffer que é esvaziado a cada bloco de linhas.
+    """
+    content_type = 'text/csv; charset=utf-8'
+    extensao = 'csv'
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+
+    def _retirar(self):
+        texto = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return texto.encode('utf-8')
+
+    @staticmethod
+    def _celula(valor):
+        if valor is None:
+            return ''
+        if isinstance(valor, bool):
+            return 'sim' if valor else 'não'
+        if isinstance(valor, Decimal):
+            return format(valor, 'f')
+        return valor
+
+    def inicio(self):
+        self._csv.writerow(COLUNAS)
+        return codecs.BOM_UTF8 + self._retirar()
+
+    def linhas(self, linhas):
+        self._csv.writerows(tuple(map(self._celula, linha))
+                            for linha in linhas)
+        return self._retirar()
+
+    def fim(self):
+        return b''
+
+
+class _SaidaZip:
+    """
+    destino só de escrita do zipfile. sem tell()/seek() o zipfile grava
+    cada arquivo com data descriptor, sem voltar para corrigir o cabeçalho,
+    e os bytes podem ser enviados assim que saem do compressor.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+_NS_PLANILHA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_PACOTE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_NS_DOCUMENTO = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+                 'relationships')
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType='
+        '"application/vnd.openxmlformats-officedocument.spreadsheetml.'
+        'worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'<Relationships xmlns="{_NS_PACOTE}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOCUMENTO}/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        f'<workbook xmlns="{_NS_PLANILHA}" xmlns:r="{_NS_DOCUMENTO}">'
+        '<sheets><sheet name="Carteira" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'<Relationships xmlns="{_NS_PACOTE}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOCUMENTO}/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_NS_DOCUMENTO}/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # estilos: 0 padrão, 1 negrito (cabeçalho), 2 valor com duas casas
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_NS_PLANILHA}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/>'
+        '<diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" '
+        'borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" '
+        'applyFont="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" '
+        'applyNumberFormat="1"/>'
+        '</cellXfs><cellStyles count="1"><cellStyle name="Normal" '
+        'xfId="0" builtinId="0"/></cellStyles></styleSheet>'
+    ),
+}
+
+_LETRAS = 'ABCDEF'
+_ESTILOS = (0, 0, 0, 2, 2, 0)
+
+
+class ExportacaoXlsx:
+    """
+    planilha XLSX gerada em fluxo: o pacote zip é comprimido à medida que
+    as linhas chegam e cada bloco devolve só os bytes já prontos. os textos
+    vão inline nas células (sem a tabela de strings compartilhadas, que
+    exigiria guardar todas até o fim), então a memória usada não depende do
+    número de linhas.
+    """
+    content_type = ('application/vnd.openxmlformats-officedocument.'
+                    'spreadsheetml.sheet')
+    extensao = 'xlsx'
+
+    def __init__(self):
+        self._saida = _SaidaZip()
+        self._zip = zipfile.ZipFile(self._saida, 'w', zipfile.ZIP_DEFLATED)
+        self._planilha = None
+        self._linha = 0
+
+    @staticmethod
+    def _celula(referencia, valor, estilo=0):
+        s = f' s="{estilo}"' if estilo else ''
+        if isinstance(valor, bool):
+            return f'<c r="{referencia}"{s} t="b"><v>{int(valor)}</v></c>'
+        if isinstance(valor, Decimal):
+            return f'<c r="{referencia}"{s}><v>{valor:f}</v></c>'
+        return (f'<c r="{referencia}"{s} t="inlineStr"><is><t>'
+                f'{escape(valor)}</t></is></c>')
+
+    def _linha_xml(self, valores, estilos):
+        self._linha += 1
+        n = self._linha
+        celulas = ''.join(
+            self._celula(f'{letra}{n}', valor, estilo)
+            for letra, valor, estilo in zip(_LETRAS, valores, estilos)
+            if valor is not None and valor != ''
+        )
+        return f'<row r="{n}">{celulas}</row>'
+
+    def inicio(self):
+        for nome, conteudo in _PARTES_XLSX.items():
+            self._zip.writestr(nome, _XML + conteudo)
+        self._planilha = self._zip.open('xl/worksheets/sheet1.xml', 'w')
+        self._planilha.write((
+            f'{_XML}<worksheet xmlns="{_NS_PLANILHA}">'
+            '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" '
+            'topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '</sheetView></sheetViews><sheetData>'
+            + self._linha_xml(COLUNAS, (1,) * len(COLUNAS))
+        ).encode('utf-8'))
+        return self._saida.retirar()
+
+    def linhas(self, linhas):
+        self._planilha.write(''.join(
+            self._linha_xml(linha, _ESTILOS) for linha in linhas
+        ).encode('utf-8'))
+        return self._saida.retirar()
+
+    def fim(self):
+        self._planilha.write(b'</sheetData></worksheet>')
+        self._planilha.close()
+        self._zip.close()
+        return self._saida.retirar()
+
+
+EXPORTACOES = {
+    'csv': ExportacaoCsv,
+    'xlsx': ExportacaoXlsx,
+}
+
+
+def transmitir(exportacao, primeira, paginas):
+    """
+    blocos de bytes do arquivo: o cabeçalho, a página de investimentos já
+    buscada pela view e as seguintes, lidas de `paginas` conforme o envio
+    avança.
+    """
+    yield exportacao.inicio()
+    for itens in chain([primeira], paginas):
+        bloco = exportacao.linhas(map(linha_investimento, itens))
+        if bloco:
+            yield bloco
+    bloco = exportacao.fim()
+    if bloco:
+        yield bloco
+
+
+async def atransmitir(exportacao, primeira, paginas):
+    """
+    transmitir com as páginas de um iterador async.
+    """
+    yield exportacao.inicio()
+    bloco = exportacao.linhas(map(linha_investimento, primeira))
+    if bloco:
+        yield bloco
+    async for itens in paginas:
+        bloco = exportacao.linhas(map(linha_investimento, itens))
+        if bloco:
+            yield bloco
+    bloco = exportacao.fim()
+    if bloco:
+        yield bloco
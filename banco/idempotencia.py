@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import uuid
+
+import requests
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.shortcuts import redirect
+
+logger = logging.getLogger(__name__)
+
+CAMPO_IDEMPOTENCIA = 'chave_idempotencia'
+
+PROCESSANDO = 'processando'
+
+
+class OperacaoEmAndamento(Exception):
+    """
+    outra requisição com a mesma chave ainda não terminou.
+    """
+
+
+def get_cache_idempotencia():
+    return caches[getattr(settings, 'IDEMPOTENCIA_CACHE', 'default')]
+
+
+def nova_chave():
+    return uuid.uuid4().hex
+
+
+def chave_do_formulario(request):
+    """
+    chave enviada pelo formulário ({% chave_idempotencia %}), ou uma nova
+    se ela faltar ou não for um UUID: a operação segue sem deduplicação.
+    """
+    try:
+        return uuid.UUID(request.POST.get(CAMPO_IDEMPOTENCIA, '')).hex
+    except ValueError:
+        return nova_chave()
+
+
+def chave_cache(usuario, chave):
+    # por usuário: uma chave de outro usuário nunca devolve o resultado dele
+    usuario = hashlib.sha256(usuario.get_username().encode()).hexdigest()
+    return f'idempotencia:{usuario[:32]}:{chave}'
+
+
+class OperacaoIdempotente:
+    """
+    uma escrita na API identificada pela chave do formulário. a primeira
+    requisição com a chave reserva a operação (add atômico no cache
+    IDEMPOTENCIA_CACHE) e, se der certo, guarda o resultado por
+    IDEMPOTENCIA_TTL segundos; as repetidas (duplo clique, reenvio do
+    navegador) recebem o mesmo resultado, sem nova chamada à API. se a
+    primeira falhar, a reserva é liberada e uma repetição é tratada como
+    nova.
+    """
+    def __init__(self, request, chave):
+        self.chave = chave
+        self._chave_cache = chave_cache(request.user, chave)
+        self._cache = get_cache_idempotencia()
+        self.reservada = False
+
+    def iniciar(self):
+        """
+        reserva a operação e retorna None, ou retorna o resultado guardado
+        de uma requisição anterior com a mesma chave. se a anterior ainda
+        está em andamento levanta OperacaoEmAndamento na hora, sem prender
+        o worker esperando por ela. se o cache falhar (Redis fora do ar,
+        tabela de cache não criada) a operação segue sem reserva: a API
+        ainda a reconhece pelo Idempotency-Key.
+        """
+        trava = getattr(settings, 'IDEMPOTENCIA_TRAVA', 60)
+        try:
+            # duas voltas: a anterior pode liberar a reserva entre o add e
+            # o get
+            for _ in range(2):
+                if self._cache.add(self._chave_cache, PROCESSANDO, trava):
+                    self.reservada = True
+                    return None
+                valor = self._cache.get(self._chave_cache)
+                if isinstance(valor, dict):
+                    return valor
+                if valor is not None:
+                    break
+        except Exception as e:
+            logger.warning("Cache de idempotência indisponível: %s", e)
+            return None
+        raise OperacaoEmAndamento(self.chave)
+
+    def concluir(self, mensagem, url):
+        try:
+            self._cache.set(self._chave_cache,
+                            {'mensagem': mensagem, 'url': url},
+                            getattr(settings, 'IDEMPOTENCIA_TTL', 86400))
+        except Exception as e:
+            logger.warning("Cache de idempotência indisponível: %s", e)
+        self.reservada = False
+
+    def liberar(self):
+        if self.reservada:
+            try:
+                self._cache.delete(self._chave_cache)
+            except Exception as e:
+                logger.warning("Cache de idempotência indisponível: %s", e)
+            self.reservada = False
+
+
+class IdempotenciaMixin:
+    """
+    para FormViews cujo form_valid faz uma escrita na API: a chamada sai
+    por `enviar_api` (com o cabeçalho Idempotency-Key) e o sucesso é
+    registrado com `registrar_sucesso` em vez de messages.success. envios
+    repetidos do mesmo formulário recebem o redirect e a mensagem do
+    primeiro.
+    """
+    def post(self, request, *args, **kwargs):
+        self.operacao = OperacaoIdempotente(request,
+                                            chave_do_formulario(request))
+        self.resultado_incerto = False
+        try:
+            resultado = self.operacao.iniciar()
+        except OperacaoEmAndamento:
+            messages.info(request, "Sua operação já está sendo processada.")
+            return redirect(self.get_success_url())
+        if resultado is not None:
+            messages.success(request, resultado['mensagem'])
+            return redirect(resultado['url'])
+
+        try:
+            return super().post(request, *args, **kwargs)
+        finally:
+            self.operacao.liberar()
+
+    def enviar_api(self, api, path, **kwargs):
+        """
+        POST com Idempotency-Key: como a API não repete a operação para uma
+        chave já vista, um timeout ou queda de conexão é tentado de novo
+        (IDEMPOTENCIA_RETENTATIVAS vezes) sem risco de duplicar.
+        """
+        headers = {**kwargs.pop('headers', {}),
+                   'Idempotency-Key': self.operacao.chave}
+        retentativas = getattr(settings, 'IDEMPOTENCIA_RETENTATIVAS', 1)
+        for tentativa in range(retentativas + 1):
+            try:
+                return api.post(path, headers=headers, **kwargs)
+            except (requests.Timeout, requests.ConnectionError):
+                if tentativa == retentativas:
+                    self.resultado_incerto = True
+                    raise
+
+    def registrar_sucesso(self, mensagem):
+        messages.success(self.request, mensagem)
+        self.operacao.concluir(mensagem, self.get_success_url())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # sem resposta da API não dá para saber se a operação foi feita: o
+        # formulário volta com a mesma chave e, se reenviado, a API o
+        # reconhece pelo Idempotency-Key.
+        if getattr(self, 'resultado_incerto', False):
+            context[CAMPO_IDEMPOTENCIA] = self.operacao.chave
+        return context
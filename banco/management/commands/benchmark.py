@@ -0,0 +1,113 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from banco.benchmark import (
+    CENARIOS,
+    SESSION_ENGINE,
+    StubApi,
+    executar_benchmark,
+    formatar_relatorio,
+    formatar_sessoes,
+    medir_sessao
+)
+
+
+class Command(BaseCommand):
+    help = ("Mede req/s, latência (p50/p95/p99) e chamadas à API por página "
+            "das views do frontend contra uma API simulada local. Roda "
+            "offline, num banco de testes temporário.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS),
+                            help="Cenários a executar (padrão: todos).")
+        parser.add_argument('--requisicoes', type=int, default=200)
+        parser.add_argument('--concorrencia', type=int, default=8)
+        parser.add_argument('--latencia-ms', type=float, default=20.0,
+                            help="Latência de cada resposta da API simulada.")
+        parser.add_argument('--investimentos', type=int, default=50)
+        parser.add_argument('--pontos', type=int, default=1500,
+                            help="Pontos do histórico de analytics.")
+        parser.add_argument('--tickers', type=int, default=3000)
+        parser.add_argument('--movimentacoes', type=int, default=5000,
+                            help="Movimentações no histórico do extrato.")
+        parser.add_argument('--sem-lote', action='store_true',
+                            help="Sem o endpoint de lote (POST /batch/).")
+        parser.add_argument('--sem-etag', action='store_true',
+                            help="A API simulada não manda ETag; o cache "
+                                 "condicional cai no TTL de reserva.")
+        parser.add_argument('--asgi', action='store_true',
+                            help="Atende as requisições pelo handler ASGI, "
+                                 "todas num único event loop.")
+        parser.add_argument('--sessoes', nargs='*',
+                            choices=list(settings.SESSION_ENGINES),
+                            help="Repete os cenários com cada modo de sessão "
+                                 "(padrão: todos) e mede o custo de ler e "
+                                 "gravar a sessão em cada um.")
+        parser.add_argument('--json', dest='saida_json',
+                            help="Grava os resultados neste arquivo JSON.")
+        parser.add_argument('--max-p95-ms', type=float,
+                            help="Falha se algum cenário passar deste p95.")
+        parser.add_argument('--max-chamadas', type=float,
+                            help="Falha se algum cenário passar desta média "
+                                 "de chamadas à API por página.")
+
+    def handle(self, *args, **options):
+        stub = StubApi(latencia=options['latencia_ms'] / 1000,
+                       investimentos=options['investimentos'],
+                       pontos=options['pontos'],
+                       tickers=options['tickers'],
+                       movimentacoes=options['movimentacoes'],
+                       etags=not options['sem_etag'],
+                       lote=not options['sem_lote'])
+
+        # sem setup_test_environment: ele instrumenta a renderização de
+        # templates para o test client e distorce as medições.
+        nome_banco = connection.creation.create_test_db(verbosity=0,
+                                                        serialize=False)
+        if options['sessoes'] is None:
+            engines = [SESSION_ENGINE]
+        else:
+            engines = [settings.SESSION_ENGINES[modo] for modo in
+                       options['sessoes'] or settings.SESSION_ENGINES]
+
+        resultados = []
+        sessoes = []
+        try:
+            with stub, override_settings(ALLOWED_HOSTS=['testserver'],
+                                         DEBUG=False):
+                for engine in engines:
+                    if options['sessoes'] is not None:
+                        sessoes.append(medir_sessao(engine))
+                    resultados += executar_benchmark(
+                        stub, options['cenarios'], options['requisicoes'],
+                        options['concorrencia'], session_engine=engine,
+                        asgi=options['asgi'])
+        finally:
+            connection.creation.destroy_test_db(nome_banco, verbosity=0)
+
+        if sessoes:
+            self.stdout.write(formatar_sessoes(sessoes) + '\n')
+        self.stdout.write(formatar_relatorio(resultados))
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w') as f:
+                json.dump({'cenarios': resultados, 'sessoes': sessoes} if
+                          sessoes else resultados, f, indent=2)
+
+        falhas = []
+        for r in resultados:
+            if r['erros']:
+                falhas.append(f"{r['cenario']}: {r['erros']} erros")
+            if options['max_p95_ms'] and r['p95_ms'] > options['max_p95_ms']:
+                falhas.append(f"{r['cenario']}: p95 {r['p95_ms']} ms")
+            if (options['max_chamadas'] and
+                    r['chamadas_por_pagina'] > options['max_chamadas']):
+                falhas.append(f"{r['cenario']}: "
+                              f"{r['chamadas_por_pagina']} chamadas/pág")
+        if falhas:
+            raise CommandError("Benchmark fora dos limites: " +
+                               "; ".join(falhas))
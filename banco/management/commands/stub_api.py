@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from banco.benchmark import StubApi
+
+
+class Command(BaseCommand):
+    help = ("Sobe uma API simulada local com as rotas usadas pelo frontend, "
+            "para testes manuais e de carga sem o backend real.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--porta', type=int, default=8000)
+        parser.add_argument('--latencia-ms', type=float, default=20.0)
+        parser.add_argument('--investimentos', type=int, default=50)
+        parser.add_argument('--pontos', type=int, default=1500)
+        parser.add_argument('--tickers', type=int, default=3000)
+        parser.add_argument('--movimentacoes', type=int, default=5000)
+        parser.add_argument('--sem-lote', action='store_true',
+                            help="Sem o endpoint de lote (POST /batch/).")
+        parser.add_argument('--sem-etag', action='store_true',
+                            help="Não manda ETag nem responde 304.")
+
+    def handle(self, *args, **options):
+        stub = StubApi(latencia=options['latencia_ms'] / 1000,
+                       investimentos=options['investimentos'],
+                       pontos=options['pontos'],
+                       tickers=options['tickers'],
+                       movimentacoes=options['movimentacoes'],
+                       etags=not options['sem_etag'],
+                       lote=not options['sem_lote'],
+                       host=options['host'], porta=options['porta'])
+
+        self.stdout.write(f"API simulada em {stub.url} (Ctrl+C para sair)")
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,51 @@
+import base64
+import hashlib
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Baixa as bibliotecas de BIBLIOTECAS_ESTATICAS (SweetAlert2, "
+            "ApexCharts) para base_static/vendor, para que sejam servidas "
+            "pelo próprio site em vez do CDN. confere o hash SRI "
+            "configurado e mostra o de cada arquivo; os arquivos baixados "
+            "devem ir para o repositório.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('bibliotecas', nargs='*',
+                            help="Padrão: todas.")
+        parser.add_argument('--forcar', action='store_true',
+                            help="Baixa de novo as que já existem.")
+
+    def handle(self, *args, **options):
+        destino = Path(settings.STATICFILES_DIRS[0])
+        nomes = options['bibliotecas'] or list(settings.BIBLIOTECAS_ESTATICAS)
+
+        for nome in nomes:
+            if nome not in settings.BIBLIOTECAS_ESTATICAS:
+                raise CommandError(f"Biblioteca desconhecida: {nome}")
+            caminho, cdn, integridade = settings.BIBLIOTECAS_ESTATICAS[nome]
+            arquivo = destino / caminho
+            if arquivo.exists() and not options['forcar']:
+                self.stdout.write(f"{nome}: já existe em {arquivo}")
+                continue
+
+            try:
+                response = requests.get(cdn, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise CommandError(f"{nome}: erro ao baixar {cdn}: {e}")
+
+            sri = 'sha384-' + base64.b64encode(
+                hashlib.sha384(response.content).digest()).decode()
+            if integridade is not None and integridade != sri:
+                raise CommandError(f"{nome}: o arquivo de {cdn} não confere "
+                                   f"com o hash configurado ({sri}).")
+
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            arquivo.write_bytes(response.content)
+            self.stdout.write(f"{nome}: {len(response.content)} bytes em "
+                              f"{arquivo} ({sri})")
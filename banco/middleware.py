@@ -0,0 +1,134 @@
+import json
+import logging
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.http import HttpResponse, JsonResponse
+from django.utils.functional import SimpleLazyObject
+
+from banco.api import (
+    CircuitoAberto,
+    encerrar_registro,
+    iniciar_registro,
+    metricas_por_view
+)
+from banco.autenticacao import aget_usuario, get_usuario
+
+logger = logging.getLogger('banco.api')
+
+
+def server_timing(chamadas):
+    """
+    cabeçalho Server-Timing: o tempo total esperando a API e uma entrada
+    por chamada, visíveis na aba de rede do navegador.
+    """
+    total = sum(c['duracao_ms'] for c in chamadas)
+    entradas = [f'api;dur={total:.1f};desc="{len(chamadas)} chamadas"']
+    for i, c in enumerate(chamadas, 1):
+        entradas.append(f'api-{i};dur={c["duracao_ms"]:.1f};'
+                        f'desc="{c["metodo"]} {c["url"]} {c["status"]}"')
+    return ', '.join(entradas)
+
+
+class InstrumentacaoApiMiddleware:
+    """
+    registra todas as chamadas à API feitas enquanto a requisição é
+    atendida (url, status, duração e bytes), devolve o resumo no
+    Server-Timing, escreve uma linha JSON no logger `banco.api` e acumula
+    os totais por view em `metricas_por_view`.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = iniciar_registro()
+        try:
+            response = self.get_response(request)
+        finally:
+            chamadas = encerrar_registro(token)
+        return self.registrar(request, response, chamadas)
+
+    async def __acall__(self, request):
+        token = iniciar_registro()
+        try:
+            response = await self.get_response(request)
+        finally:
+            chamadas = encerrar_registro(token)
+        return self.registrar(request, response, chamadas)
+
+    def registrar(self, request, response, chamadas):
+        if not chamadas:
+            return response
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+
+        metricas_por_view.adicionar(view, chamadas)
+        response['Server-Timing'] = server_timing(chamadas)
+        logger.info(json.dumps({
+            'view': view,
+            'path': request.path,
+            'status': response.status_code,
+            'chamadas_api': chamadas,
+            'tempo_api_ms': round(sum(c['duracao_ms'] for c in chamadas), 2),
+        }, ensure_ascii=False))
+        return response
+
+
+class ApiIndisponivelMiddleware:
+    """
+    resposta 503 imediata quando uma view não trata o CircuitoAberto,
+    em vez de uma página de erro 500.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, CircuitoAberto):
+            return None
+
+        mensagem = "Serviço indisponível no momento. Tente novamente em " \
+                   "instantes."
+        if request.path.startswith('/ajax/'):
+            response = JsonResponse({'error': mensagem}, status=503)
+        else:
+            response = HttpResponse(mensagem, status=503,
+                                    content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(
+            int(getattr(settings, 'API_CIRCUIT_TEMPO_ABERTO', 30)))
+        return response
+
+
+class AutenticacaoApiMiddleware(AuthenticationMiddleware):
+    """
+    request.user é o UsuarioApi guardado na sessão no login, sem consulta
+    ao banco; sem ele, o usuário do banco (admin, staff) como no
+    AuthenticationMiddleware do Django, que esta classe substitui.
+    """
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_usuario(request))
+        request.auser = partial(aget_usuario, request)
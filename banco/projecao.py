@@ -0,0 +1,131 @@
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.utils.dates import MONTHS_3
+
+from banco.api import get_or_fetch
+
+PERFIS = ('CONSERVADOR', 'MODERADO', 'ARROJADO')
+
+TAXAS_ANUAIS = {
+    'CONSERVADOR': 0.08,
+    'MODERADO': 0.12,
+    'ARROJADO': 0.18,
+}
+
+VOLATILIDADES_ANUAIS = {
+    'CONSERVADOR': 0.03,
+    'MODERADO': 0.10,
+    'ARROJADO': 0.22,
+}
+
+PERCENTIS = (10, 50, 90)
+
+
+def taxa_anual(perfil):
+    # como no dashboard original: qualquer perfil que não seja conservador
+    # ou moderado projeta como arrojado
+    return TAXAS_ANUAIS.get(perfil, TAXAS_ANUAIS['ARROJADO'])
+
+
+def curvas_mensais(patrimonio, taxas_anuais, meses):
+    """
+    juros compostos mensais equivalentes a cada taxa anual, do mês 0 até
+    `meses`. aceita escalares ou arrays e devolve um array com formato
+    (*patrimonio, *taxas, meses + 1), calculado numa única operação.
+    """
+    taxas = np.asarray(taxas_anuais, dtype=float)
+    expoentes = np.arange(meses + 1) / 12
+    fatores = (1 + taxas)[..., None] ** expoentes
+    return np.multiply.outer(np.asarray(patrimonio, dtype=float), fatores)
+
+
+def projetar_horizontes(patrimonio, taxas_anuais, anos):
+    """
+    patrimônio ao final de cada horizonte (em anos) para cada taxa, com
+    formato (*patrimonio, *taxas, *anos).
+    """
+    taxas = np.asarray(taxas_anuais, dtype=float)
+    anos = np.asarray(anos, dtype=float)
+    fatores = np.power.outer(1 + taxas, anos)
+    return np.multiply.outer(np.asarray(patrimonio, dtype=float), fatores)
+
+
+def rotulos_meses(meses, inicio=None, com_ano=False):
+    inicio = inicio or date.today()
+    rotulos = ['Hoje']
+    for i in range(1, meses + 1):
+        mes = (inicio.month - 1 + i) % 12 + 1
+        rotulo = str(MONTHS_3[mes])
+        if com_ano:
+            ano = inicio.year + (inicio.month - 1 + i) // 12
+            rotulo = f"{rotulo}/{ano % 100:02d}"
+        rotulos.append(rotulo)
+    return rotulos
+
+
+def projecao_mensal(patrimonio, perfil, meses=12):
+    """
+    série pronta para o gráfico do dashboard: rótulos dos meses e valores
+    projetados com a taxa do perfil.
+    """
+    valores = curvas_mensais(patrimonio, taxa_anual(perfil), meses)
+    return {
+        'perfil': perfil,
+        'taxa_anual': taxa_anual(perfil),
+        'labels': rotulos_meses(meses),
+        'valores': np.round(valores, 2).tolist(),
+    }
+
+
+def simular_bandas(perfil, meses, caminhos, seed):
+    """
+    simula `caminhos` trajetórias de retornos mensais log-normais para o
+    perfil (média igual à taxa anual, volatilidade do perfil) e devolve os
+    percentis de PERCENTIS mês a mês para um patrimônio inicial de 1.
+
+    os caminhos ficam nas colunas para que o cumsum e a seleção dos
+    percentis (np.partition) percorram memória contígua.
+    """
+    sigma = VOLATILIDADES_ANUAIS.get(
+        perfil, VOLATILIDADES_ANUAIS['ARROJADO']) / np.sqrt(12)
+    mu = np.log1p(taxa_anual(perfil)) / 12 - sigma ** 2 / 2
+
+    rng = np.random.default_rng(seed)
+    log_retornos = rng.standard_normal((meses, caminhos))
+    log_retornos *= sigma
+    log_retornos += mu
+    np.cumsum(log_retornos, axis=0, out=log_retornos)
+
+    posicoes = [round(p / 100 * (caminhos - 1)) for p in PERCENTIS]
+    log_retornos.partition(posicoes, axis=1)
+    bandas = np.exp(log_retornos[:, posicoes].T)
+    return np.hstack([np.ones((len(PERCENTIS), 1)), bandas])
+
+
+def projecao_monte_carlo(patrimonio, perfil, meses=120):
+    """
+    bandas p10/p50/p90 do patrimônio projetado. como o modelo é invariante
+    à escala, as bandas unitárias são simuladas uma vez por (perfil, meses)
+    com semente fixa, ficam em cache e valem para qualquer patrimônio.
+    """
+    caminhos = getattr(settings, 'MONTECARLO_CAMINHOS', 10000)
+    seed = getattr(settings, 'MONTECARLO_SEED', 42)
+
+    bandas = get_or_fetch(
+        f"montecarlo:{perfil}:{meses}:{caminhos}:{seed}",
+        getattr(settings, 'MONTECARLO_CACHE_TTL', 86400),
+        lambda: simular_bandas(perfil, meses, caminhos, seed)
+    )
+    valores = np.round(bandas * float(patrimonio), 2).tolist()
+
+    resultado = {
+        'perfil': perfil,
+        'meses': meses,
+        'caminhos': caminhos,
+        'labels': rotulos_meses(meses, com_ano=True),
+    }
+    for percentil, serie in zip(PERCENTIS, valores):
+        resultado[f"p{percentil}"] = serie
+    return resultado
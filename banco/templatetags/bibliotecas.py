@@ -0,0 +1,28 @@
+from django import template
+from django.utils.html import format_html
+
+from banco.estaticos import integridade_biblioteca, url_biblioteca
+
+register = template.Library()
+
+
+def _integridade(nome):
+    integridade = integridade_biblioteca(nome)
+    if integridade is None:
+        return ''
+    return format_html(' integrity="{}" crossorigin="anonymous"',
+                       integridade)
+
+
+@register.simple_tag
+def script_biblioteca(nome):
+    # defer: não bloqueia a primeira pintura. os templates só usam as
+    # bibliotecas em handlers e no DOMContentLoaded, que rodam depois.
+    return format_html('<script src="{}"{} defer></script>',
+                       url_biblioteca(nome), _integridade(nome))
+
+
+@register.simple_tag
+def css_biblioteca(nome):
+    return format_html('<link rel="stylesheet" href="{}"{}>',
+                       url_biblioteca(nome), _integridade(nome))
@@ -0,0 +1,57 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from banco.estaticos import caminho_estilo, estilo_critico
+
+register = template.Library()
+
+
+@register.simple_tag
+def css(*nomes):
+    """
+    folhas de estilo normais (bloqueiam a renderização), para as páginas
+    logadas: com hash no nome, ficam no cache do navegador entre páginas.
+    """
+    return format_html_join(
+        '\n', '<link rel="stylesheet" href="{}">',
+        ((static(caminho_estilo(nome)),) for nome in nomes))
+
+
+@register.simple_tag(takes_context=True)
+def css_critico(context, *nomes):
+    """
+    CSS crítico inline no <head>: só as regras das folhas que o template
+    da página usa, sem esperar nenhuma folha externa. usado nas páginas de
+    entrada (landing, login, cadastro), junto com css_assincrono.
+    """
+    conteudo = estilo_critico(context.template.origin.template_name, nomes)
+    return format_html('<style>{}</style>', mark_safe(conteudo))
+
+
+@register.simple_tag
+def css_assincrono(*nomes):
+    """
+    folhas completas sem bloquear a renderização (media=print até o
+    download terminar). trazem o que ficou fora do CSS crítico e já ficam
+    no cache para as páginas seguintes.
+    """
+    formato = ('<link rel="stylesheet" href="{}" media="print" '
+               'onload="this.media=\'all\'">'
+               '<noscript><link rel="stylesheet" href="{}"></noscript>')
+    return format_html_join(
+        '\n', formato,
+        ((url, url) for url in (static(caminho_estilo(nome))
+                                for nome in nomes)))
+
+
+@register.simple_tag
+def css_prefetch(*nomes):
+    """
+    baixa em segundo plano, com baixa prioridade, as folhas das próximas
+    páginas (depois do login), que já chegam do cache.
+    """
+    return format_html_join(
+        '\n', '<link rel="prefetch" as="style" href="{}">',
+        ((static(caminho_estilo(nome)),) for nome in nomes))
@@ -0,0 +1,18 @@
+from django import template
+from django.utils.html import format_html
+
+from banco.idempotencia import CAMPO_IDEMPOTENCIA, nova_chave
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def chave_idempotencia(context):
+    """
+    campo oculto com a chave de idempotência do formulário: nova a cada
+    renderização, ou a da tentativa anterior quando a view a devolve no
+    contexto (ver IdempotenciaMixin).
+    """
+    chave = context.get(CAMPO_IDEMPOTENCIA) or nova_chave()
+    return format_html('<input type="hidden" name="{}" value="{}">',
+                       CAMPO_IDEMPOTENCIA, chave)
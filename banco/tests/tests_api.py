@@ -0,0 +1,588 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import httpx
+import requests
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+from unittest.mock import patch
+
+from banco.api import (
+    ABERTO,
+    FECHADO,
+    MEIO_ABERTO,
+    ApiClient,
+    AsyncApiClient,
+    CircuitBreaker,
+    CircuitoAberto,
+    FanOut,
+    Lote,
+    SingleFlight,
+    TickerIndex,
+    chave_versao,
+    downsample_lttb,
+    get_async_client,
+    get_circuito,
+    get_session,
+    grupo_do_path,
+    metricas_por_view,
+    nova_versao,
+    resetar_circuitos,
+    resetar_lote,
+    url_template
+)
+from banco.views.user_front_end import guardar_dados_usuario
+
+
+class ApiClientTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    # --- teste de headers e timeout padrao ---
+    @override_settings(API_BASE_URL='http://api.test/api',
+                       API_TIMEOUT=(1, 2))
+    @patch('banco.api.client.requests.Session.get')
+    def test_injeta_token_e_timeout(self, mock_get):
+        request = self.factory.get('/')
+        request.session = {'auth_token': 'tok-1'}
+
+        ApiClient.from_request(request).get("/contas/")
+
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], 'http://api.test/api/contas/')
+        self.assertEqual(kwargs['headers']['Authorization'], 'Token tok-1')
+        self.assertEqual(kwargs['timeout'], (1, 2))
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_sem_token_nao_envia_authorization(self, mock_post):
+        ApiClient().post("/login/custom/", json={}, timeout=5)
+
+        args, kwargs = mock_post.call_args
+        self.assertNotIn('Authorization', kwargs['headers'])
+        self.assertEqual(kwargs['timeout'], 5)
+
+    # --- teste do pool compartilhado ---
+    def test_pool_compartilhado_entre_threads(self):
+        sessions = []
+
+        def worker():
+            sessions.append(get_session())
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+
+        principal = get_session()
+        self.assertIs(principal, get_session())
+        self.assertIsNot(principal, sessions[0])
+        self.assertIs(principal.get_adapter('http://x/'),
+                      sessions[0].get_adapter('http://x/'))
+
+
+class AsyncApiClientTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(API_BASE_URL='http://api.test/api',
+                       API_TIMEOUT=(1, 2))
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_injeta_token_e_converte_timeout(self, mock_get):
+        asyncio.run(AsyncApiClient('tok-1').get("/contas/"))
+
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], 'http://api.test/api/contas/')
+        self.assertEqual(kwargs['headers']['Authorization'], 'Token tok-1')
+        self.assertEqual(kwargs['timeout'], httpx.Timeout(2, connect=1))
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_erros_do_httpx_viram_request_exception(self, mock_get):
+        mock_get.side_effect = httpx.ReadTimeout("lento")
+        with self.assertRaises(requests.Timeout):
+            asyncio.run(AsyncApiClient().get("/contas/"))
+
+        mock_get.side_effect = httpx.ConnectError("recusada")
+        with self.assertRaises(requests.ConnectionError):
+            asyncio.run(AsyncApiClient().get("/contas/"))
+
+    # --- um cliente (e um pool) para todas as requisicoes do processo ---
+    @patch('banco.api.async_client.httpx.AsyncClient.get', autospec=True)
+    def test_cliente_reaproveitado_entre_requisicoes(self, mock_get):
+        mock_get.return_value = httpx.Response(
+            200, json={'ativa': True, 'id': 7},
+            request=httpx.Request('GET', 'http://api.test/'))
+        self.client.force_login(get_user_model().objects.create(
+            username='ana', email='ana@t.com'))
+        session = self.client.session
+        session['auth_token'] = 'tok-1'
+        session.save()
+
+        self.client.get(reverse('home_page'))
+        self.client.get(reverse('home_page'))
+
+        clientes = {c.args[0] for c in mock_get.call_args_list}
+        self.assertEqual(clientes, {get_async_client()})
+
+
+def resposta_json(corpo, status=200, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response._content = corpo
+    response.headers.update(headers)
+    return response
+
+
+@override_settings(API_CACHE_CONDICIONAL={'/users/me/': 60, '/contas/': 60})
+class CacheCondicionalTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch('banco.api.client.requests.Session.get')
+    def test_revalida_com_etag_e_reaproveita_corpo_no_304(self, mock_get):
+        mock_get.side_effect = [
+            resposta_json(b'{"email": "a@b.com"}', ETag='"v1"'),
+            resposta_json(b'', status=304, ETag='"v1"'),
+        ]
+        api = ApiClient('tok-1')
+
+        primeira = api.get("/users/me/")
+        segunda = api.get("/users/me/")
+
+        self.assertNotIn('If-None-Match',
+                         mock_get.call_args_list[0].kwargs['headers'])
+        self.assertEqual(
+            mock_get.call_args_list[1].kwargs['headers']['If-None-Match'],
+            '"v1"')
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda.content, b'{"email": "a@b.com"}')
+
+    @patch('banco.api.client.requests.Session.post')
+    @patch('banco.api.client.requests.Session.get')
+    def test_sem_validador_usa_ttl_por_usuario(self, mock_get, mock_post):
+        mock_get.side_effect = lambda *a, **kw: resposta_json(b'{"saldo": 1}')
+        mock_post.return_value = resposta_json(b'{}', status=201)
+
+        ApiClient('tok-1').get("/contas/")
+        ApiClient('tok-1').get("/contas/")
+        self.assertEqual(mock_get.call_count, 1)
+
+        # outro usuário não enxerga a resposta guardada
+        ApiClient('tok-2').get("/contas/")
+        self.assertEqual(mock_get.call_count, 2)
+
+        # uma escrita do usuário descarta as respostas dele
+        ApiClient('tok-1').post("/contas/", json={})
+        ApiClient('tok-1').get("/contas/")
+        self.assertEqual(mock_get.call_count, 3)
+
+    # --- escrita atendida por outro worker ---
+    @patch('banco.api.client.requests.Session.get')
+    def test_versao_compartilhada_entre_workers(self, mock_get):
+        mock_get.side_effect = lambda *a, **kw: resposta_json(b'{"saldo": 1}')
+        caches['compartilhado'].clear()
+
+        ApiClient('tok-1').get("/contas/")
+        # a escrita de outro worker só muda a versão no cache compartilhado
+        caches['compartilhado'].set(chave_versao('tok-1'), *nova_versao())
+        ApiClient('tok-1').get("/contas/")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertIsNone(cache.get(chave_versao('tok-1')))
+
+    # --- cache de versoes fora do ar (tabela ainda nao criada) ---
+    @patch('banco.api.client.requests.Session.post')
+    @patch('banco.api.client.requests.Session.get')
+    def test_sem_cache_de_versoes_vira_get_comum(self, mock_get, mock_post):
+        mock_get.side_effect = lambda *a, **kw: resposta_json(b'{"saldo": 1}')
+        mock_post.return_value = resposta_json(b'{}', status=201)
+        sem_tabela = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                      'LOCATION': 'pyinvest_cache_inexistente'}
+
+        with override_settings(CACHES={**settings.CACHES,
+                                       'compartilhado': sem_tabela}):
+            primeira = ApiClient('tok-1').get("/contas/")
+            ApiClient('tok-1').post("/contas/", json={})
+            asyncio.run(AsyncApiClient('tok-1').invalidar_cache())
+            ApiClient('tok-1').get("/contas/")
+
+        self.assertEqual(primeira.json(), {'saldo': 1})
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertNotIn('If-None-Match',
+                         mock_get.call_args_list[1].kwargs['headers'])
+
+    @patch('banco.api.client.requests.Session.get')
+    def test_endpoint_fora_da_lista_nao_e_guardado(self, mock_get):
+        mock_get.side_effect = lambda *a, **kw: resposta_json(b'{}')
+
+        ApiClient('tok-1').get("/conta/score/")
+        ApiClient('tok-1').get("/conta/score/")
+
+        self.assertEqual(mock_get.call_count, 2)
+
+
+@override_settings(API_BATCH_PATH='/batch/', API_CACHE_CONDICIONAL={})
+class LoteTest(TestCase):
+    def setUp(self):
+        resetar_lote()
+
+    def _lote(self):
+        lote = Lote()
+        lote.add('conta', "/contas/")
+        lote.add('clientes', "/internal/clientes/")
+        lote.add('investimentos',
+                 lambda r: f"/investimentos/{r.json()[0]['id']}/",
+                 depends=['clientes'])
+        return lote
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.api.client.requests.Session.post')
+    def test_leituras_independentes_vao_num_lote(self, mock_post, mock_get):
+        mock_post.return_value = resposta_json(
+            b'{"responses": ['
+            b'{"id": "conta", "status": 200, "body": {"saldo": 10}},'
+            b'{"id": "clientes", "status": 200, "body": [{"id": "c1"}]}]}')
+        mock_get.return_value = resposta_json(b'[{"valor": 5}]')
+
+        respostas, erros = self._lote().run(ApiClient('tok-1'))
+
+        self.assertEqual(erros, {})
+        self.assertEqual(mock_post.call_count, 1)
+        args, kwargs = mock_post.call_args
+        self.assertTrue(args[0].endswith('/batch/'))
+        self.assertEqual([r['path'] for r in kwargs['json']['requests']],
+                         ['/contas/', '/internal/clientes/'])
+        # a leitura dependente sai sozinha, sem lote
+        self.assertTrue(
+            mock_get.call_args[0][0].endswith('/investimentos/c1/'))
+        self.assertEqual(respostas['conta'].json(), {'saldo': 10})
+        self.assertEqual(respostas['investimentos'].json(), [{'valor': 5}])
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.api.client.requests.Session.post')
+    def test_sem_endpoint_de_lote_faz_chamadas_em_paralelo(self, mock_post,
+                                                           mock_get):
+        mock_post.return_value = resposta_json(b'{}', status=404)
+        mock_get.side_effect = lambda url, **kw: resposta_json(
+            b'[{"id": "c1"}]' if 'clientes' in url else b'{}')
+
+        self._lote().run(ApiClient('tok-1'))
+        respostas, erros = self._lote().run(ApiClient('tok-1'))
+
+        self.assertEqual(erros, {})
+        # o 404 do lote é lembrado: a segunda página nem tenta
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_get.call_count, 6)
+        self.assertEqual(respostas['clientes'].json(), [{'id': 'c1'}])
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.api.client.requests.Session.post')
+    def test_falha_do_lote_vira_chamadas_individuais(self, mock_post,
+                                                     mock_get):
+        mock_get.side_effect = lambda url, **kw: resposta_json(
+            b'[{"id": "c1"}]' if 'clientes' in url else b'{}')
+
+        for falha in (requests.ConnectionError("recusada"),
+                      resposta_json(b'{}', status=500),
+                      resposta_json(b'<html>')):
+            mock_post.side_effect = None
+            if isinstance(falha, Exception):
+                mock_post.side_effect = falha
+            else:
+                mock_post.return_value = falha
+            mock_get.reset_mock()
+
+            respostas, erros = self._lote().run(ApiClient('tok-1'))
+
+            self.assertEqual(erros, {})
+            self.assertEqual(mock_get.call_count, 3)
+            self.assertEqual(respostas['clientes'].json(), [{'id': 'c1'}])
+        # só o 404/405/501 desliga o lote; as outras falhas tentam de novo
+        self.assertEqual(mock_post.call_count, 3)
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.api.client.requests.Session.post')
+    def test_item_ausente_do_lote_sai_sozinho(self, mock_post, mock_get):
+        mock_post.return_value = resposta_json(
+            b'{"responses": ['
+            b'{"id": "clientes", "status": 200, "body": [{"id": "c1"}]}]}')
+        mock_get.return_value = resposta_json(b'{"saldo": 10}')
+
+        respostas, erros = self._lote().run(ApiClient('tok-1'))
+
+        self.assertEqual(erros, {})
+        self.assertEqual(respostas['conta'].json(), {'saldo': 10})
+        self.assertTrue(mock_get.call_args_list[0].args[0]
+                        .endswith('/contas/'))
+
+
+class FanOutTest(TestCase):
+    def test_chamadas_independentes_rodam_em_paralelo(self):
+        barreira = threading.Barrier(2, timeout=2)
+
+        def chamada(valor):
+            def func():
+                barreira.wait()
+                return valor
+            return func
+
+        fanout = FanOut()
+        fanout.add('a', chamada(1))
+        fanout.add('b', chamada(2))
+        resultados, erros = fanout.run()
+
+        self.assertEqual(resultados, {'a': 1, 'b': 2})
+        self.assertEqual(erros, {})
+
+    def test_dependencia_recebe_resultado_e_propaga_falha(self):
+        def falha():
+            raise RuntimeError("fora do ar")
+
+        fanout = FanOut()
+        fanout.add('perfil', lambda: {'id': 'uid-1'})
+        fanout.add('lista', lambda perfil: perfil['id'], depends=['perfil'])
+        fanout.add('score', falha)
+        fanout.add('extra', lambda score: score, depends=['score'])
+        resultados, erros = fanout.run()
+
+        self.assertEqual(resultados, {'perfil': {'id': 'uid-1'},
+                                      'lista': 'uid-1'})
+        self.assertIsInstance(erros['score'], RuntimeError)
+        self.assertIs(erros['extra'], erros['score'])
+
+
+class SingleFlightTest(TestCase):
+    def test_buscas_simultaneas_sao_agrupadas(self):
+        flight = SingleFlight()
+        chamadas = []
+        liberar = threading.Event()
+
+        def buscar():
+            chamadas.append(1)
+            liberar.wait(2)
+            return 'cotacao'
+
+        resultados = []
+        threads = [threading.Thread(
+            target=lambda: resultados.append(flight.do('PETR4', buscar)))
+            for _ in range(5)]
+        for t in threads:
+            t.start()
+        while not chamadas:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        liberar.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(resultados, ['cotacao'] * 5)
+        self.assertEqual(len(chamadas), 1)
+
+
+class TickerIndexTest(TestCase):
+    def setUp(self):
+        self.index = TickerIndex([
+            {'ticker': 'PETR4', 'nome': 'Petrobras PN'},
+            {'ticker': 'PETR3', 'nome': 'Petrobras ON'},
+            {'ticker': 'PRIO3', 'nome': 'PetroRio'},
+            {'ticker': 'VALE3', 'nome': 'Vale ON'},
+            {'ticker': 'ITUB4', 'nome': 'Itaú Unibanco PN'},
+        ])
+
+    def test_ranking_por_qualidade(self):
+        tickers = [i['ticker'] for i in self.index.search('petr3')]
+        self.assertEqual(tickers[0], 'PETR3')
+
+        tickers = [i['ticker'] for i in self.index.search('PETR')]
+        self.assertEqual(tickers[:2], ['PETR3', 'PETR4'])
+        self.assertEqual(tickers[2], 'PRIO3')
+
+    def test_busca_por_nome_sem_acento_e_substring(self):
+        self.assertEqual(self.index.search('itau')[0]['ticker'], 'ITUB4')
+        self.assertEqual(self.index.search('nibanco')[0]['ticker'], 'ITUB4')
+        self.assertEqual(self.index.search('xyz'), [])
+
+
+class DownsampleTest(TestCase):
+    def test_serie_curta_nao_e_alterada(self):
+        self.assertEqual(downsample_lttb(500, [1, 2, 3]).tolist(), [0, 1, 2])
+
+    def test_limita_pontos_e_preserva_picos(self):
+        carteira = [0.0] * 5000
+        benchmark = [0.0] * 5000
+        carteira[1234] = 50.0
+        benchmark[4321] = -30.0
+
+        indices = downsample_lttb(200, carteira, benchmark).tolist()
+
+        self.assertEqual(len(indices), 200)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 4999)
+        self.assertEqual(indices, sorted(set(indices)))
+        self.assertIn(1234, indices)
+        self.assertIn(4321, indices)
+
+
+class InstrumentacaoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metricas_por_view.zerar()
+        session = self.client.session
+        session['auth_token'] = 'fake-token-xyz'
+        session.save()
+        usuario = get_user_model().objects.create(username='dummy',
+                                                  email='dummy@t.com')
+        self.client.force_login(usuario)
+        guardar_dados_usuario(usuario, {'first_name': 'Dummy'})
+
+    def _mock_get(self, url, **kwargs):
+        class MockResp:
+            status_code = 503 if 'score' in url else 200
+            content = b'[]'
+            headers = {}
+
+            def json(self):
+                if '/internal/clientes/' in url:
+                    return [{'id': 'uid-1', 'perfil_investidor': 'MODERADO'}]
+                return []
+        return MockResp()
+
+    def test_url_template_agrupa_ids(self):
+        self.assertEqual(
+            url_template('/internal/investimentos/cliente/'
+                         '6f1c2a9e-0000-4000-8000-000000000001/'),
+            '/internal/investimentos/cliente/{id}/')
+        self.assertEqual(url_template('/contas/42/desativar/'),
+                         '/contas/{id}/desativar/')
+
+    # --- chamadas feitas no FanOut tambem sao registradas ---
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_server_timing_e_agregados_por_view(self, mock_get):
+        mock_get.side_effect = self._mock_get
+
+        response = self.client.get(reverse('investimentos_dashboard_page'))
+
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('api;dur='))
+        self.assertIn('desc="3 chamadas"', timing)
+        self.assertIn('GET /conta/score/ 503', timing)
+        self.assertIn('GET /internal/investimentos/cliente/uid-1/ 200',
+                      timing)
+
+        metricas = metricas_por_view.snapshot()
+        dashboard = metricas['investimentos_dashboard_page']
+        self.assertEqual(dashboard['requisicoes'], 1)
+        self.assertEqual(dashboard['chamadas'], 3)
+        self.assertEqual(dashboard['erros'], 1)
+
+        with self.settings(METRICAS_TOKEN='segredo'):
+            response = self.client.get(
+                reverse('metricas_api'),
+                headers={'Authorization': 'Bearer segredo'})
+        self.assertContains(
+            response, 'pyinvest_view_chamadas_api_total'
+                      '{view="investimentos_dashboard_page"} 3')
+
+    # --- linha JSON por requisicao no logger banco.api (INFO) ---
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_chamadas_da_requisicao_no_log(self, mock_get):
+        mock_get.side_effect = self._mock_get
+
+        self.assertTrue(
+            logging.getLogger('banco.api').isEnabledFor(logging.INFO))
+        with self.assertLogs('banco.api', 'INFO') as logs:
+            self.client.get(reverse('investimentos_dashboard_page'))
+
+        linha = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(linha['view'], 'investimentos_dashboard_page')
+        self.assertEqual(len(linha['chamadas_api']), 3)
+
+    # --- atras de um proxy todo acesso vem de 127.0.0.1 ---
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_metricas_exigem_staff_ou_token(self):
+        url = reverse('metricas_api')
+
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1')
+                         .status_code, 403)
+        self.assertEqual(self.client.get(
+            url, headers={'Authorization': 'Bearer errado'}).status_code, 403)
+
+        staff = get_user_model().objects.create(username='admin',
+                                                is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        resetar_circuitos()
+
+    def test_grupo_do_path(self):
+        self.assertEqual(grupo_do_path('/internal/market/'), 'market')
+        self.assertEqual(grupo_do_path('/internal/clientes/uid-1/'),
+                         'clientes')
+        self.assertEqual(grupo_do_path('/conta/score/'), 'conta')
+
+    def test_abre_e_testa_uma_chamada_depois_do_tempo(self):
+        circuito = CircuitBreaker('market', limite_falhas=2, tempo_aberto=60)
+        circuito.falha()
+        circuito.liberar()
+        circuito.falha()
+        self.assertEqual(circuito.estado, ABERTO)
+        with self.assertRaises(CircuitoAberto):
+            circuito.liberar()
+
+        circuito.aberto_ate = 0
+        circuito.liberar()
+        self.assertEqual(circuito.estado, MEIO_ABERTO)
+        with self.assertRaises(CircuitoAberto):
+            circuito.liberar()
+
+        circuito.falha()
+        self.assertEqual(circuito.estado, ABERTO)
+
+        circuito.aberto_ate = 0
+        circuito.liberar()
+        circuito.sucesso()
+        self.assertEqual(circuito.estado, FECHADO)
+        circuito.liberar()
+
+    @override_settings(API_CIRCUIT_FALHAS=2)
+    @patch('banco.api.client.requests.Session.get')
+    def test_falhas_abrem_so_o_grupo_afetado(self, mock_get):
+        def side_effect(url, **kwargs):
+            if '/internal/market/' in url:
+                raise requests.exceptions.ConnectTimeout()
+            return type('MockResp', (), {'status_code': 200})()
+
+        mock_get.side_effect = side_effect
+        api = ApiClient('tok-1')
+
+        for _ in range(2):
+            with self.assertRaises(requests.RequestException):
+                api.get('/internal/market/')
+        with self.assertRaises(CircuitoAberto):
+            api.get('/internal/market/', params={'action': 'quote'})
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(api.get('/contas/').status_code, 200)
+        self.assertEqual(get_circuito('contas').estado, FECHADO)
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_circuito_aberto_responde_503_sem_chamar_api(self, mock_get):
+        get_circuito('market').falhas = 99
+        get_circuito('market').falha()
+
+        self.client.force_login(get_user_model().objects.create(
+            username='dummy', email='dummy@t.com'))
+        response = self.client.get(reverse('ajax_market_data'),
+                                   {'action': 'quote', 'ticker': 'PETR4'})
+
+        self.assertEqual(response.status_code, 503)
+        mock_get.assert_not_called()
@@ -0,0 +1,111 @@
+import requests
+from django.conf import settings
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings
+)
+
+from banco.benchmark import (
+    CLIENTE_ID,
+    StubApi,
+    executar_cenario,
+    medir_sessao
+)
+
+
+class StubApiTest(SimpleTestCase):
+    def test_rotas_e_contagem_de_chamadas(self):
+        with StubApi(investimentos=3, pontos=10, tickers=5) as stub:
+            clientes = requests.get(f"{stub.url}/internal/clientes/").json()
+            investimentos = requests.get(
+                f"{stub.url}/internal/investimentos/cliente/{CLIENTE_ID}/"
+            ).json()
+            lista = requests.get(f"{stub.url}/internal/market/",
+                                 params={'action': 'list'}).json()
+            inexistente = requests.get(f"{stub.url}/nao/existe/")
+
+        self.assertEqual(clientes[0]['id'], CLIENTE_ID)
+        self.assertEqual(len(investimentos), 3)
+        self.assertEqual(len(lista), 5)
+        self.assertEqual(inexistente.status_code, 404)
+        self.assertEqual(stub.total_chamadas(), 4)
+        self.assertEqual(stub.chamadas['investimentos'], 1)
+
+    def test_extrato_paginado_por_cursor(self):
+        with StubApi(movimentacoes=120) as stub:
+            url = f"{stub.url}/conta/movimentacoes/"
+            primeira = requests.get(url, params={'page_size': 50}).json()
+            ultima = requests.get(url, params={'page_size': 50,
+                                               'cursor': 100}).json()
+
+        self.assertEqual(len(primeira['results']), 50)
+        self.assertIn('cursor=50', primeira['next'])
+        self.assertEqual(len(ultima['results']), 20)
+        self.assertIsNone(ultima['next'])
+
+
+class HarnessTest(TransactionTestCase):
+    def test_cenario_mede_latencia_e_chamadas(self):
+        with StubApi(investimentos=5, pontos=50, tickers=20) as stub:
+            dashboard = executar_cenario('dashboard', stub, requisicoes=6,
+                                         concorrencia=2)
+            cotacao = executar_cenario('market_quote', stub, requisicoes=6,
+                                       concorrencia=2)
+
+        self.assertEqual(dashboard['erros'], 0)
+        self.assertGreater(dashboard['req_s'], 0)
+        self.assertLessEqual(dashboard['p50_ms'], dashboard['p99_ms'])
+        # perfil memorizado na sessão após a primeira página de cada worker
+        self.assertGreater(dashboard['chamadas_por_pagina'], 2)
+        self.assertLess(dashboard['chamadas_por_pagina'], 3)
+        # a cotação é compartilhada entre os workers pelo cache
+        self.assertEqual(cotacao['erros'], 0)
+        self.assertLessEqual(cotacao['chamadas_por_pagina'], 2 / 6)
+
+    def test_exportacao_lida_em_paginas(self):
+        with StubApi(investimentos=250, pontos=10, tickers=20) as stub, \
+                override_settings(API_PAGINA_TAMANHO=100):
+            exportar = executar_cenario('exportar_xlsx', stub, requisicoes=2,
+                                        concorrencia=1)
+
+        self.assertEqual(exportar['erros'], 0)
+        # 3 páginas por exportação, mais o perfil na primeira
+        self.assertEqual(stub.chamadas['investimentos'], 6)
+
+    def test_cenario_pelo_handler_asgi(self):
+        with StubApi(investimentos=5, pontos=50, tickers=20) as stub:
+            home = executar_cenario('home', stub, requisicoes=4,
+                                    concorrencia=2, asgi=True)
+
+        self.assertEqual(home['erros'], 0)
+        # /users/me/ e /contas/ num único lote, revalidados com If-None-Match
+        self.assertEqual(home['chamadas_por_pagina'], 1)
+        self.assertGreater(home['nao_modificadas_por_pagina'], 0)
+
+    def test_sem_endpoint_de_lote_volta_a_chamadas_individuais(self):
+        with StubApi(investimentos=5, pontos=50, tickers=20,
+                     lote=False) as stub:
+            home = executar_cenario('home', stub, requisicoes=4,
+                                    concorrencia=2, asgi=True)
+
+        self.assertEqual(home['erros'], 0)
+        # só a primeira página de cada worker tenta o lote (404)
+        self.assertLessEqual(home['chamadas_por_pagina'], 2.5)
+        self.assertLessEqual(stub.chamadas['not_found'], 2)
+
+    def test_modos_de_sessao(self):
+        for engine in settings.SESSION_ENGINES.values():
+            medida = medir_sessao(engine, requisicoes=5)
+            self.assertGreater(medida['leitura_us'], 0)
+            self.assertGreater(medida['gravacao_us'], 0)
+
+        with StubApi(investimentos=5, pontos=50, tickers=20) as stub:
+            home = executar_cenario(
+                'home', stub, requisicoes=4, concorrencia=2,
+                session_engine=settings.SESSION_ENGINES['signed_cookies'])
+
+        # o token chega à view pelo cookie assinado
+        self.assertEqual(home['erros'], 0)
+        self.assertEqual(home['sessao'], 'signed_cookies')
+        self.assertEqual(home['chamadas_por_pagina'], 1)
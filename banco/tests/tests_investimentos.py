@@ -1,11 +1,24 @@
-from django.test import TestCase, Client
+import csv
+import io
+import re
+import zipfile
+
+from django.test import AsyncClient, TestCase, Client, override_settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
 from django.urls import reverse
 from unittest.mock import patch
 from django.contrib.messages import get_messages
+from banco.api import chave_versao_analytics, resetar_circuitos
+from banco.views.investimentos_front_end import versao_carteira
+from banco.views.user_front_end import guardar_dados_usuario
 
 
 class InvestimentosFrontendTest(TestCase):
     def setUp(self):
+        cache.clear()
+        caches['compartilhado'].clear()
+        resetar_circuitos()
         self.client = Client()
         session = self.client.session
         session['auth_token'] = 'fake-token-xyz'
@@ -15,15 +28,16 @@ class InvestimentosFrontendTest(TestCase):
         self.user = get_user_model().objects.create(username='dummy', 
                                                     email='dummy@t.com')
         self.client.force_login(self.user)
+        guardar_dados_usuario(self.user, {'first_name': 'Dummy'})
 
     # --- teste dashborad (matematica) ---
-    @patch('banco.views.investimentos_front_end.requests.get')
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
     def test_dashboard_calculo_projecao(self, mock_get):
         """
         Verifica se o dashboard aplica a taxa sobre o total investido em renda,
         fixa ignorando o saldo da conta corrente na projeção.
         """
-        def side_effect(url, headers):
+        def side_effect(url, **kwargs):
             if '/internal/clientes/' in url:
                 class MockResp:  # type: ignore
                     status_code = 200
@@ -64,9 +78,73 @@ class InvestimentosFrontendTest(TestCase):
         self.assertEqual(response.context['patrimonio_total'], 1500.00)
 
         self.assertEqual(response.context['projecao'], 540.00)
+        self.assertEqual(response.context['projecao_chart']['valores'][0],
+                         500.00)
+        self.assertContains(response, 'id="projecao-data"')
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_dashboard_dados_parciais_quando_score_falha(self, mock_get):
+        """
+        se apenas o score falhar, o dashboard ainda exibe o perfil e os
+        investimentos, com saldo zerado.
+        """
+        from requests import RequestException
+
+        def side_effect(url, **kwargs):
+            if 'score' in url:
+                raise RequestException("timeout")
+
+            class MockResp:
+                status_code = 200
+
+                def json(self):
+                    if '/internal/clientes/' in url:
+                        return [{'id': 'uid-1',
+                                 'perfil_investidor': 'MODERADO'}]
+                    return [{'valor_investido': 300.00, 'ativo': True,
+                             'tipo_investimento': 'ACOES'}]
+            return MockResp()
+
+        mock_get.side_effect = side_effect
+
+        response = self.client.get(reverse('investimentos_dashboard_page'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('error', response.context)
+        self.assertEqual(response.context['saldo_conta'], 0.0)
+        self.assertEqual(response.context['total_investido'], 300.00)
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_dashboard_erro_inesperado_nao_vira_carteira_vazia(self,
+                                                               mock_get):
+        """
+        só falhas de comunicação com a API zeram os investimentos; qualquer
+        outro erro aparece como serviço indisponível.
+        """
+        def side_effect(url, **kwargs):
+            if '/internal/investimentos/cliente/' in url:
+                raise TypeError("bug")
+
+            class MockResp:
+                status_code = 200
+
+                def json(self):
+                    if '/internal/clientes/' in url:
+                        return [{'id': 'uid-1',
+                                 'perfil_investidor': 'MODERADO'}]
+                    return {'saldo': 100.00}
+            return MockResp()
+
+        mock_get.side_effect = side_effect
+
+        response = self.client.get(reverse('investimentos_dashboard_page'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('error', response.context)
+        self.assertNotIn('investidor', response.context)
 
-    # --- teste crira investimento ---
-    @patch('banco.views.investimentos_front_end.requests.post')
+# --- teste crira investimento ---
+    @patch('banco.api.client.requests.Session.post')
     @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
     def test_realizar_investimento_sucesso(self, mock_get_id, mock_post):
         mock_get_id.return_value = 'uid-1' 
@@ -87,8 +165,8 @@ class InvestimentosFrontendTest(TestCase):
         
         self.assertRedirects(response, reverse('listar_investimentos_page'))
 
-    @patch('banco.views.investimentos_front_end.requests.get')
-    @patch('banco.views.investimentos_front_end.requests.post')
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.api.client.requests.Session.post')
     @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
     def test_realizar_investimento_erro_saldo(self, mock_get_id, mock_post, 
                                               mock_get):
@@ -100,7 +178,7 @@ class InvestimentosFrontendTest(TestCase):
         mock_post.return_value.json.return_value = [
             "Saldo insuficiente na conta."]
 
-        def side_effect_get(url, headers):
+        def side_effect_get(url, **kwargs):
             if '/contas/' in url:
                 class MockResp:
                     status_code = 200
@@ -127,7 +205,7 @@ class InvestimentosFrontendTest(TestCase):
         self.assertEqual(response.context['conta']['saldo'], 50.00)
 
     # --- teste desativar perfil ---
-    @patch('banco.views.investimentos_front_end.requests.delete')
+    @patch('banco.api.client.requests.Session.delete')
     @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
     def test_desativar_perfil_bloqueado(self, mock_get_id, mock_delete):
         """
@@ -149,4 +227,303 @@ class InvestimentosFrontendTest(TestCase):
         
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(len(messages), 1)
-        self.assertIn("Existem investimentos ativos", str(messages[0]))
\ No newline at end of file
+        self.assertIn("Existem investimentos ativos", str(messages[0]))
+
+    # --- teste cache do perfil na sessao ---
+    @patch('banco.api.client.requests.Session.get')
+    def test_perfil_memorizado_na_sessao(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [
+            {'id': 'uid-1', 'perfil_investidor': 'MODERADO'}]
+
+        url = reverse('atualizar_perfil_investidor_page')
+        self.client.get(url)
+        response = self.client.get(url)
+
+        self.assertEqual(response.context['form'].initial['perfil_investidor'],
+                         'MODERADO')
+        urls = [c.args[0] for c in mock_get.call_args_list]
+        self.assertEqual(
+            len([u for u in urls if u.endswith('/internal/clientes/')]), 1)
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_criar_perfil_invalida_cache(self, mock_post):
+        session = self.client.session
+        session['perfil_investidor'] = {'perfil': None, 'expira': 2 ** 40}
+        session.save()
+
+        mock_post.return_value.status_code = 201
+
+        self.client.post(reverse('criar_perfil_investidor_page'), {
+            'perfil_investidor': 'ARROJADO', 'patrimonio_total': '1000.00'})
+
+        self.assertNotIn('perfil_investidor', self.client.session)
+
+    # --- teste analytics via ajax (stale-while-revalidate) ---
+    def _mock_carteira(self, mock_get, retorno):
+        def side_effect(url, **kwargs):
+            class MockResp:
+                status_code = 200
+
+                def json(self):
+                    if '/internal/analytics/' in url:
+                        return {'metricas': {'retorno_total_pct': retorno},
+                                'historico': {}}
+                    return []
+            return MockResp()
+        mock_get.side_effect = side_effect
+
+    def _chamadas_analytics(self, mock_get):
+        return [c for c in mock_get.call_args_list
+                if '/internal/analytics/' in c.args[0]]
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    @patch('banco.views.investimentos_front_end.aget_cliente_investidor_id')
+    def test_carteira_nao_espera_analytics(self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        self._mock_carteira(mock_get, 10.0)
+
+        response = self.client.get(reverse('listar_investimentos_page'),
+                                   {'periodo': '5y'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['periodo_atual'], '5y')
+        self.assertEqual(self._chamadas_analytics(mock_get), [])
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
+    def test_analytics_servido_do_cache(self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        self._mock_carteira(mock_get, 10.0)
+
+        url = reverse('ajax_analytics_carteira')
+        self.client.get(url, {'periodo': '1y'})
+        response = self.client.get(url, {'periodo': '1y'})
+
+        self.assertEqual(response.json()['metricas']['retorno_total_pct'],
+                         10.0)
+        self.assertIsNone(response.json()['chart'])
+        self.assertEqual(len(self._chamadas_analytics(mock_get)), 1)
+
+    @patch('banco.api.cache.get_executor')
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
+    def test_analytics_vencido_e_revalidado_em_segundo_plano(
+            self, mock_get_id, mock_get, mock_executor):
+        mock_get_id.return_value = 'uid-1'
+        mock_executor.return_value.submit.side_effect = \
+            lambda func, *args: func(*args)
+        cache.set('analytics:uid-1:0:1y', {
+            'valor': {'status': 200,
+                      'json': '{"metricas": {"retorno_total_pct": 5.0}}'},
+            'em': 0
+        })
+        self._mock_carteira(mock_get, 10.0)
+
+        url = reverse('ajax_analytics_carteira')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['metricas']['retorno_total_pct'],
+                         5.0)
+
+        response = self.client.get(url)
+        self.assertEqual(response.json()['metricas']['retorno_total_pct'],
+                         10.0)
+        self.assertEqual(len(self._chamadas_analytics(mock_get)), 1)
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
+    def test_analytics_indisponivel(self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        mock_get.return_value.status_code = 404
+
+        response = self.client.get(reverse('ajax_analytics_carteira'))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('ainda não disponíveis', response.json()['error'])
+
+    @patch('banco.api.client.requests.Session.delete')
+    @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
+    def test_resgate_invalida_analytics(self, mock_get_id, mock_delete):
+        mock_get_id.return_value = 'uid-1'
+        mock_delete.return_value.status_code = 204
+
+        self.client.post(reverse('resgatar_investimento_page', args=[
+            '00000000-0000-0000-0000-000000000001']))
+
+        self.assertIsNotNone(
+            caches['compartilhado'].get(chave_versao_analytics('uid-1')))
+
+    # --- resgate atendido por outro worker ---
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
+    def test_analytics_descartado_em_todos_os_workers(self, mock_get_id,
+                                                      mock_get):
+        mock_get_id.return_value = 'uid-1'
+        self._mock_carteira(mock_get, 10.0)
+        url = reverse('ajax_analytics_carteira')
+
+        self.client.get(url, {'periodo': 'max'})
+        # o outro worker só muda a versão no cache compartilhado
+        caches['compartilhado'].set(chave_versao_analytics('uid-1'), 1)
+        self.client.get(url, {'periodo': 'max'})
+
+        self.assertEqual(len(self._chamadas_analytics(mock_get)), 2)
+
+    # --- teste cache de fragmentos da carteira ---
+    def _mock_custodia(self, mock_get, ticker):
+        class MockResp:
+            status_code = 200
+
+            def json(self):
+                return [{'id': '00000000-0000-0000-0000-000000000001',
+                         'ticker': ticker, 'tipo_investimento': 'ACOES',
+                         'quantidade': 10, 'preco_medio': 30.5,
+                         'valor_investido': 305, 'ativo': True}]
+        mock_get.return_value = MockResp()
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    @patch('banco.views.investimentos_front_end.aget_cliente_investidor_id')
+    def test_tabela_de_custodia_em_cache_enquanto_a_carteira_nao_muda(
+            self, mock_aget_id, mock_get):
+        mock_aget_id.return_value = 'uid-1'
+        url = reverse('listar_investimentos_page')
+
+        self._mock_custodia(mock_get, 'PETR4')
+        self.assertContains(self.client.get(url), 'PETR4')
+
+        # mesma carteira: a tabela vem do cache, sem renderizar de novo
+        chave = make_template_fragment_key('carteira_custodia', [
+            'uid-1', versao_carteira(mock_get.return_value.json())])
+        cache.set(chave, '<p>tabela em cache</p>')
+        response = self.client.get(url, {'periodo': '5y'})
+        self.assertContains(response, 'tabela em cache')
+        self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+
+        # a carteira mudou na API (resgate feito por outro worker, por
+        # exemplo): a tabela é renderizada de novo na hora
+        self._mock_custodia(mock_get, 'VALE3')
+        response = self.client.get(url)
+        self.assertContains(response, 'VALE3')
+        self.assertNotContains(response, 'PETR4')
+
+    # --- teste exportacao da carteira ---
+    def _mock_paginas(self, mock_get, total, tamanho):
+        def side_effect(url, params=None, **kwargs):
+            class MockResp:
+                status_code = 200
+
+                def json(self):
+                    pagina = params['page']
+                    inicio = (pagina - 1) * tamanho
+                    fim = min(inicio + tamanho, total)
+                    return {'count': total,
+                            'next': 'proxima' if fim < total else None,
+                            'results': [
+                                {'ticker': f'AT{i}', 'tipo_investimento':
+                                 'ACOES', 'quantidade': i,
+                                 'preco_medio': '10.50',
+                                 'valor_investido': f'{i * 10.5:.2f}',
+                                 'ativo': i % 2 == 0}
+                                for i in range(inicio, fim)]}
+            return MockResp()
+        mock_get.side_effect = side_effect
+
+    @override_settings(API_PAGINA_TAMANHO=2)
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.aget_cliente_investidor_id')
+    def test_exportar_carteira_csv_em_fluxo(self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        self._mock_paginas(mock_get, total=5, tamanho=2)
+
+        response = self.client.get(reverse('exportar_carteira_page',
+                                           args=['csv']))
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        # só a primeira página foi buscada antes do envio começar
+        self.assertEqual(mock_get.call_count, 1)
+
+        texto = b''.join(response.streaming_content).decode('utf-8-sig')
+        linhas = list(csv.reader(io.StringIO(texto)))
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_get.call_args.kwargs['params'],
+                         {'page': 3, 'page_size': 2})
+        self.assertEqual(linhas[0][0], 'Ticker')
+        self.assertEqual(len(linhas), 6)
+        self.assertEqual(linhas[2], ['AT1', 'Ações', '1', '10.50', '10.50',
+                                     'não'])
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    @patch('banco.views.investimentos_front_end.aget_cliente_investidor_id')
+    async def test_exportar_carteira_xlsx_pelo_handler_asgi(
+            self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        self._mock_paginas(mock_get, total=3, tamanho=500)
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+
+        response = await client.get(reverse('exportar_carteira_page',
+                                            args=['xlsx']))
+        conteudo = b''.join([b async for b in response.streaming_content])
+
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as xlsx:
+            self.assertIsNone(xlsx.testzip())
+            planilha = xlsx.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(len(re.findall('<row ', planilha)), 4)
+        self.assertIn('<c r="A2" t="inlineStr"><is><t>AT0</t></is></c>',
+                      planilha)
+        self.assertIn('<c r="E3" s="2"><v>10.50</v></c>', planilha)
+        self.assertIn('<c r="F3" t="b"><v>0</v></c>', planilha)
+
+    @patch('banco.api.client.requests.Session.get')
+    @patch('banco.views.investimentos_front_end.aget_cliente_investidor_id')
+    def test_exportar_carteira_api_indisponivel(self, mock_get_id, mock_get):
+        mock_get_id.return_value = 'uid-1'
+        mock_get.return_value.status_code = 503
+
+        response = self.client.get(reverse('exportar_carteira_page',
+                                           args=['csv']))
+
+        self.assertRedirects(response, reverse('listar_investimentos_page'),
+                             fetch_redirect_response=False)
+        msgs = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn("Erro ao exportar a carteira.", msgs)
+
+    def test_exportar_carteira_formato_invalido(self):
+        response = self.client.get(reverse('exportar_carteira_page',
+                                           args=['pdf']))
+        self.assertEqual(response.status_code, 404)
+
+    # --- teste projecao monte carlo ---
+    @patch('banco.api.client.requests.Session.get')
+    def test_monte_carlo_usa_total_investido(self, mock_get):
+        def side_effect(url, **kwargs):
+            class MockResp:
+                status_code = 200
+
+                def json(self):
+                    if '/internal/clientes/' in url:
+                        return [{'id': 'uid-1',
+                                 'perfil_investidor': 'MODERADO'}]
+                    return [
+                        {'valor_investido': 700.00, 'ativo': True,
+                         'tipo_investimento': 'ACOES'},
+                        {'valor_investido': 300.00, 'ativo': True,
+                         'tipo_investimento': 'RENDA_FIXA'},
+                        {'valor_investido': 999.00, 'ativo': False,
+                         'tipo_investimento': 'ACOES'},
+                    ]
+            return MockResp()
+
+        mock_get.side_effect = side_effect
+
+        response = self.client.get(reverse('ajax_projecao_montecarlo'),
+                                   {'meses': '36'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['perfil'], 'MODERADO')
+        self.assertEqual(len(data['p50']), 37)
+        self.assertEqual(data['p10'][0], 1000.00)
+        self.assertLess(data['p10'][-1], data['p90'][-1])
@@ -1,7 +1,14 @@
-from django.test import TestCase, Client
+import asyncio
+import threading
+
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
 from django.urls import reverse
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+from banco.api import market, resetar_circuitos
+from banco.autenticacao import USUARIO_SESSION_KEY
 from banco.forms import RealizarInvestimentoForm
+from banco.views.user_front_end import guardar_dados_usuario
 
 
 class InvestimentoFormTest(TestCase):
@@ -43,6 +50,9 @@ class InvestimentoFormTest(TestCase):
 
 class InvestimentoViewTest(TestCase):
     def setUp(self):
+        cache.clear()
+        resetar_circuitos()
+        market._index = None
         self.client = Client()
         session = self.client.session
         session['auth_token'] = 'fake-token'
@@ -52,9 +62,10 @@ class InvestimentoViewTest(TestCase):
         self.user = get_user_model().objects.create(username='dummy', 
                                                     email='d@d.com')
         self.client.force_login(self.user)
+        guardar_dados_usuario(self.user, {'first_name': 'Dummy'})
 
     @patch('banco.views.investimentos_front_end.get_cliente_investidor_id')
-    @patch('banco.views.investimentos_front_end.requests.post')
+    @patch('banco.api.client.requests.Session.post')
     def test_envio_payload_acoes(self, mock_post, mock_get_id):
         """
         Verifica se a View monta o JSON correto para acoes 
@@ -83,9 +94,10 @@ class InvestimentoViewTest(TestCase):
         self.assertEqual(payload_enviado['quantidade'], 10.0)
         self.assertNotIn('valor_investido', payload_enviado)
 
-    @patch('banco.views.investimentos_front_end.requests.get')
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
     def test_ajax_proxy_quote(self, mock_get):
         """testa se a view AJAX repassa a chamada para a API"""
+        mock_get.return_value = MagicMock()
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {'ticker': 'PETR4', 
                                                    'price': 38.00}
@@ -97,4 +109,115 @@ class InvestimentoViewTest(TestCase):
         self.assertEqual(response.json()['price'], 38.00)
         
         args, kwargs = mock_get.call_args
-        self.assertIn('/internal/market/', args[0])
\ No newline at end of file
+        self.assertIn('/internal/market/', args[0])
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_ajax_quote_usa_cache(self, mock_get):
+        """a segunda cotação do mesmo ticker não chega na API"""
+        mock_get.return_value = MagicMock()
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {'ticker': 'PETR4',
+                                                   'price': 38.00}
+
+        url = reverse('ajax_market_data')
+        self.client.get(url, {'action': 'quote', 'ticker': 'PETR4'})
+        response = self.client.get(url, {'action': 'quote', 'ticker': 'petr4'})
+
+        self.assertEqual(response.json()['price'], 38.00)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    # --- cotacoes simultaneas: sob WSGI cada view async tem seu loop ---
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_ajax_quotes_simultaneas_uma_chamada_a_api(self, mock_get):
+        async def cotacao(url, **kwargs):
+            await asyncio.sleep(0.2)
+            response = MagicMock(status_code=200)
+            response.json.return_value = {'ticker': 'PETR4', 'price': 38.00}
+            return response
+
+        mock_get.side_effect = cotacao
+        client = Client()
+        session = client.session
+        session['auth_token'] = 'fake-token'
+        session[USUARIO_SESSION_KEY] = 'd@d.com'
+        session.save()
+
+        url = reverse('ajax_market_data')
+        status = []
+
+        def cotar():
+            cliente = Client()
+            cliente.cookies = client.cookies
+            response = cliente.get(url, {'action': 'quote', 'ticker': 'PETR4'})
+            status.append(response.status_code)
+
+        threads = [threading.Thread(target=cotar) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(status, [200] * 8)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_ajax_quote_erro_nao_fica_em_cache(self, mock_get):
+        mock_get.return_value = MagicMock()
+        mock_get.return_value.status_code = 502
+        mock_get.return_value.json.return_value = {'error': 'Yahoo fora'}
+
+        url = reverse('ajax_market_data')
+        self.client.get(url, {'action': 'quote', 'ticker': 'VALE3'})
+        response = self.client.get(url, {'action': 'quote', 'ticker': 'VALE3'})
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_ajax_search_usa_indice_local(self, mock_get):
+        """o autocomplete é respondido pelo índice, carregado uma vez"""
+        mock_get.return_value = MagicMock()
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [
+            {'ticker': 'PETR4', 'nome': 'Petrobras PN'},
+            {'ticker': 'VALE3', 'nome': 'Vale ON'},
+        ]
+
+        url = reverse('ajax_market_data')
+        self.client.get(url, {'action': 'search', 'q': 'PE'})
+        response = self.client.get(url, {'action': 'search', 'q': 'vale'})
+
+        self.assertEqual(response.json(), [{'ticker': 'VALE3',
+                                            'nome': 'Vale ON'}])
+        self.assertEqual(mock_get.call_count, 1)
+        args, kwargs = mock_get.call_args
+        self.assertEqual(kwargs['params'], {'action': 'list'})
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_ajax_search_sem_lista_tenta_uma_vez(self, mock_get):
+        """sem a lista na API as buscas vão direto ao proxy"""
+        def side_effect(url, params=None, **kwargs):
+            response = MagicMock()
+            if params == {'action': 'list'}:
+                response.status_code = 501
+                response.json.return_value = {'error': 'sem suporte'}
+            else:
+                response.status_code = 200
+                response.json.return_value = [{'ticker': 'PETR4'}]
+            return response
+
+        mock_get.side_effect = side_effect
+
+        url = reverse('ajax_market_data')
+        self.client.get(url, {'action': 'search', 'q': 'PE'})
+        response = self.client.get(url, {'action': 'search', 'q': 'PET'})
+
+        self.assertEqual(response.json(), [{'ticker': 'PETR4'}])
+        listas = [c for c in mock_get.call_args_list
+                  if c.kwargs['params'] == {'action': 'list'}]
+        self.assertEqual(len(listas), 1)
+        self.assertEqual(mock_get.call_count, 3)
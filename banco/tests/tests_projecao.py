@@ -0,0 +1,84 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+from banco.projecao import (
+    PERFIS,
+    curvas_mensais,
+    projecao_monte_carlo,
+    projecao_mensal,
+    projetar_horizontes,
+    rotulos_meses,
+    simular_bandas,
+    taxa_anual
+)
+
+
+class ProjecaoTest(SimpleTestCase):
+    def test_curva_mensal_bate_com_taxa_anual(self):
+        curva = curvas_mensais(500.0, 0.08, 12)
+
+        self.assertEqual(curva.shape, (13,))
+        self.assertEqual(curva[0], 500.0)
+        self.assertAlmostEqual(curva[12], 540.0)
+        self.assertAlmostEqual(curva[1], 500.0 * 1.08 ** (1 / 12))
+
+    def test_lote_de_perfis_e_patrimonios(self):
+        taxas = [taxa_anual(p) for p in PERFIS]
+        curvas = curvas_mensais([100.0, 1000.0], taxas, 120)
+
+        self.assertEqual(curvas.shape, (2, 3, 121))
+        self.assertAlmostEqual(curvas[1, 2, 120], 1000.0 * 1.18 ** 10)
+        self.assertAlmostEqual(curvas[0, 1, 60],
+                               curvas_mensais(100.0, 0.12, 60)[-1])
+
+    def test_horizontes_em_anos(self):
+        valores = projetar_horizontes(1000.0, [0.08, 0.12], [1, 5])
+
+        self.assertEqual(valores.shape, (2, 2))
+        self.assertAlmostEqual(valores[0, 0], 1080.0)
+        self.assertAlmostEqual(valores[1, 1], 1000.0 * 1.12 ** 5)
+
+    def test_perfil_desconhecido_projeta_como_arrojado(self):
+        self.assertEqual(taxa_anual('INEXISTENTE'), 0.18)
+        self.assertEqual(taxa_anual(None), 0.18)
+
+    def test_projecao_para_o_grafico(self):
+        projecao = projecao_mensal(500.0, 'CONSERVADOR')
+
+        self.assertEqual(len(projecao['labels']), 13)
+        self.assertEqual(projecao['valores'][-1], 540.0)
+        self.assertEqual(rotulos_meses(2, date(2024, 11, 5))[0], 'Hoje')
+        self.assertEqual(len(rotulos_meses(2, date(2024, 11, 5))), 3)
+
+
+class MonteCarloTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bandas_ordenadas_e_deterministicas(self):
+        bandas = simular_bandas('MODERADO', 120, 10000, seed=7)
+
+        self.assertEqual(bandas.shape, (3, 121))
+        self.assertTrue((bandas[:, 0] == 1).all())
+        self.assertTrue((bandas[0] <= bandas[1]).all())
+        self.assertTrue((bandas[1] <= bandas[2]).all())
+        self.assertTrue((bandas == simular_bandas('MODERADO', 120, 10000,
+                                                  seed=7)).all())
+
+    def test_mediana_proxima_da_taxa_do_perfil(self):
+        bandas = simular_bandas('CONSERVADOR', 12, 10000, seed=1)
+        self.assertAlmostEqual(bandas[1, -1], 1.08, delta=0.01)
+
+    def test_simulacao_reaproveitada_para_qualquer_patrimonio(self):
+        with patch('banco.projecao.simular_bandas',
+                   wraps=simular_bandas) as mock_simular:
+            pequeno = projecao_monte_carlo(100.0, 'ARROJADO', 24)
+            grande = projecao_monte_carlo(1000.0, 'ARROJADO', 24)
+
+        self.assertEqual(mock_simular.call_count, 1)
+        self.assertEqual(len(grande['labels']), 25)
+        self.assertAlmostEqual(grande['p50'][-1], pequeno['p50'][-1] * 10,
+                               delta=0.1)
@@ -1,18 +1,47 @@
-from django.test import TestCase, Client
+import re
+import shutil
+import tempfile
+
+import httpx
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from unittest.mock import patch
+from banco.api import resetar_circuitos
+from banco.autenticacao import USUARIO_SESSION_KEY, UsuarioApi
+from banco.estaticos import filtrar_css, url_biblioteca, vendorizada
+from banco.idempotencia import (
+    PROCESSANDO,
+    OperacaoEmAndamento,
+    OperacaoIdempotente,
+    chave_cache,
+    get_cache_idempotencia
+)
+from banco.templatetags.bibliotecas import script_biblioteca
+from banco.views.user_front_end import (
+    chave_dados_usuario,
+    guardar_dados_usuario
+)
 
 
 class FrontendViewsTest(TestCase):
     def setUp(self):
+        resetar_circuitos()
         self.client = Client()
         session = self.client.session
         session['auth_token'] = 'fake-token-123'
         session.save()
 
     # --- teste de login com post ---
-    @patch('banco.views.login_front_end.requests.post')
-    @patch('banco.views.login_front_end.requests.get')
+    @patch('banco.api.client.requests.Session.post')
+    @patch('banco.api.client.requests.Session.get')
     def test_login_sucesso(self, mock_get, mock_post):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {'token': 'new-token-abc'}
@@ -29,8 +58,10 @@ class FrontendViewsTest(TestCase):
 
         self.assertRedirects(response, reverse('home_page'))
         self.assertEqual(self.client.session['auth_token'], 'new-token-abc')
+        self.assertEqual(self.client.session[USUARIO_SESSION_KEY], 't@t.com')
+        self.assertFalse(get_user_model().objects.exists())
 
-    @patch('banco.views.login_front_end.requests.post')
+    @patch('banco.api.client.requests.Session.post')
     def test_login_api_fora_do_ar(self, mock_post):
         """Se a API estiver offline deve exibir erro tratado"""
         from requests import RequestException
@@ -47,7 +78,7 @@ class FrontendViewsTest(TestCase):
         self.assertContains(response, "Erro de conexão com o servidor")
 
     # --- teste de deposito com post ---
-    @patch('banco.views.movimentacao_front_end.requests.post')
+    @patch('banco.api.client.requests.Session.post')
     def test_deposito_sucesso(self, mock_post):
         mock_post.return_value.status_code = 200
         mock_post.return_value\
@@ -66,7 +97,7 @@ class FrontendViewsTest(TestCase):
         self.assertTrue(mock_post.called)
 
     # --- teste de saque ---
-    @patch('banco.views.movimentacao_front_end.requests.get')
+    @patch('banco.api.client.requests.Session.get')
     def test_saque_exibe_saldo(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {'saldo': 500.00,
@@ -83,7 +114,7 @@ class FrontendViewsTest(TestCase):
         self.assertEqual(response.context['saldo'], 500.00)
 
     # --- teste de cadastro com erro da api ---
-    @patch('banco.views.signup_front_end.requests.post')
+    @patch('banco.api.client.requests.Session.post')
     def test_signup_erro_email_duplicado(self, mock_post):
         mock_post.return_value.status_code = 400
         mock_post.return_value.text = '{"detail": "Email já cadastrado"}'
@@ -103,3 +134,432 @@ class FrontendViewsTest(TestCase):
 
         form = response.context['form']
         self.assertIn('Email já cadastrado', form.non_field_errors())
+
+
+class DadosUsuarioTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        resetar_circuitos()
+        session = self.client.session
+        session['auth_token'] = 'fake-token-123'
+        session.save()
+        self.user = get_user_model().objects.create(username='dummy',
+                                                    email='dummy@t.com')
+        self.client.force_login(self.user)
+
+    # --- nome no cabecalho vem do cache, uma chamada por usuario ---
+    @patch('banco.api.client.requests.Session.get')
+    def test_cabecalho_busca_users_me_uma_vez(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'first_name': 'Ana', 'last_name': 'Lima', 'email': 'a@l.com'}
+
+        self.client.get(reverse('users_me_change_success_page'))
+        response = self.client.get(reverse('users_me_change_success_page'))
+
+        self.assertContains(response, 'Olá, <strong>Ana</strong>')
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('banco.api.client.requests.Session.get')
+    def test_formulario_de_dados_nao_busca_duas_vezes(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'first_name': 'Ana', 'last_name': 'Lima', 'email': 'a@l.com'}
+
+        response = self.client.get(reverse('users_me_change_page'))
+
+        self.assertEqual(response.context['form'].initial['first_name'],
+                         'Ana')
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_alteracao_de_dados_invalida_cache(self, mock_post):
+        guardar_dados_usuario(self.user, {'first_name': 'Ana'})
+        mock_post.return_value.status_code = 200
+
+        self.client.post(reverse('users_me_change_page'),
+                         {'first_name': 'Bia', 'last_name': 'Lima'})
+
+        self.assertIsNone(cache.get(chave_dados_usuario(self.user)))
+
+
+class TrocaEmailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        resetar_circuitos()
+        session = self.client.session
+        session['auth_token'] = 'fake-token-123'
+        session[USUARIO_SESSION_KEY] = 'ana@t.com'
+        session.save()
+
+    # --- confirmacao da troca nao deixa o e-mail antigo em lugar nenhum ---
+    @override_settings(API_CACHE_CONDICIONAL={'/users/me/': 60})
+    @patch('banco.api.client.requests.Session.get')
+    def test_confirmacao_atualiza_email_da_sessao(self, mock_get):
+        def side_effect(url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = b'{"email": "%s", "first_name": "Ana"}' % (
+                b'nova@t.com' if mock_get.call_count > 1 else b'ana@t.com')
+            return response
+        mock_get.side_effect = side_effect
+
+        # /users/me/ com o e-mail antigo, no cache condicional do token
+        self.client.get(reverse('users_me_change_success_page'))
+        self.client.get(reverse('email_change_verify_page'),
+                        {'code': 'XYZ'})
+        response = self.client.get(reverse('users_me_change_success_page'))
+
+        self.assertEqual(self.client.session[USUARIO_SESSION_KEY],
+                         'nova@t.com')
+        self.assertEqual(response.wsgi_request.user, UsuarioApi('nova@t.com'))
+        self.assertEqual(
+            cache.get(chave_dados_usuario(UsuarioApi('nova@t.com')))['email'],
+            'nova@t.com')
+        self.assertIsNone(cache.get(chave_dados_usuario(
+            UsuarioApi('ana@t.com'))))
+
+    @patch('banco.api.client.requests.Session.get')
+    def test_confirmacao_sem_resposta_tira_email_da_sessao(self, mock_get):
+        def side_effect(url, **kwargs):
+            if url.endswith('/email/change/verify/'):
+                mock_get.return_value.status_code = 200
+                return mock_get.return_value
+            raise requests.ConnectionError("recusada")
+        mock_get.side_effect = side_effect
+
+        self.client.get(reverse('email_change_verify_page'), {'code': 'XYZ'})
+
+        self.assertNotIn(USUARIO_SESSION_KEY, self.client.session)
+
+
+class ExtratoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        resetar_circuitos()
+        session = self.client.session
+        session['auth_token'] = 'fake-token-123'
+        session[USUARIO_SESSION_KEY] = 'ana@t.com'
+        session.save()
+
+    def _mock_extrato(self, mock_get):
+        def side_effect(url, params=None, **kwargs):
+            cursor = (params or {}).get('cursor')
+            if cursor is None:
+                dados = {'next': f'{url}?cursor=cD0y&page_size=50',
+                         'results': [{'id': 2, 'tipo': 'DEPOSITO',
+                                      'valor': '150.00',
+                                      'data': '2026-03-02T10:00:00Z'}]}
+            else:
+                dados = {'next': None,
+                         'results': [{'id': 1, 'tipo': 'SAQUE',
+                                      'valor': '40.00',
+                                      'data': '2026-03-01T09:30:00Z'}]}
+            return httpx.Response(200, json=dados,
+                                  request=httpx.Request('GET', url))
+        mock_get.side_effect = side_effect
+
+    # --- primeira pagina renderizada, proximas pela rolagem ---
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_extrato_primeira_pagina(self, mock_get):
+        self._mock_extrato(mock_get)
+
+        response = self.client.get(reverse('extrato_page'))
+
+        self.assertContains(response, 'Depósito')
+        self.assertContains(response, '+ R$ 150,00')
+        self.assertContains(response, 'data-cursor="cD0y"')
+        self.assertEqual(mock_get.call_args.kwargs['params'],
+                         {'page_size': 50})
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_proxima_pagina_em_cache(self, mock_get):
+        self._mock_extrato(mock_get)
+        url = reverse('ajax_extrato')
+
+        self.client.get(url, {'cursor': 'cD0y'})
+        response = self.client.get(url, {'cursor': 'cD0y'})
+
+        data = response.json()
+        self.assertIn('Saque', data['html'])
+        self.assertIn('- R$ 40,00', data['html'])
+        self.assertIsNone(data['proximo'])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    @patch('banco.api.client.requests.Session.post')
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_deposito_descarta_extrato_em_cache(self, mock_get, mock_post):
+        self._mock_extrato(mock_get)
+        mock_post.return_value.status_code = 200
+
+        self.client.get(reverse('extrato_page'))
+        self.client.post(reverse('deposito_page'), {'valor': '10.00'})
+        self.client.get(reverse('extrato_page'))
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('banco.api.async_client.httpx.AsyncClient.get')
+    def test_extrato_api_indisponivel(self, mock_get):
+        mock_get.side_effect = httpx.ConnectError('recusada')
+
+        self.assertContains(self.client.get(reverse('extrato_page')),
+                            'Erro ao carregar o extrato.')
+        response = self.client.get(reverse('ajax_extrato'),
+                                   {'cursor': 'cD0y'})
+        self.assertEqual(response.status_code, 503)
+
+
+class IdempotenciaTest(TestCase):
+    def setUp(self):
+        get_cache_idempotencia().clear()
+        resetar_circuitos()
+        session = self.client.session
+        session['auth_token'] = 'fake-token-123'
+        session[USUARIO_SESSION_KEY] = 'ana@t.com'
+        session.save()
+        self.chave = '6f1c2a9e00004000800000000000000a'
+
+    def _depositar(self):
+        return self.client.post(reverse('deposito_page'), {
+            'valor': '50.00', 'chave_idempotencia': self.chave})
+
+    def _mensagens(self, response):
+        return [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_formulario_traz_chave_nova(self):
+        primeira = self.client.get(reverse('deposito_page'))
+        segunda = self.client.get(reverse('deposito_page'))
+
+        padrao = r'name="chave_idempotencia" value="([0-9a-f]{32})"'
+        self.assertRegex(primeira.content.decode(), padrao)
+        self.assertNotEqual(
+            re.search(padrao, primeira.content.decode()).group(1),
+            re.search(padrao, segunda.content.decode()).group(1))
+
+    # --- envio repetido devolve o resultado do primeiro ---
+    @patch('banco.api.client.requests.Session.post')
+    def test_duplo_envio_chama_api_uma_vez(self, mock_post):
+        mock_post.return_value.status_code = 200
+
+        self._depositar()
+        response = self._depositar()
+
+        self.assertRedirects(response, reverse('home_page'),
+                             fetch_redirect_response=False)
+        self.assertIn("Depósito realizado com sucesso!",
+                      self._mensagens(response))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(
+            mock_post.call_args.kwargs['headers']['Idempotency-Key'],
+            self.chave)
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_envio_em_andamento(self, mock_post):
+        get_cache_idempotencia().set(
+            chave_cache(UsuarioApi('ana@t.com'), self.chave), PROCESSANDO)
+
+        response = self._depositar()
+
+        self.assertRedirects(response, reverse('home_page'),
+                             fetch_redirect_response=False)
+        self.assertIn("Sua operação já está sendo processada.",
+                      self._mensagens(response))
+        self.assertFalse(mock_post.called)
+
+    # --- a reserva no cache do banco (PYINVEST_CACHE_BANCO=1) ---
+    def test_reserva_no_cache_do_banco(self):
+        banco = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                 'LOCATION': 'pyinvest_cache_teste'}
+        with override_settings(CACHES={**settings.CACHES,
+                                       'compartilhado': banco}):
+            call_command('createcachetable', verbosity=0)
+            request = RequestFactory().post('/')
+            request.user = UsuarioApi('ana@t.com')
+
+            primeira = OperacaoIdempotente(request, self.chave)
+            self.assertIsNone(primeira.iniciar())
+            with self.assertRaises(OperacaoEmAndamento):
+                OperacaoIdempotente(request, self.chave).iniciar()
+
+            primeira.concluir('ok', '/home/')
+            self.assertEqual(
+                OperacaoIdempotente(request, self.chave).iniciar(),
+                {'mensagem': 'ok', 'url': '/home/'})
+
+    # --- sem a tabela de cache a operacao segue, so com o Idempotency-Key ---
+    @patch('banco.api.client.requests.Session.post')
+    def test_sem_cache_deposito_segue_sem_reserva(self, mock_post):
+        mock_post.return_value.status_code = 200
+        sem_tabela = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                      'LOCATION': 'pyinvest_cache_inexistente'}
+
+        with override_settings(CACHES={**settings.CACHES,
+                                       'compartilhado': sem_tabela}):
+            response = self._depositar()
+
+        self.assertRedirects(response, reverse('home_page'),
+                             fetch_redirect_response=False)
+        self.assertEqual(
+            mock_post.call_args.kwargs['headers']['Idempotency-Key'],
+            self.chave)
+
+    # --- timeout: nova tentativa com a mesma chave ---
+    @patch('banco.api.client.requests.Session.post')
+    def test_timeout_tentado_de_novo_com_a_mesma_chave(self, mock_post):
+        ok = type('Resp', (), {'status_code': 200})()
+        mock_post.side_effect = [requests.Timeout('lenta'), ok]
+
+        response = self._depositar()
+
+        self.assertRedirects(response, reverse('home_page'),
+                             fetch_redirect_response=False)
+        chaves = {c.kwargs['headers']['Idempotency-Key']
+                  for c in mock_post.call_args_list}
+        self.assertEqual(chaves, {self.chave})
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_sem_resposta_formulario_volta_com_a_mesma_chave(self,
+                                                             mock_post):
+        mock_post.side_effect = requests.ConnectionError('recusada')
+
+        response = self._depositar()
+
+        self.assertContains(response, "Erro de conexão com o servidor.")
+        self.assertContains(response, f'value="{self.chave}"')
+        # a reserva foi liberada: o reenvio chega à API
+        self._depositar()
+        self.assertEqual(mock_post.call_count, 4)
+
+    @patch('banco.api.client.requests.Session.post')
+    def test_erro_da_api_nao_fica_guardado(self, mock_post):
+        mock_post.return_value.status_code = 400
+        mock_post.return_value.json.return_value = {
+            'detail': 'Saldo insuficiente'}
+
+        self.client.post(reverse('saque_page'), {
+            'valor': '50.00', 'chave_idempotencia': self.chave})
+        response = self.client.post(reverse('saque_page'), {
+            'valor': '50.00', 'chave_idempotencia': self.chave})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_post.call_count, 2)
+
+
+class AutenticacaoApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        resetar_circuitos()
+
+    @patch('banco.api.client.requests.Session.post')
+    @patch('banco.api.client.requests.Session.get')
+    def login(self, mock_get, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'token': 'new-token-abc'}
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {'first_name': 'Ana',
+                                                   'last_name': 'Lima'}
+        self.client.post(reverse('login_page'),
+                         {'email': 'a@l.com', 'password': '123',
+                          'cpf_cnpj': '12345678900'})
+
+    # --- depois do login as paginas nao consultam o banco pelo usuario ---
+    # (sessões no cache, para que só o usuário pudesse consultar o banco)
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_pagina_autenticada_sem_consultas_ao_banco(self):
+        self.login()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('users_me_change_success_page'))
+
+        self.assertContains(response, 'Olá, <strong>Ana</strong>')
+        self.assertEqual(response.wsgi_request.user, UsuarioApi('a@l.com'))
+
+    def test_logout_encerra_usuario_api(self):
+        self.login()
+
+        self.client.get(reverse('logout_page'))
+
+        self.assertNotIn(USUARIO_SESSION_KEY, self.client.session)
+
+    # --- usuarios do banco (admin) continuam pelo ModelBackend ---
+    def test_usuario_do_banco_continua_autenticado(self):
+        user = get_user_model().objects.create(username='admin',
+                                               is_staff=True)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('users_me_change_success_page'))
+
+        self.assertEqual(response.wsgi_request.user, user)
+
+
+class EstaticosTest(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+
+    # --- collectstatic: minificado, com hash, .gz/.br e cache imutavel ---
+    def test_collectstatic_gera_arquivos_com_hash_e_comprimidos(self):
+        with override_settings(STATIC_ROOT=self.static_root):
+            call_command('collectstatic', interactive=False, verbosity=0,
+                         ignore_patterns=['admin'])
+            url = static('global/css/core.css')
+
+            response = Client().get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+
+        self.assertRegex(url, r'/static/global/css/core\.[0-9a-f]{12}\.css$')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('immutable', response['Cache-Control'])
+        original = finders.find('global/css/core.css')
+        with open(original, 'rb') as f:
+            self.assertLess(int(response['Content-Length']),
+                            len(f.read()) // 2)
+
+    # --- paginas de entrada: inline so o CSS usado, o resto sem bloquear ---
+    def test_login_com_css_critico_inline(self):
+        response = self.client.get(reverse('login_page'))
+
+        critico = re.search(r'<style>(.*?)</style>',
+                            response.content.decode(), re.S).group(1)
+        self.assertTrue(critico.startswith(':root{'))
+        self.assertIn('.auth-container{', critico)
+        self.assertNotIn('.main-header', critico)
+        self.assertNotIn(':hover', critico)
+        self.assertNotIn('@keyframes', critico)
+        self.assertContains(response, '<link rel="stylesheet" '
+                                      'href="/static/global/css/core.css" '
+                                      'media="print"')
+        self.assertContains(response, 'rel="prefetch" as="style" '
+                                      'href="/static/global/css/conta.css"')
+
+    def test_landing_sem_estilos_do_dashboard(self):
+        response = self.client.get(reverse('landing_page'))
+
+        self.assertContains(response, '.landing-hero{')
+        self.assertContains(response, '.btn-outline{')
+        self.assertNotContains(response, '.form-input{')
+        self.assertNotContains(response, '.chart-card')
+
+    def test_filtro_mantem_so_regras_usadas(self):
+        css = ('a{color:red}.usada,.outra{margin:0}.usada:hover{color:blue}'
+               '@media (max-width:600px){.outra{gap:0}.usada{gap:1px}}'
+               '@keyframes spin{0%{opacity:0}}')
+
+        self.assertEqual(filtrar_css(css, {'usada'}),
+                         'a{color:red}.usada{margin:0}'
+                         '@media (max-width:600px){.usada{gap:1px}}')
+
+    # --- bibliotecas ainda nao vendorizadas vem do CDN ---
+    def test_biblioteca_sem_copia_local_usa_cdn(self):
+        vendorizada.cache_clear()
+        with override_settings(BIBLIOTECAS_ESTATICAS={
+                'lib': ('vendor/lib/lib.min.js', 'https://cdn.test/lib',
+                        'sha384-abc')}):
+            self.assertEqual(url_biblioteca('lib'), 'https://cdn.test/lib')
+            self.assertEqual(script_biblioteca('lib'),
+                             '<script src="https://cdn.test/lib" '
+                             'integrity="sha384-abc" crossorigin="anonymous" '
+                             'defer></script>')
@@ -78,6 +78,8 @@ urlpatterns = [
     path("conta/saque/", views.SaqueFrontEnd.as_view(), name="saque_page"),
     path("conta/score/", views.ScoreCreditoFrontEnd.as_view(), 
          name="score_page"),
+    path("conta/extrato/", views.ExtratoFrontEnd.as_view(),
+         name="extrato_page"),
 
     # --- Desativação do Usuário ---
     path('users/me/desativar/', views.UserDeactivateFrontEnd.as_view(), 
@@ -92,6 +94,9 @@ urlpatterns = [
     path('investimentos/carteira/', 
          views.ListarInvestimentosFrontEnd.as_view(), 
          name='listar_investimentos_page'),
+    path('investimentos/carteira/exportar/<str:formato>/',
+         views.ExportarCarteiraFrontEnd.as_view(),
+         name='exportar_carteira_page'),
 
 
     path('investimentos/novo/', views.RealizarInvestimentoFrontEnd.as_view(), 
@@ -109,5 +114,16 @@ urlpatterns = [
          name='desativar_perfil_investidor_page'),
     path('ajax/market/', views.MarketDataAjaxView.as_view(), 
          name='ajax_market_data'),
+    path('ajax/analytics/', views.AnalyticsCarteiraAjaxView.as_view(),
+         name='ajax_analytics_carteira'),
+    path('ajax/extrato/', views.ExtratoAjaxView.as_view(),
+         name='ajax_extrato'),
+    path('ajax/projecao/montecarlo/',
+         views.ProjecaoMonteCarloAjaxView.as_view(),
+         name='ajax_projecao_montecarlo'),
+
+    # --- Métricas (scraping) ---
+    path('metrics/api/', views.MetricasApiView.as_view(),
+         name='metricas_api'),
 
 ]
\ No newline at end of file
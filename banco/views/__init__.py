@@ -10,3 +10,4 @@ from .password_front_end import *
 from .signup_front_end import *
 from .user_front_end import *
 from .investimentos_front_end import *
+from .metricas_front_end import *
\ No newline at end of file
@@ -1,12 +1,15 @@
+import logging
 import requests
-from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import FormView
 from django.contrib import messages
+from banco.api import ApiClient, Lote
 from banco.forms import ContaCorrenteForm, ContaCorrenteDeactivateForm
 from django.http import Http404
 
+logger = logging.getLogger(__name__)
+
 
 class CriarContaCorrenteFrontEnd(FormView):
     template_name = "conta_templates/criar_conta.html"
@@ -24,15 +27,10 @@ class CriarContaCorrenteFrontEnd(FormView):
             'numero': form.cleaned_data['numero']
         }
 
-        token = self.request.session.get('auth_token') 
-        headers = {'Authorization': f'Token {token}'}
+        api = ApiClient.from_request(self.request)
 
         try:
-            response = requests.post(
-                f"{settings.API_BASE_URL}/contas/",
-                json=payload,
-                headers=headers
-            )
+            response = api.post("/contas/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
@@ -60,6 +58,18 @@ class CriarContaCorrenteFrontEnd(FormView):
             return self.form_invalid(form)
 
 
+def caminho_investimentos(resp_clientes):
+    """
+    investimentos do primeiro cliente, se a lista de clientes veio.
+    """
+    if resp_clientes.status_code != 200:
+        return None
+    clientes = resp_clientes.json()
+    if not clientes:
+        return None
+    return f"/internal/investimentos/cliente/{clientes[0]['id']}/"
+
+
 class ContaCorrenteDeactivateFrontEnd(FormView):
     template_name = 'conta_templates/desativar_conta.html'
     form_class = ContaCorrenteDeactivateForm
@@ -72,54 +82,34 @@ class ContaCorrenteDeactivateFrontEnd(FormView):
         if not token:
             return context
 
-        headers = {'Authorization': f'Token {token}'}
+        lote = Lote()
+        lote.add('conta', "/contas/")
+        lote.add('clientes', "/internal/clientes/")
+        lote.add('investimentos', caminho_investimentos, depends=['clientes'])
+        respostas, erros = lote.run(ApiClient(token))
 
         total_investido = 0.0
-        meu_perfil = None
-
-        try:
-            response = requests.get(
-                f"{settings.API_BASE_URL}/contas/", 
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                context['conta'] = data
-            else:
-                raise Http404("Conta não encontrada na API.")
 
-        except requests.RequestException:
+        if 'conta' in erros:
             context['api_error'] = "Impossivel carregar os dados da conta."
+        elif respostas['conta'].status_code == 200:
+            context['conta'] = respostas['conta'].json()
+        else:
+            raise Http404("Conta não encontrada na API.")
 
-        try:
-            url_perfil = f"{settings.API_BASE_URL}/internal/clientes/" 
-            resp_perfil = requests.get(url_perfil, headers=headers)
-                     
-            if resp_perfil.status_code == 200:
-                clientes = resp_perfil.json()
-                if clientes:
-                    meu_perfil = clientes[0]
-                    
-                    cliente_id = meu_perfil['id']
-                    
-                    base = f"{settings.API_BASE_URL}/internal/investimentos/"
-
-                    url_inv = f"{base}cliente/{cliente_id}/"
-                    try:
-                        resp_inv = requests.get(url_inv, headers=headers)
-                        if resp_inv.status_code == 200:
-                            investimentos = resp_inv.json()
-                            total_investido = sum(float(i['valor_investido']) 
-                                                  for i in investimentos if 
-                                                  i.get('ativo', True))
-                    except Exception:
-                        total_investido = 0.0
-
-        except Exception as e:
-            print(f"Erro no dashboard: {e}")
+        if 'clientes' in erros:
+            logger.warning("Erro no dashboard: %s", erros['clientes'])
             context['error'] = "Serviço de investimentos indisponível no " \
                                "momento."
+        else:
+            resp_inv = respostas.get('investimentos')
+            if resp_inv is not None and resp_inv.status_code == 200:
+                try:
+                    total_investido = sum(float(i['valor_investido'])
+                                          for i in resp_inv.json() if
+                                          i.get('ativo', True))
+                except Exception:
+                    total_investido = 0.0
         
         context['total_investido'] = total_investido
             
@@ -130,13 +120,12 @@ class ContaCorrenteDeactivateFrontEnd(FormView):
         password = form.cleaned_data['password']
         
         payload = {'password': password}
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        api = ApiClient.from_request(self.request)
 
-        url = f"{settings.API_BASE_URL}/contas/{conta_id}/desativar/"
+        url = f"/contas/{conta_id}/desativar/"
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = api.post(url, json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com a API.")
             return self.form_invalid(form)
@@ -1,12 +1,46 @@
 import requests
-from django.conf import settings
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView, View
 from django.urls import reverse_lazy, reverse
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
 
+from banco.api import ApiClient
+from banco.autenticacao import (
+    USUARIO_SESSION_KEY,
+    UsuarioApi,
+    guardar_dados_usuario
+)
 from banco.forms import EmailChangeForm
+from .user_front_end import invalidar_dados_usuario
+
+
+def atualizar_email_da_sessao(request):
+    """
+    depois da troca de e-mail: descarta os dados guardados do usuário (cache
+    por usuário e respostas de /users/me/ do token) e troca o e-mail da
+    sessão pelo novo. sem resposta da API o e-mail antigo sai da sessão e o
+    usuário entra de novo.
+    """
+    invalidar_dados_usuario(request.user)
+    token = request.session.get('auth_token')
+    if not token:
+        return
+    api = ApiClient(token)
+    api.invalidar_cache()
+    if USUARIO_SESSION_KEY not in request.session:
+        return
+
+    try:
+        response = api.get("/users/me/")
+        dados = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        dados = None
+    if not isinstance(dados, dict) or not dados.get('email'):
+        request.session.pop(USUARIO_SESSION_KEY, None)
+        return
+    request.session[USUARIO_SESSION_KEY] = dados['email']
+    guardar_dados_usuario(UsuarioApi(dados['email']), dados)
 
 
 class EmailChangeFrontEnd(FormView):
@@ -20,15 +54,13 @@ class EmailChangeFrontEnd(FormView):
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
-        token = self.request.session.get('auth_token')
+        api = ApiClient.from_request(self.request)
         email = form.cleaned_data['email']
 
-        url = f"{settings.API_BASE_URL}/email/change/"
-        headers = {'Authorization': f'Token {token}'}
         payload = {'email': email}
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = api.post("/email/change/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
@@ -61,12 +93,13 @@ class EmailChangeVerifyFrontEnd(View):
     def get(self, request, format=None):
         code = request.GET.get('code', '')
 
-        url = f"{settings.API_BASE_URL}/email/change/verify/"
-        
         try:
-            response = requests.get(url, params={'code': code})
+            response = ApiClient().get("/email/change/verify/",
+                                       params={'code': code})
 
             if response.status_code == 200:
+                if request.user.is_authenticated:
+                    atualizar_email_da_sessao(request)
                 return HttpResponseRedirect(
                     reverse('email_change_verified_page'))
             else:
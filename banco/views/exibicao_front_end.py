@@ -1,7 +1,21 @@
+import asyncio
+import logging
 import requests
 from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
 from django.views.generic import TemplateView
 from django.shortcuts import redirect
+from banco.api import ApiClient, AsyncApiClient
+from banco.projecao import projecao_mensal, projecao_monte_carlo
+from .investimentos_front_end import (
+    aget_perfil_investidor,
+    get_fragmento_ttl,
+    get_perfil_investidor,
+    versao_carteira
+)
+
+logger = logging.getLogger(__name__)
 
 
 class LandingFrontEnd(TemplateView):
@@ -11,39 +25,32 @@ class LandingFrontEnd(TemplateView):
 class HomeFrontEnd(TemplateView):
     template_name = 'exibicao_templates/home.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
             return redirect('login_page')
-        return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        context = self.get_context_data(**kwargs)
+        context.update(await self.buscar_dados(request))
+        return self.render_to_response(context)
+
+    async def buscar_dados(self, request):
+        context = {}
         
-        token = self.request.session.get('auth_token')
+        token = await request.session.aget('auth_token')
         if not token:
             return context
 
-        headers = {'Authorization': f'Token {token}'}
-
+        # nome e e-mail vêm do context processor dados_usuario
         try:
-            url_user = f"{settings.API_BASE_URL}/users/me/"
-            resp_user = requests.get(url_user, headers=headers)
-            
-            if resp_user.status_code == 200:
-                user_data = resp_user.json()
-                context['first_name'] = user_data.get('first_name')
-                context['last_name'] = user_data.get('last_name')
-                context['email'] = user_data.get('email')
+            resp_conta = await AsyncApiClient(token).get("/contas/")
         except requests.RequestException:
-            pass
+            resp_conta = None
 
         context['conta'] = None
         context['conta_id'] = None
         
-        try:
-            url_conta = f"{settings.API_BASE_URL}/contas/"
-            resp_conta = requests.get(url_conta, headers=headers)
-
+        if resp_conta is not None:
             if resp_conta.status_code == 200:
                 conta_data = resp_conta.json()
                 
@@ -53,9 +60,6 @@ class HomeFrontEnd(TemplateView):
                 else:
                     context['conta'] = None
                     context['conta_id'] = None
-                
-        except requests.RequestException:
-            pass
 
         return context
 
@@ -63,24 +67,26 @@ class HomeFrontEnd(TemplateView):
 class ScoreCreditoFrontEnd(TemplateView):
     template_name = "exibicao_templates/score.html"
 
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
             return redirect('login_page')
-        return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        context = self.get_context_data(**kwargs)
+        context.update(await self.buscar_score(request))
+        return self.render_to_response(context)
+
+    async def buscar_score(self, request):
+        context = {}
 
-        token = self.request.session.get('auth_token')
+        token = await request.session.aget('auth_token')
         if not token:
             return context
             
-        headers = {'Authorization': f'Token {token}'}
-
-        url = f"{settings.API_BASE_URL}/conta/score/"
+        api = AsyncApiClient(token)
 
         try:
-            response = requests.get(url, headers=headers)
+            response = await api.get("/conta/score/")
             
             if response.status_code == 200:
                 data = response.json()
@@ -100,92 +106,138 @@ class ScoreCreditoFrontEnd(TemplateView):
         return context
 
 
+def somar_investimentos(investimentos):
+    """
+    (total investido, total em renda fixa) considerando só os ativos.
+    """
+    total_investido = 0.0
+    total_renda_fixa = 0.0
+    for i in investimentos:
+        if i.get('ativo') is not True:
+            continue
+        valor = float(i.get('valor_investido', 0))
+        total_investido += valor
+        if i.get('tipo_investimento') == 'RENDA_FIXA':
+            total_renda_fixa += valor
+    return total_investido, total_renda_fixa
+
+
 class DashboardInvestimentosFrontEnd(TemplateView):
     template_name = "investimentos_templates/dashboard.html"
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
             return redirect('login_page')
-        return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        context = self.get_context_data(**kwargs)
+        context.update(await self.buscar_dados(request))
+        return self.render_to_response(context)
+
+    async def buscar_dados(self, request):
+        context = {}
+        api = await AsyncApiClient.afrom_request(request)
+
+        async def buscar_saldo():
+            resp_saldo = await api.get("/conta/score/")
+            if resp_saldo.status_code == 200:
+                return float(resp_saldo.json().get('saldo', 0))
+            return 0.0
+
+        async def buscar_perfil_e_investimentos():
+            perfil = await aget_perfil_investidor(request)
+            if not perfil:
+                return perfil, []
+            url_inv = f"/internal/investimentos/cliente/{perfil['id']}/"
+            try:
+                resp_inv = await api.get(url_inv)
+            except requests.RequestException:
+                return perfil, []
+            if resp_inv.status_code == 200:
+                return perfil, resp_inv.json()
+            return perfil, []
+
+        # o saldo não depende do perfil: as duas cadeias correm juntas.
+        perfil_investimentos, saldo = await asyncio.gather(
+            buscar_perfil_e_investimentos(), buscar_saldo(),
+            return_exceptions=True)
 
         saldo_conta = 0.0
         total_investido = 0.0
         total_renda_fixa = 0.0
         patrimonio_total = 0.0
-        meu_perfil = None
 
-        try:
-            url_perfil = f"{settings.API_BASE_URL}/internal/clientes/" 
-            resp_perfil = requests.get(url_perfil, headers=headers)
-                     
-            if resp_perfil.status_code == 200:
-                clientes = resp_perfil.json()
-                if clientes:
-                    meu_perfil = clientes[0]
-                    context['investidor'] = meu_perfil
-                    
-                    cliente_id = meu_perfil['id']
-
-                    base = settings.API_BASE_URL
-
-                    url_saldo = f"{base}/conta/score/"
-                    try:
-                        resp_saldo = requests.get(url_saldo, headers=headers)
-                        if resp_saldo.status_code == 200:
-                            saldo_conta = float(resp_saldo.json().get('saldo', 
-                                                                      0))
-                    except Exception:
-                        saldo_conta = 0.0
-                    
-                    base = f"{settings.API_BASE_URL}/internal/investimentos/"
-
-                    url_inv = f"{base}cliente/{cliente_id}/"
-                    try:
-                        resp_inv = requests.get(url_inv, headers=headers)
-
-                        if resp_inv.status_code == 200:
-                            investimentos = resp_inv.json()
-                            print(investimentos)
-
-                            for i in investimentos:
-                                if i.get('tipo_investimento') == 'RENDA_FIXA':
-                                    if i.get('ativo') is True:
-                                        valor = float(i.get('valor_investido', 
-                                                            0))
-                                        total_investido += valor
-                                        total_renda_fixa += valor
-                                elif i.get('ativo') is True:
-                                    valor = float(i.get('valor_investido', 0))
-                                    total_investido += valor
-                    except Exception:
-                        total_investido = 0.0
-
-                    patrimonio_total = saldo_conta + total_investido
-
-                    perfil_tipo = meu_perfil.get('perfil_investidor', 
-                                                 'CONSERVADOR')
-                    if perfil_tipo == 'CONSERVADOR':
-                        taxa = 0.08
-                    elif perfil_tipo == 'MODERADO':
-                        taxa = 0.12
-                    else:
-                        taxa = 0.18
-                    
-                    context['renda_fixa'] = total_renda_fixa
-                    context['projecao'] = total_renda_fixa * (1 + taxa)
-
-        except Exception as e:
-            print(f"Erro no dashboard: {e}")
+        if isinstance(perfil_investimentos, Exception):
+            logger.warning("Erro no dashboard: %s", perfil_investimentos)
             context['error'] = "Serviço de investimentos indisponível no " \
                                "momento."
-        
+            meu_perfil = None
+        else:
+            meu_perfil, investimentos = perfil_investimentos
+
+        if meu_perfil:
+            context['investidor'] = meu_perfil
+            context['versao_carteira'] = versao_carteira(meu_perfil,
+                                                         investimentos)
+            context['fragmento_ttl'] = get_fragmento_ttl()
+
+            if not isinstance(saldo, Exception):
+                saldo_conta = saldo
+
+            total_investido, total_renda_fixa = somar_investimentos(
+                investimentos)
+
+            patrimonio_total = saldo_conta + total_investido
+
+            perfil_tipo = meu_perfil.get('perfil_investidor', 'CONSERVADOR')
+            projecao = projecao_mensal(total_renda_fixa, perfil_tipo)
+
+            context['renda_fixa'] = total_renda_fixa
+            context['taxa_anual_pct'] = projecao['taxa_anual'] * 100
+            context['projecao'] = projecao['valores'][-1]
+            context['projecao_chart'] = projecao
+
         context['saldo_conta'] = saldo_conta
         context['total_investido'] = total_investido
         context['patrimonio_total'] = patrimonio_total
             
-        return context
\ No newline at end of file
+        return context
+
+
+class ProjecaoMonteCarloAjaxView(View):
+    """
+    bandas p10/p50/p90 do total investido do usuário para o modo Monte
+    Carlo do dashboard. aceita ?meses= (padrão 120).
+    """
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+        try:
+            meses = int(request.GET.get('meses', 120))
+        except ValueError:
+            meses = 120
+        meses = min(max(meses, 1),
+                    getattr(settings, 'MONTECARLO_MAX_MESES', 360))
+
+        api = ApiClient.from_request(request)
+
+        try:
+            perfil = get_perfil_investidor(request)
+            if not perfil:
+                return JsonResponse({'error': 'Perfil não encontrado.'},
+                                    status=404)
+
+            resp_inv = api.get(
+                f"/internal/investimentos/cliente/{perfil['id']}/")
+            investimentos = resp_inv.json() \
+                if resp_inv.status_code == 200 else []
+        except requests.RequestException:
+            return JsonResponse({'error': 'Erro de comunicação com a API'},
+                                status=503)
+
+        total_investido, _ = somar_investimentos(investimentos)
+        perfil_tipo = perfil.get('perfil_investidor', 'CONSERVADOR')
+
+        return JsonResponse(projecao_monte_carlo(total_investido,
+                                                 perfil_tipo, meses))
@@ -1,50 +1,127 @@
+import hashlib
+import json
+import logging
+import time
+
 import requests
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.views import View
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.shortcuts import redirect
+from banco.api import (
+    PERIODOS,
+    ApiClient,
+    AsyncApiClient,
+    abuscar_cotacao,
+    aget_ticker_index,
+    aiterar_paginas,
+    buscar_analytics,
+    get_quote_ttl,
+    invalidar_analytics,
+    iterar_paginas
+)
+from banco.exportacao import EXPORTACOES, atransmitir, transmitir
+from banco.idempotencia import IdempotenciaMixin
 from banco.forms import CriarPerfilInvestidorForm
+from banco.projecao import (
+    PERFIS,
+    projecao_mensal,
+    projetar_horizontes,
+    taxa_anual
+)
 from banco.forms import RealizarInvestimentoForm, AtualizarPerfilInvestidorForm
 from django.http import Http404
-import json
+
+logger = logging.getLogger(__name__)
 
 
 class MarketDataAjaxView(View):
-    def get(self, request):
-        if not request.user.is_authenticated:
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
             return JsonResponse({'error': 'Unauthorized'}, status=401)
 
-        token = request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        api = await AsyncApiClient.afrom_request(request)
         
         params = request.GET.copy()
-        
-        url = f"{settings.API_BASE_URL}/internal/market/"
 
         try:
-            response = requests.get(url, headers=headers, params=params, 
-                                    timeout=5)
+            if params.get('action') == 'quote' and params.get('ticker'):
+                data, status = await abuscar_cotacao(api, params['ticker'])
+                response = JsonResponse(data, status=status)
+                if status == 200:
+                    patch_cache_control(response, private=True,
+                                        max_age=get_quote_ttl())
+                return response
+
+            if params.get('action') == 'search':
+                index = await aget_ticker_index(api)
+                if index:
+                    return JsonResponse(index.search(params.get('q', '')),
+                                        safe=False)
+
+            response = await api.get("/internal/market/", params=params,
+                                     timeout=5)
             
-            return JsonResponse(response.json(), status=response.status_code)
+            return JsonResponse(response.json(), status=response.status_code,
+                                safe=False)
             
         except requests.RequestException:
             return JsonResponse({'error': 'Erro de comunicação com a API'}, 
                                 status=503)
 
 
+class AnalyticsCarteiraAjaxView(View):
+    """
+    métricas e série do gráfico da carteira, carregadas pela página da
+    carteira depois que a tabela de custódia já foi exibida.
+    """
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+        cliente_id = get_cliente_investidor_id(request)
+        if not cliente_id:
+            return JsonResponse({'error': 'Perfil não encontrado.'},
+                                status=404)
+
+        periodo = request.GET.get('periodo', '1y')
+        if periodo not in PERIODOS:
+            periodo = '1y'
+
+        api = ApiClient.from_request(request)
+
+        try:
+            analytics = buscar_analytics(api, cliente_id, periodo)
+        except requests.RequestException:
+            return JsonResponse({'error': 'Erro de comunicação com a API'},
+                                status=503)
+
+        if analytics['status'] == 200:
+            return HttpResponse(analytics['json'],
+                                content_type='application/json')
+        elif analytics['status'] == 404:
+            return JsonResponse(
+                {'error': 'Dados de análise ainda não disponíveis.'},
+                status=404)
+        return JsonResponse({'error': 'Erro ao carregar análises.'},
+                            status=502)
+
+
 class ProjecaoRetornoFrontEnd(View):
     def get(self, request, cliente_id):
-        token = request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
-        
-        url = f"{settings.API_BASE_URL}/internal/clientes/{cliente_id}/"
+        api = ApiClient.from_request(request)
         
         try:
-            response = requests.get(url, headers=headers)
+            response = api.get(f"/internal/clientes/{cliente_id}/")
             if response.status_code != 200:
                 return JsonResponse({'error': 'Cliente não encontrado'}, 
                                     status=404)
@@ -54,25 +131,28 @@ class ProjecaoRetornoFrontEnd(View):
             perfil = data.get('perfil_investidor')
             patrimonio = float(data.get('patrimonio_total', 0))
             
-            taxa = 0.0
-            
-            if perfil == 'CONSERVADOR':
-                taxa = 0.08
-            elif perfil == 'MODERADO':
-                taxa = 0.12
-            elif perfil == 'ARROJADO':
-                taxa = 0.18
+            taxa = taxa_anual(perfil)
             
             lucro_projetado = patrimonio * taxa
             total_projetado = patrimonio + lucro_projetado
-            
+
+            anos = [1, 2, 5, 10]
+            cenarios = projetar_horizontes(
+                patrimonio, [taxa_anual(p) for p in PERFIS], anos)
+
             return JsonResponse({
                 'cliente_id': cliente_id,
                 'perfil': perfil,
                 'patrimonio_atual': patrimonio,
                 'taxa_aplicada': f"{taxa*100}%",
                 'lucro_projetado_1_ano': lucro_projetado,
-                'patrimonio_projetado_1_ano': total_projetado
+                'patrimonio_projetado_1_ano': total_projetado,
+                'curva_mensal': projecao_mensal(patrimonio, perfil),
+                'cenarios': {
+                    p: dict(zip(map(str, anos), valores))
+                    for p, valores in zip(PERFIS,
+                                          cenarios.round(2).tolist())
+                }
             })
 
         except requests.RequestException:
@@ -91,28 +171,22 @@ class CriarPerfilInvestidorFrontEnd(FormView):
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
-        token = self.request.session.get('auth_token')
+        api = ApiClient.from_request(self.request)
         
         payload = {
             'perfil_investidor': form.cleaned_data['perfil_investidor'],
             'patrimonio_total': float(form.cleaned_data['patrimonio_total'])
         }
 
-        url = f"{settings.API_BASE_URL}/internal/clientes/" 
-        
-        headers = {
-            'Authorization': f'Token {token}',
-            'Content-Type': 'application/json'
-        }
-
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = api.post("/internal/clientes/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor de "
                                  "investimentos.")
             return self.form_invalid(form)
 
         if response.status_code == 201:
+            invalidar_perfil_investidor(self.request)
             messages.success(self.request, 
                              "Perfil de investidor criado com sucesso!")
             return super().form_valid(form)
@@ -140,18 +214,90 @@ class CriarPerfilInvestidorFrontEnd(FormView):
             return self.form_invalid(form)
 
 
+PERFIL_SESSION_KEY = 'perfil_investidor'
+
+
+def get_perfil_investidor(request):
+    """
+    perfil de investidor do usuário (ou None se ainda não tiver um),
+    memorizado na sessão por INVESTIDOR_CACHE_TTL segundos. erros de
+    conexão são propagados e não são memorizados.
+    """
+    cache = request.session.get(PERFIL_SESSION_KEY)
+    if cache and cache['expira'] > time.time():
+        return cache['perfil']
+
+    response = ApiClient.from_request(request).get("/internal/clientes/")
+    if response.status_code != 200:
+        return None
+
+    clientes = response.json()
+    perfil = clientes[0] if clientes else None
+    request.session[PERFIL_SESSION_KEY] = {
+        'perfil': perfil,
+        'expira': time.time() + getattr(settings, 'INVESTIDOR_CACHE_TTL',
+                                        300)
+    }
+    return perfil
+
+
+async def aget_perfil_investidor(request):
+    """
+    get_perfil_investidor para views async.
+    """
+    cache = await request.session.aget(PERFIL_SESSION_KEY)
+    if cache and cache['expira'] > time.time():
+        return cache['perfil']
+
+    api = await AsyncApiClient.afrom_request(request)
+    response = await api.get("/internal/clientes/")
+    if response.status_code != 200:
+        return None
+
+    clientes = response.json()
+    perfil = clientes[0] if clientes else None
+    await request.session.aset(PERFIL_SESSION_KEY, {
+        'perfil': perfil,
+        'expira': time.time() + getattr(settings, 'INVESTIDOR_CACHE_TTL',
+                                        300)
+    })
+    return perfil
+
+
+def invalidar_perfil_investidor(request):
+    request.session.pop(PERFIL_SESSION_KEY, None)
+
+
+def versao_carteira(*dados):
+    """
+    resumo dos dados da API exibidos num fragmento de template em cache
+    (tabela de custódia e resumo do dashboard). a chave do fragmento muda
+    assim que a carteira vinda da API muda, em qualquer worker, sem
+    depender de quem fez o aporte ou resgate avisar os outros.
+    """
+    serializado = json.dumps(dados, sort_keys=True, default=str)
+    return hashlib.sha256(serializado.encode()).hexdigest()[:32]
+
+
+def get_fragmento_ttl():
+    return getattr(settings, 'FRAGMENTOS_CACHE_TTL', 300)
+
+
 def get_cliente_investidor_id(request):
-    token = request.session.get('auth_token')
-    headers = {'Authorization': f'Token {token}'}
-    
-    url = f"{settings.API_BASE_URL}/internal/clientes/"
-    
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            clientes = response.json()
-            if clientes and len(clientes) > 0:
-                return clientes[0]['id']
+        perfil = get_perfil_investidor(request)
+        if perfil:
+            return perfil['id']
+    except Exception:
+        pass
+    return None
+
+
+async def aget_cliente_investidor_id(request):
+    try:
+        perfil = await aget_perfil_investidor(request)
+        if perfil:
+            return perfil['id']
     except Exception:
         pass
     return None
@@ -160,77 +306,104 @@ def get_cliente_investidor_id(request):
 class ListarInvestimentosFrontEnd(TemplateView):
     template_name = "investimentos_templates/listar_investimentos.html"
 
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
             return redirect('login_page')
-        return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        context = self.get_context_data(**kwargs)
+        context.update(await self.buscar_carteira(request))
+        return self.render_to_response(context)
 
-        cliente_id = get_cliente_investidor_id(self.request)
+    async def buscar_carteira(self, request):
+        context = {}
+        api = await AsyncApiClient.afrom_request(request)
+
+        cliente_id = await aget_cliente_investidor_id(request)
         if not cliente_id:
             context['error'] = "Perfil não encontrado."
             return context
 
-        base = settings.API_BASE_URL
-        url_lista = f"{base}/internal/investimentos/cliente/{cliente_id}/"
+        url_lista = f"/internal/investimentos/cliente/{cliente_id}/"
 
         try:
-            resp_lista = requests.get(url_lista, headers=headers)
+            resp_lista = await api.get(url_lista)
             if resp_lista.status_code == 200:
                 investimentos = resp_lista.json()
-                context['investimentos'] = investimentos
                 context['total_investido'] = sum(float(i['valor_investido']) 
                                                  for i in investimentos if 
                                                  i.get('ativo'))
+                context['cliente_id'] = cliente_id
+                context['versao_carteira'] = versao_carteira(investimentos)
+                context['fragmento_ttl'] = get_fragmento_ttl()
+                context['investimentos'] = investimentos
         except Exception:
             context['error'] = "Erro ao buscar investimentos."
 
-        url_analytics = f"{base}/internal/analytics/cliente/{cliente_id}/"
-
-        periodo_selecionado = self.request.GET.get('periodo', '1y')
+        periodo_selecionado = request.GET.get('periodo', '1y')
         
-        validos = ['1mo', '3mo', '6mo', '1y', '2y', '5y', 'max']
-        if periodo_selecionado not in validos:
+        if periodo_selecionado not in PERIODOS:
             periodo_selecionado = '1y'
 
-        try:
-            resp_analytics = requests.get(url_analytics, headers=headers, 
-                                          params={
-                                              'periodo': periodo_selecionado})
-            
-            if resp_analytics.status_code == 200:
-                dados_analytics = resp_analytics.json()
-                
-                context['metrics'] = dados_analytics.get('metricas', {})
-                
-                historico = dados_analytics.get('historico', {})
-                if historico and len(historico.get('datas', [])) > 1:
-                    chart_data_js_friendly = {
-                        "labels": historico.get('datas', []),
-                        "portfolio": historico.get('carteira_pct', []),
-                        "benchmark": historico.get('benchmark_pct', [])
-                    }
-
-                    chart_data_real = chart_data_js_friendly
-                    context['chart_data'] = json.dumps(chart_data_real)
-                    print("Entrou - Dados Formatados para JS")
-                
-            elif resp_analytics.status_code == 404:
-                context['analytics_error'] = "Dados de análise ainda não "
-                "disponíveis."
-        
-        except requests.RequestException:
-            pass
-        
         context['periodo_atual'] = periodo_selecionado
         return context
 
 
-class RealizarInvestimentoFrontEnd(FormView):
+class ExportarCarteiraFrontEnd(View):
+    """
+    carteira completa em CSV ou XLSX. o arquivo é enviado enquanto as
+    páginas de /internal/investimentos/cliente/{id}/ chegam da API, então
+    só uma página fica em memória, qualquer que seja o tamanho da carteira.
+    a primeira página é buscada antes da resposta começar, para que uma
+    falha da API ainda volte para a carteira com uma mensagem.
+
+    sob ASGI as páginas vêm do AsyncApiClient: um iterador síncrono seria
+    lido inteiro pelo Django antes do envio.
+    """
+    async def get(self, request, formato):
+        if formato not in EXPORTACOES:
+            raise Http404("Formato de exportação inválido.")
+
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect('login_page')
+
+        cliente_id = await aget_cliente_investidor_id(request)
+        if not cliente_id:
+            messages.error(request, "Crie um perfil de investidor primeiro.")
+            return redirect('criar_perfil_investidor_page')
+
+        url_lista = f"/internal/investimentos/cliente/{cliente_id}/"
+        exportacao = EXPORTACOES[formato]()
+
+        try:
+            if isinstance(request, ASGIRequest):
+                api = await AsyncApiClient.afrom_request(request)
+                paginas = aiterar_paginas(api, url_lista)
+                primeira = await anext(paginas)
+                conteudo = atransmitir(exportacao, primeira, paginas)
+            else:
+                api = ApiClient(await request.session.aget('auth_token'))
+                paginas = iterar_paginas(api, url_lista)
+                primeira = await sync_to_async(next)(paginas)
+                conteudo = transmitir(exportacao, primeira, paginas)
+        except requests.RequestException as e:
+            logger.warning("Erro ao exportar a carteira %s: %s",
+                           cliente_id, e)
+            messages.error(request, "Erro ao exportar a carteira.")
+            return redirect('listar_investimentos_page')
+
+        nome = f"carteira-{timezone.localdate()}.{exportacao.extensao}"
+        response = StreamingHttpResponse(conteudo,
+                                         content_type=exportacao.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{nome}"'
+        # sem buffer no proxy (nginx), senão o envio só começaria no fim
+        response['X-Accel-Buffering'] = 'no'
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+
+class RealizarInvestimentoFrontEnd(IdempotenciaMixin, FormView):
     template_name = "investimentos_templates/realizar_investimento.html"
     form_class = RealizarInvestimentoForm
     success_url = reverse_lazy("listar_investimentos_page")
@@ -247,13 +420,10 @@ class RealizarInvestimentoFrontEnd(FormView):
         if not token:
             return context
 
-        headers = {'Authorization': f'Token {token}'}
+        api = ApiClient(token)
 
         try:
-            response = requests.get(
-                f"{settings.API_BASE_URL}/contas/", 
-                headers=headers
-            )
+            response = api.get("/contas/")
             
             if response.status_code == 200:
                 data = response.json()
@@ -267,7 +437,7 @@ class RealizarInvestimentoFrontEnd(FormView):
         return context
 
     def form_valid(self, form):
-        token = self.request.session.get('auth_token')
+        api = ApiClient.from_request(self.request)
         cliente_id = get_cliente_investidor_id(self.request)
         
         if not cliente_id:
@@ -289,26 +459,22 @@ class RealizarInvestimentoFrontEnd(FormView):
             payload['ticker'] = data['ticker'].upper()
             payload['quantidade'] = float(data['quantidade'])
 
-        url = f"{settings.API_BASE_URL}/internal/investimentos/"
-        headers = {
-            'Authorization': f'Token {token}',
-            'Content-Type': 'application/json'
-        }
-
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.enviar_api(api, "/internal/investimentos/",
+                                       json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão.")
             return self.form_invalid(form)
 
         if response.status_code == 201:
+            invalidar_analytics(cliente_id)
             dados_retorno = response.json()
             valor_final = dados_retorno.get('valor_investido', 0)
             ticker_final = dados_retorno.get('ticker', 'Renda Fixa')
             
             msg = f"Investimento realizado! Compra de {ticker_final}\
                   totalizando R$ {float(valor_final):.2f}"
-            messages.success(self.request, msg)
+            self.registrar_sucesso(msg)
             
             return super().form_valid(form)
         else:
@@ -340,17 +506,16 @@ class ResgatarInvestimentoFrontEnd(View):
         if not request.user.is_authenticated:
             return redirect('login_page')
 
-        token = request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
-
-        base = settings.API_BASE_URL
-
-        url = f"{base}/internal/investimentos/{investimento_id}/"
+        api = ApiClient.from_request(request)
 
         try:
-            response = requests.delete(url, headers=headers)
+            response = api.delete(
+                f"/internal/investimentos/{investimento_id}/")
             
             if response.status_code == 204:
+                cliente_id = get_cliente_investidor_id(request)
+                if cliente_id:
+                    invalidar_analytics(cliente_id)
                 messages.success(request, 
                                  "Investimento resgatado/cancelado com "
                                  "sucesso.")
@@ -378,44 +543,36 @@ class AtualizarPerfilInvestidorFrontEnd(FormView):
 
     def get_initial(self):
         initial = super().get_initial()
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
         
-        cliente_id = get_cliente_investidor_id(self.request)
-        if cliente_id:
-            url = f"{settings.API_BASE_URL}/internal/clientes/{cliente_id}/"
-            try:
-                resp = requests.get(url, headers=headers)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    initial['perfil_investidor'] = data\
-                        .get('perfil_investidor')
-            except Exception:
-                pass
+        try:
+            perfil = get_perfil_investidor(self.request)
+            if perfil:
+                initial['perfil_investidor'] = perfil.get('perfil_investidor')
+        except Exception:
+            pass
         return initial
 
     def form_valid(self, form):
-        token = self.request.session.get('auth_token')
+        api = ApiClient.from_request(self.request)
         cliente_id = get_cliente_investidor_id(self.request)
         
         if not cliente_id:
             return redirect('home_page')
 
-        url = f"{settings.API_BASE_URL}/internal/clientes/{cliente_id}/"
-        headers = {'Authorization': f'Token {token}', 
-                   'Content-Type': 'application/json'}
+        url = f"/internal/clientes/{cliente_id}/"
         
         payload = {
             'perfil_investidor': form.cleaned_data['perfil_investidor']
         }
 
         try:
-            response = requests.patch(url, json=payload, headers=headers)
+            response = api.patch(url, json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão.")
             return self.form_invalid(form)
 
         if response.status_code == 200:
+            invalidar_perfil_investidor(self.request)
             messages.success(self.request, "Perfil atualizado com sucesso!")
             return super().form_valid(form)
         else:
@@ -428,20 +585,18 @@ class DesativarPerfilInvestidorFrontEnd(View):
         if not request.user.is_authenticated:
             return redirect('login_page')
 
-        token = request.session.get('auth_token')
+        api = ApiClient.from_request(request)
         cliente_id = get_cliente_investidor_id(request)
         
         if not cliente_id:
             messages.error(request, "Perfil não encontrado.")
             return redirect('home_page')
 
-        url = f"{settings.API_BASE_URL}/internal/clientes/{cliente_id}/"
-        headers = {'Authorization': f'Token {token}'}
-
         try:
-            response = requests.delete(url, headers=headers)
+            response = api.delete(f"/internal/clientes/{cliente_id}/")
             
             if response.status_code == 204:
+                invalidar_perfil_investidor(request)
                 messages.success(request, 
                                  "Perfil de investidor cancelado com sucesso.")
                 return redirect('home_page')
@@ -464,7 +619,7 @@ class DesativarPerfilInvestidorFrontEnd(View):
                     
                     messages.error(request, msg)
                 except Exception as e:
-                    print(f"Erro ao ler JSON de erro: {e}")
+                    logger.warning("Erro ao ler JSON de erro: %s", e)
                     messages.error(request, 
                                    "Não foi possível cancelar o perfil devido "
                                    "a restrições.")
@@ -1,12 +1,11 @@
 import requests
-from django.conf import settings
 from django.views.generic.edit import FormView
 from django.urls import reverse_lazy
-from django.contrib.auth import login, get_user_model
+from django.contrib.auth import authenticate
+from banco.api import ApiClient
+from banco.autenticacao import login_api
 from banco.forms import LoginForm
 
-User = get_user_model()
-
 
 class LoginFrontEnd(FormView):
     template_name = 'login_templates/login.html'
@@ -18,8 +17,6 @@ class LoginFrontEnd(FormView):
         password = form.cleaned_data['password']
         cpf_cnpj = form.cleaned_data['cpf_cnpj']
 
-        url = f"{settings.API_BASE_URL}/login/custom/"
-
         payload = {
             'email': email,
             'password': password,
@@ -27,7 +24,7 @@ class LoginFrontEnd(FormView):
         }
 
         try:
-            response = requests.post(url, json=payload)
+            response = ApiClient().post("/login/custom/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
@@ -38,33 +35,11 @@ class LoginFrontEnd(FormView):
 
             self.request.session['auth_token'] = token
 
-            headers = {'Authorization': f'Token {token}'}
-            try:
-                user_response = requests.\
-                    get(f"{settings.API_BASE_URL}/users/me/", headers=headers)
-                if user_response.status_code == 200:
-                    user_data = user_response.json()
-                    first_name = user_data.get('first_name', '')
-                    last_name = user_data.get('last_name', '')
-
-                    user_local, created = User.objects.get_or_create(
-                        email=email,
-                        defaults={
-                            'username': email,
-                            'first_name': first_name,
-                            'last_name': last_name
-                        }
-                    )
-
-                    if not created:
-                        user_local.first_name = first_name
-                        user_local.last_name = last_name
-                        user_local.save()
-
-                    login(self.request, user_local)
-
-            except requests.RequestException:
-                pass
+            # o usuário vem da API (ApiTokenBackend) e fica só na sessão:
+            # nada é gravado no banco local a cada login.
+            usuario = authenticate(self.request, token=token, email=email)
+            if usuario is not None:
+                login_api(self.request, token, usuario)
 
             return super().form_valid(form)
 
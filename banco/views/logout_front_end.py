@@ -1,9 +1,9 @@
 import requests
-from django.conf import settings
 from django.contrib.auth import get_user_model, logout
 from django.views.generic import View
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from banco.api import ApiClient
 
 
 User = get_user_model()
@@ -14,10 +14,8 @@ class LogoutFrontEnd(View):
         token = request.session.get('auth_token')
 
         if token:
-            url = f"{settings.API_BASE_URL}/logout/"
-            headers = {'Authorization': f'Token {token}'}
             try:
-                requests.get(url, headers=headers)
+                ApiClient(token).get("/logout/")
             except requests.RequestException:
                 pass
 
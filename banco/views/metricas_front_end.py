@@ -0,0 +1,57 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+from banco.api import metricas_por_view
+
+METRICAS = (
+    ('requisicoes', 'pyinvest_view_requisicoes_total',
+     "Requisições atendidas que chamaram a API."),
+    ('chamadas', 'pyinvest_view_chamadas_api_total',
+     "Chamadas feitas à API."),
+    ('erros', 'pyinvest_view_erros_api_total',
+     "Chamadas à API com erro de conexão ou status 5xx."),
+    ('tempo_api_ms', 'pyinvest_view_tempo_api_segundos_total',
+     "Tempo acumulado esperando a API."),
+)
+
+
+def acesso_metricas(request):
+    """
+    usuários staff ou quem mandar `Authorization: Bearer <METRICAS_TOKEN>`
+    (o scraper do Prometheus). o IP de origem não conta: atrás de um proxy
+    na mesma máquina todas as requisições chegam de 127.0.0.1.
+    """
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICAS_TOKEN', None)
+    if not token:
+        return False
+    enviado = request.headers.get('Authorization', '')
+    return hmac.compare_digest(enviado.encode(), f'Bearer {token}'.encode())
+
+
+class MetricasApiView(View):
+    """
+    agregados de chamadas à API por view no formato texto do Prometheus.
+    só responde para staff ou com o token de METRICAS_TOKEN.
+    """
+    def get(self, request):
+        if not acesso_metricas(request):
+            return HttpResponseForbidden()
+
+        views = sorted(metricas_por_view.snapshot().items())
+        linhas = []
+        for campo, nome, descricao in METRICAS:
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} counter")
+            for view, m in views:
+                valor = m[campo]
+                if campo == 'tempo_api_ms':
+                    valor = round(valor / 1000, 6)
+                linhas.append(f'{nome}{{view="{view}"}} {valor}')
+
+        return HttpResponse('\n'.join(linhas) + '\n',
+                            content_type='text/plain; version=0.0.4; '
+                                         'charset=utf-8')
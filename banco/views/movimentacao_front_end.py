@@ -1,12 +1,20 @@
 import requests
 from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from django.views.generic import TemplateView
 from django.views.generic.edit import FormView
 from django.urls import reverse_lazy
-from django.contrib import messages
+from banco.api import ApiClient, AsyncApiClient, ErroPaginacao, cursor_de
 from banco.forms import DepositoForm, SaqueForm
+from banco.idempotencia import IdempotenciaMixin
 
 
-class DepositoFrontEnd(FormView):
+class DepositoFrontEnd(IdempotenciaMixin, FormView):
     template_name = "movimentacao_templates/deposito.html"
     form_class = DepositoForm
     success_url = reverse_lazy("home_page")
@@ -14,20 +22,17 @@ class DepositoFrontEnd(FormView):
     def form_valid(self, form):
         valor = float(form.cleaned_data["valor"])
         
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        api = ApiClient.from_request(self.request)
         payload = {'valor': valor}
-        
-        url = f"{settings.API_BASE_URL}/conta/deposito/"
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.enviar_api(api, "/conta/deposito/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
 
         if response.status_code == 200:
-            messages.success(self.request, "Depósito realizado com sucesso!")
+            self.registrar_sucesso("Depósito realizado com sucesso!")
             return super().form_valid(form)
         else:
             try:
@@ -42,7 +47,7 @@ class DepositoFrontEnd(FormView):
             return self.form_invalid(form)
 
 
-class SaqueFrontEnd(FormView):
+class SaqueFrontEnd(IdempotenciaMixin, FormView):
     template_name = "movimentacao_templates/saque.html"
     form_class = SaqueForm
     success_url = reverse_lazy("home_page")
@@ -52,11 +57,8 @@ class SaqueFrontEnd(FormView):
         
         token = self.request.session.get('auth_token')
         if token:
-            headers = {'Authorization': f'Token {token}'}
-            url = f"{settings.API_BASE_URL}/conta/score/"
-            
             try:
-                response = requests.get(url, headers=headers)
+                response = ApiClient(token).get("/conta/score/")
                 if response.status_code == 200:
                     data = response.json()
                     context["saldo"] = data.get("saldo")
@@ -68,20 +70,17 @@ class SaqueFrontEnd(FormView):
     def form_valid(self, form):
         valor = float(form.cleaned_data["valor"])
 
-        token = self.request.session.get('auth_token')
-        headers = {'Authorization': f'Token {token}'}
+        api = ApiClient.from_request(self.request)
         payload = {'valor': valor}
 
-        url = f"{settings.API_BASE_URL}/conta/saque/"
-
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.enviar_api(api, "/conta/saque/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
 
         if response.status_code == 200:
-            messages.success(self.request, "Saque realizado com sucesso!")
+            self.registrar_sucesso("Saque realizado com sucesso!")
             return super().form_valid(form)
         
         elif response.status_code == 400:
@@ -100,4 +99,123 @@ class SaqueFrontEnd(FormView):
             
         else:
             form.add_error(None, "Erro inesperado.")
-            return self.form_invalid(form)
\ No newline at end of file
+            return self.form_invalid(form)
+
+
+EXTRATO_PATH = "/conta/movimentacoes/"
+
+# tipo da API -> (descrição, entrada de dinheiro)
+TIPOS_MOVIMENTACAO = {
+    'DEPOSITO': ('Depósito', True),
+    'SAQUE': ('Saque', False),
+}
+
+
+def get_extrato_pagina_tamanho():
+    return getattr(settings, 'EXTRATO_PAGINA_TAMANHO', 50)
+
+
+def get_extrato_cache_ttl():
+    return getattr(settings, 'EXTRATO_CACHE_TTL', 300)
+
+
+def formatar_movimentacao(movimentacao):
+    """
+    movimentação da API com a data convertida e a descrição/direção usadas
+    no template. tipos desconhecidos valem pelo sinal do valor.
+    """
+    tipo = movimentacao.get('tipo') or ''
+    valor = float(movimentacao.get('valor') or 0)
+    descricao, entrada = TIPOS_MOVIMENTACAO.get(
+        tipo, (tipo.replace('_', ' ').capitalize(), valor >= 0))
+    data = movimentacao.get('data')
+    return {
+        **movimentacao,
+        'data': parse_datetime(data) if isinstance(data, str) else data,
+        'descricao': descricao,
+        'entrada': entrada,
+        'valor': abs(valor),
+    }
+
+
+async def abuscar_extrato(api, cursor=None):
+    """
+    uma página do extrato, das movimentações mais recentes para as mais
+    antigas: (movimentações, cursor da página seguinte ou None). a API
+    pagina por cursor, então cada página custa o mesmo em qualquer ponto do
+    histórico e ele nunca é lido inteiro. as páginas ficam no cache
+    condicional do usuário (API_CACHE_CONDICIONAL), descartado em qualquer
+    escrita dele, como um depósito ou saque.
+    """
+    params = {'page_size': get_extrato_pagina_tamanho()}
+    if cursor:
+        params['cursor'] = cursor
+    response = await api.get(EXTRATO_PATH, params=params)
+    if response.status_code != 200:
+        raise ErroPaginacao(EXTRATO_PATH, cursor or 1, response.status_code)
+
+    dados = response.json()
+    if isinstance(dados, list):
+        itens, proximo = dados, None
+    else:
+        itens, proximo = dados.get('results') or [], cursor_de(
+            dados.get('next'))
+    return [formatar_movimentacao(m) for m in itens], proximo
+
+
+class ExtratoFrontEnd(TemplateView):
+    """
+    extrato da conta: a primeira página vem renderizada e as seguintes são
+    carregadas pela rolagem (ExtratoAjaxView).
+    """
+    template_name = "movimentacao_templates/extrato.html"
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect('login_page')
+
+        context = self.get_context_data(**kwargs)
+        api = await AsyncApiClient.afrom_request(request)
+        try:
+            context['movimentacoes'], context['proximo_cursor'] = \
+                await abuscar_extrato(api)
+        except requests.RequestException:
+            context['error'] = "Erro ao carregar o extrato."
+        return self.render_to_response(context)
+
+
+class ExtratoAjaxView(View):
+    """
+    página seguinte do extrato para a rolagem infinita: as linhas já
+    renderizadas, com o mesmo trecho de template da primeira página, e o
+    cursor da próxima.
+    """
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+        cursor = request.GET.get('cursor')
+        api = await AsyncApiClient.afrom_request(request)
+        try:
+            movimentacoes, proximo = await abuscar_extrato(api, cursor)
+        except requests.RequestException:
+            return JsonResponse({'error': 'Erro de comunicação com a API'},
+                                status=503)
+
+        response = JsonResponse({
+            'html': render_to_string(
+                "movimentacao_templates/partials/_movimentacoes.html",
+                {'movimentacoes': movimentacoes}),
+            'proximo': proximo,
+        })
+        if cursor:
+            # as páginas depois de um cursor não mudam com movimentações
+            # novas, que entram no topo: o navegador as reaproveita. o
+            # cookie de sessão muda no login, então outro usuário no mesmo
+            # navegador não recebe a cópia.
+            patch_cache_control(response, private=True,
+                                max_age=get_extrato_cache_ttl())
+            patch_vary_headers(response, ['Cookie'])
+        return response
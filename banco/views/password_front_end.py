@@ -1,11 +1,11 @@
 import requests
-from django.conf import settings
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView, View
 from django.http import HttpResponseRedirect
 from django.urls import reverse, reverse_lazy
 from django.shortcuts import redirect
 from django.contrib import messages
+from banco.api import ApiClient
 
 from banco.forms import (
     PasswordResetForm, 
@@ -22,11 +22,10 @@ class PasswordResetFrontEnd(FormView):
     def form_valid(self, form):
         email = form.cleaned_data['email']
 
-        url = f"{settings.API_BASE_URL}/password/reset/"
         payload = {'email': email}
 
         try:
-            response = requests.post(url, json=payload)
+            response = ApiClient().post("/password/reset/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
@@ -56,10 +55,9 @@ class PasswordResetVerifyFrontEnd(View):
     def get(self, request, format=None):
         code = request.GET.get('code', '')
 
-        url = f"{settings.API_BASE_URL}/password/reset/verify/"
-        
         try:
-            response = requests.get(url, params={'code': code})
+            response = ApiClient().get("/password/reset/verify/",
+                                       params={'code': code})
             
             if response.status_code == 200:
                 request.session['password_reset_code'] = code
@@ -96,14 +94,14 @@ class PasswordResetVerifiedFrontEnd(FormView):
         code = self.request.session['password_reset_code']
         password = form.cleaned_data['password']
 
-        url = f"{settings.API_BASE_URL}/password/reset/verified/"
         payload = {
             'code': code,
             'password': password
         }
 
         try:
-            response = requests.post(url, json=payload)
+            response = ApiClient().post("/password/reset/verified/",
+                                        json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão.")
             return self.form_invalid(form)
@@ -154,12 +152,11 @@ class PasswordChangeFrontEnd(FormView):
 
         password = form.cleaned_data['password']
 
-        url = f"{settings.API_BASE_URL}/password/change/"
-        headers = {'Authorization': f'Token {token}'}
         payload = {'password': password}
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = ApiClient(token).post("/password/change/",
+                                             json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão.")
             return self.form_invalid(form)
@@ -1,9 +1,9 @@
 import requests
-from django.conf import settings
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView, View
 from django.urls import reverse_lazy
 from django.shortcuts import redirect
+from banco.api import ApiClient
 from banco.forms import SignupForm
 
 
@@ -21,11 +21,8 @@ class SignupFrontEnd(FormView):
 
         payload = form.cleaned_data
         
-        url = f"{settings.API_BASE_URL}/signup/cliente/"
-        
         try:
-    
-            response = requests.post(url, json=payload)
+            response = ApiClient().post("/signup/cliente/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
@@ -62,10 +59,9 @@ class SignupVerifyFrontEnd(View):
     def get(self, request, format=None):
         code = request.GET.get('code', '')
         
-        url = f"{settings.API_BASE_URL}/signup/verify/"
-        
         try:
-            response = requests.get(url, params={'code': code})
+            response = ApiClient().get("/signup/verify/",
+                                       params={'code': code})
             
             if response.status_code == 200:
                 return redirect('signup_verified_page')
@@ -1,13 +1,44 @@
 import requests
-from django.conf import settings
+from django.core.cache import cache
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView
 from django.urls import reverse_lazy
 from django.contrib import messages
+from banco.api import ApiClient
 from banco.forms import UsersMeChangeForm
 from django.contrib.auth import logout
 from banco.forms import UserDeactivateForm
 from django.shortcuts import redirect
+from banco.autenticacao import (
+    chave_dados_usuario,
+    guardar_dados_usuario,
+    invalidar_dados_usuario
+)
+
+
+def get_dados_usuario(request):
+    """
+    first_name, last_name e email do usuário logado, do cache por usuário
+    ou de /users/me/ numa falta. sem login, sem token ou com a API fora do
+    ar devolve {} (e nada é guardado).
+    """
+    if not request.user.is_authenticated:
+        return {}
+    dados = cache.get(chave_dados_usuario(request.user))
+    if dados is not None:
+        return dados
+
+    api = ApiClient.from_request(request)
+    if not api.token:
+        return {}
+    try:
+        response = api.get("/users/me/")
+        dados = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        return {}
+    if not isinstance(dados, dict):
+        return {}
+    return guardar_dados_usuario(request.user, dados)
 
 
 class UsersMeChangeFrontEnd(FormView):
@@ -15,39 +46,19 @@ class UsersMeChangeFrontEnd(FormView):
     form_class = UsersMeChangeForm
     success_url = reverse_lazy('users_me_change_success_page')
 
-    def get_token_header(self):
-        token = self.request.session.get('auth_token')
-        return {'Authorization': f'Token {token}'} if token else {}
+    def get_api(self):
+        return ApiClient.from_request(self.request)
 
     def get_initial(self):
         """
-        preenche os campos do formulário com os dados atuais da API.
+        preenche os campos do formulário com os dados atuais do usuário.
         """
         initial = super().get_initial()
-        
-        url = f"{settings.API_BASE_URL}/users/me/"
-        headers = self.get_token_header()
-
-        try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                initial['first_name'] = data.get('first_name', '')
-                initial['last_name'] = data.get('last_name', '')
-        except requests.RequestException:
-            pass
-            
+        dados = get_dados_usuario(self.request)
+        initial['first_name'] = dados.get('first_name', '')
+        initial['last_name'] = dados.get('last_name', '')
         return initial
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        initial_data = self.get_initial()
-        context['first_name'] = initial_data.get('first_name')
-        context['last_name'] = initial_data.get('last_name')
-        
-        return context
-
     def form_valid(self, form):
         first_name = form.cleaned_data['first_name']
         last_name = form.cleaned_data['last_name']
@@ -57,16 +68,14 @@ class UsersMeChangeFrontEnd(FormView):
             'last_name': last_name
         }
 
-        url = f"{settings.API_BASE_URL}/users/me/change/"
-        headers = self.get_token_header()
-
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.get_api().post("/users/me/change/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
 
         if response.status_code == 200:
+            invalidar_dados_usuario(self.request.user)
             messages.success(self.request, "Dados atualizados com sucesso!")
             return super().form_valid(form)
         
@@ -101,15 +110,13 @@ class UserDeactivateFrontEnd(FormView):
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
-        token = self.request.session.get('auth_token')
+        api = ApiClient.from_request(self.request)
         password = form.cleaned_data['password']
         
-        url = f"{settings.API_BASE_URL}/users/me/desativar/"
-        headers = {'Authorization': f'Token {token}'}
         payload = {'password': password}
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = api.post("/users/me/desativar/", json=payload)
         except requests.RequestException:
             form.add_error(None, "Erro de conexão com o servidor.")
             return self.form_invalid(form)
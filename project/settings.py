@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,8 +28,155 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Token para ler as métricas em /metrics/api/ sem login de staff
+# (Authorization: Bearer <token>). sem ele, só staff.
+METRICAS_TOKEN = os.environ.get('PYINVEST_METRICAS_TOKEN')
+
+# Logging
+# https://docs.djangoproject.com/en/6.0/topics/logging/
+#
+# Uma linha JSON por requisição com as chamadas à API (view, status,
+# chamadas, tempo; banco.middleware.InstrumentacaoApiMiddleware) no logger
+# 'banco.api', em INFO. PYINVEST_LOG_API muda o nível (WARNING desliga as
+# linhas por requisição e deixa só os avisos).
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'mensagem': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'api': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'mensagem',
+        },
+    },
+    'loggers': {
+        'banco.api': {
+            'handlers': ['api'],
+            'level': os.environ.get('PYINVEST_LOG_API', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 API_BASE_URL = 'http://localhost:8000/api'
 
+# Pool de conexões keep-alive com a API (por processo) e timeouts padrão
+# (conexão, leitura) em segundos.
+API_POOL_SIZE = 20
+API_TIMEOUT = (3.05, 10)
+
+# Conexões do httpx.AsyncClient usado pelas views async (um pool por
+# processo, num event loop próprio, ver banco.api.get_async_client).
+API_ASYNC_POOL_SIZE = 100
+
+# GETs da API guardados por usuário e revalidados com If-None-Match/
+# If-Modified-Since (banco.api.condicional). o valor é o TTL (s) usado quando
+# a API não manda ETag nem Last-Modified. qualquer escrita do usuário
+# descarta as respostas dele, em todos os workers: as respostas ficam no
+# cache local, mas a versão de cada usuário fica no cache de
+# API_CACHE_CONDICIONAL_VERSOES. API_CACHE_CONDICIONAL_MAX_AGE limita quanto
+# tempo uma resposta com validador fica guardada.
+API_CACHE_CONDICIONAL = {
+    '/users/me/': 60,
+    '/contas/': 15,
+    '/internal/clientes/': 60,
+    '/internal/clientes/{id}/': 60,
+    '/conta/movimentacoes/': 300,
+}
+API_CACHE_CONDICIONAL_MAX_AGE = 3600
+API_CACHE_CONDICIONAL_VERSOES = 'compartilhado'
+
+# Endpoint de lote da API (banco.api.Lote): com ele, as leituras
+# independentes de uma página saem numa única chamada. desligado (None)
+# por padrão: defina o caminho (ex.: '/batch/') só se a API o implementar.
+# qualquer falha do lote volta a chamadas individuais em paralelo; se a API
+# responder 404/405/501 o lote só é tentado de novo após API_BATCH_RETENTAR
+# segundos.
+API_BATCH_PATH = None
+API_BATCH_RETENTAR = 300
+
+# Itens pedidos por página (?page=&page_size=) nas listagens lidas em
+# páginas, como a exportação da carteira (banco.api.iterar_paginas).
+API_PAGINA_TAMANHO = 500
+
+# Circuit breaker por grupo de endpoints da API (banco.api.CircuitBreaker):
+# após API_CIRCUIT_FALHAS falhas seguidas o grupo falha na hora por
+# API_CIRCUIT_TEMPO_ABERTO segundos, até uma chamada de teste dar certo.
+API_CIRCUIT_FALHAS = 5
+API_CIRCUIT_TEMPO_ABERTO = 30
+
+# Threads usadas para disparar em paralelo as chamadas independentes de uma
+# mesma página (ver banco.api.FanOut).
+API_FANOUT_WORKERS = 20
+
+# Tempo (s) que nome e e-mail do usuário (/users/me/) ficam no cache,
+# usados por banco.context_processors.dados_usuario.
+USUARIO_CACHE_TTL = 600
+
+# Tempo (s) que o perfil de investidor fica memorizado na sessão.
+INVESTIDOR_CACHE_TTL = 300
+
+# Tempo (s) que a tabela de custódia e o resumo do dashboard ficam
+# renderizados no cache ({% cache %}). a chave inclui um resumo da carteira
+# recebida da API na própria requisição, então muda com qualquer aporte,
+# resgate ou mudança de perfil.
+FRAGMENTOS_CACHE_TTL = 300
+
+# Extrato (/conta/movimentacoes/, paginado por cursor): movimentações por
+# página e tempo (s) que o navegador reaproveita as páginas seguintes à
+# primeira, carregadas na rolagem.
+EXTRATO_PAGINA_TAMANHO = 50
+EXTRATO_CACHE_TTL = 300
+
+# Idempotência das escritas feitas por formulário (banco.idempotencia): o
+# resultado de cada chave fica IDEMPOTENCIA_TTL segundos no cache
+# IDEMPOTENCIA_CACHE, que precisa de um add() atômico entre processos
+# (Redis ou o cache no banco, que exige `manage.py createcachetable`; ver
+# 'compartilhado'). se o cache falhar a escrita segue sem reserva, só com
+# o Idempotency-Key. um envio repetido enquanto o primeiro ainda roda volta
+# na hora com um aviso; a reserva do primeiro expira em IDEMPOTENCIA_TRAVA
+# segundos se o processo morrer. timeouts e quedas de conexão são tentados
+# de novo IDEMPOTENCIA_RETENTATIVAS vezes com o mesmo Idempotency-Key.
+IDEMPOTENCIA_CACHE = 'compartilhado'
+IDEMPOTENCIA_TTL = 86400
+IDEMPOTENCIA_TRAVA = 60
+IDEMPOTENCIA_RETENTATIVAS = 1
+
+# Cotações são compartilhadas entre usuários por alguns segundos
+# (banco.api.buscar_cotacao) e o navegador pode reaproveitá-las pelo mesmo
+# tempo via Cache-Control.
+MARKET_QUOTE_TTL = 15
+
+# Intervalo (s) para recarregar o índice local de tickers usado no
+# autocomplete (banco.api.get_ticker_index). se a lista falhar, as buscas
+# vão direto à API por MARKET_INDEX_FALHA_TTL segundos antes de uma nova
+# tentativa.
+MARKET_INDEX_TTL = 3600
+MARKET_INDEX_FALHA_TTL = 60
+
+# Análises da carteira: depois de ANALYTICS_CACHE_TTL segundos a série é
+# servida do cache enquanto é atualizada em segundo plano; após
+# ANALYTICS_CACHE_MAX_AGE segundos sem atualização ela é descartada. a
+# versão de cada cliente, trocada a cada aporte ou resgate, fica no cache
+# ANALYTICS_CACHE_VERSOES para valer em todos os workers.
+ANALYTICS_CACHE_TTL = 900
+ANALYTICS_CACHE_MAX_AGE = 86400
+ANALYTICS_CACHE_VERSOES = 'compartilhado'
+
+# Máximo de pontos por série enviados ao gráfico da carteira; históricos
+# longos (5y/max) são reduzidos com LTTB (banco.api.downsample_lttb).
+ANALYTICS_CHART_PONTOS = 500
+
+# Projeção Monte Carlo do dashboard (banco.projecao.projecao_monte_carlo):
+# trajetórias simuladas, semente fixa, horizonte máximo em meses e tempo que
+# as bandas simuladas ficam em cache.
+MONTECARLO_CAMINHOS = 10000
+MONTECARLO_SEED = 42
+MONTECARLO_MAX_MESES = 360
+MONTECARLO_CACHE_TTL = 86400
+
 
 # Application definition
 
@@ -44,10 +192,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'banco.middleware.InstrumentacaoApiMiddleware',
+    'banco.middleware.ApiIndisponivelMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'banco.middleware.AutenticacaoApiMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,6 +219,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'banco.context_processors.dados_usuario',
             ],
         },
     },
@@ -87,6 +239,78 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# Estado que precisa ser o mesmo em todos os workers e máquinas fica no
+# cache 'compartilhado': no Redis de PYINVEST_REDIS_URL (requer o pacote
+# redis). sem ele fica na memória do processo, o que só é compartilhado
+# com um único worker (runserver, testes). PYINVEST_CACHE_BANCO=1 o leva
+# para uma tabela do banco (`python manage.py createcachetable`), ao custo
+# de uma consulta ao SQLite a cada leitura condicional e a cada escrita.
+REDIS_URL = os.environ.get('PYINVEST_REDIS_URL')
+CACHE_NO_BANCO = os.environ.get('PYINVEST_CACHE_BANCO') == '1'
+
+if REDIS_URL:
+    CACHE_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+elif CACHE_NO_BANCO:
+    CACHE_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'pyinvest_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+else:
+    CACHE_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pyinvest-compartilhado',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pyinvest',
+    },
+    'compartilhado': CACHE_COMPARTILHADO,
+}
+
+
+# Sessões
+# https://docs.djangoproject.com/en/6.0/topics/http/sessions/
+#
+# A sessão só guarda o token da API, o código de redefinição de senha e o
+# perfil memorizado. PYINVEST_SESSION escolhe o engine:
+#   cache          - cache 'compartilhado' (padrão com PYINVEST_REDIS_URL);
+#   cached_db      - lê do cache 'compartilhado' e grava também no banco;
+#   signed_cookies - sem estado no servidor: a sessão vai assinada (não
+#                    cifrada) no cookie e não pode ser revogada antes de
+#                    expirar;
+#   db             - padrão do Django (padrão sem Redis: o cache
+#                    'compartilhado' seria do processo ou do próprio banco).
+# `python manage.py benchmark --sessoes` compara os modos.
+SESSION_ENGINES = {
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[
+    os.environ.get('PYINVEST_SESSION', 'cache' if REDIS_URL else 'db')]
+SESSION_CACHE_ALIAS = 'compartilhado'
+
+# Autenticação
+# os clientes entram pelo token da API e viram um UsuarioApi guardado só na
+# sessão (banco.autenticacao); o ModelBackend fica para o admin e vem
+# primeiro porque é o que force_login()/createsuperuser usam. sem usuário e
+# senha ele devolve None sem consultar o banco.
+AUTHENTICATION_BACKENDS = [
+    'django.contrib.auth.backends.ModelBackend',
+    'banco.autenticacao.ApiTokenBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -131,6 +355,43 @@ STATICFILES_DIRS = [
     BASE_DIR / 'base_static'
 ]
 STATIC_ROOT = BASE_DIR / 'static'
+
+# No collectstatic os arquivos são minificados, ganham o hash do conteúdo no
+# nome e versões .gz/.br (banco.estaticos.ArmazenamentoEstatico); o
+# WhiteNoise os serve com Cache-Control imutável de um ano.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'banco.estaticos.ArmazenamentoEstatico',
+    },
+}
+
+# Bibliotecas de terceiros: (cópia local em base_static, CDN, hash SRI do
+# arquivo do CDN). as URLs fixam a versão exata, para que a página não mude
+# quando sair uma versão nova. a cópia é baixada com `python manage.py
+# vendorizar_static`, que confere o hash e mostra o de cada arquivo;
+# enquanto ela não existe os templates usam o CDN, com `integrity` quando
+# o hash está preenchido.
+JSDELIVR = 'https://cdn.jsdelivr.net/npm/'
+BIBLIOTECAS_ESTATICAS = {
+    'sweetalert2': (
+        'vendor/sweetalert2/sweetalert2.all.min.js',
+        JSDELIVR + 'sweetalert2@11.10.5/dist/sweetalert2.all.min.js',
+        None,
+    ),
+    'sweetalert2-bootstrap-4': (
+        'vendor/sweetalert2/bootstrap-4.css',
+        JSDELIVR + '@sweetalert2/theme-bootstrap-4@5.0.16/bootstrap-4.css',
+        None,
+    ),
+    'apexcharts': (
+        'vendor/apexcharts/apexcharts.min.js',
+        JSDELIVR + 'apexcharts@3.45.2/dist/apexcharts.min.js',
+        None,
+    ),
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/login/'